@@ -3,6 +3,9 @@ import logging
 from livekit import rtc
 from .session_data import SessionData
 import asyncio
+import config
+from tools.log_setup import log_event
+from tools.speech_chunker import synthesize_in_order
 
 logger = logging.getLogger("livekit.BASE_AGENT")
 logger.info("BASE_AGENT")
@@ -14,6 +17,8 @@ class BaseChatAgent(Agent):
         self.room = room
         self.session_data = session_data
         self._exit_timer = None
+        # Set by agents that may answer general questions from the shared cache.
+        self.answer_cache = None
         
     async def _exit_after_timeout(self, seconds: int):
             try:
@@ -24,16 +29,57 @@ class BaseChatAgent(Agent):
             except asyncio.CancelledError:
                 pass
 
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        cached = None
+        if self.answer_cache is not None:
+            cached = await self.answer_cache.lookup(chat_ctx, self.session_data)
+        if cached is not None and cached.answer is not None:
+            stream = cached.replay()
+        else:
+            stream = Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+            if cached is not None:
+                stream = cached.record(stream)
+        guard = self.session_data.content_guard
+        if guard is not None:
+            # Rules can change mid-session from parent mode; sync is a no-op otherwise.
+            guard.sync(self.session_data.parental_instructions)
+            if guard.active:
+                stream = guard.filter_stream(stream)
+        async for chunk in stream:
+            yield chunk
+
+    async def tts_node(self, text, model_settings):
+        # OpenAI TTS doesn't stream, so the default adapter synthesizes one
+        # sentence at a time; chunk earlier and synthesize ahead instead.
+        tts = self.session.tts
+        if config.TTS_CHUNKING and tts is not None and not tts.capabilities.streaming:
+            stream = synthesize_in_order(tts, text, conn_options=self.session.conn_options.tts_conn_options)
+        else:
+            stream = Agent.default.tts_node(self, text, model_settings)
+        async for frame in stream:
+            yield frame
+
     async def on_user_turn_completed(
         self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage
     ) -> None:
-        logger.info(f"chat_history after user turn completed :: {self.session_data.chat_history}")
-        logger.info(f"User turn completed : {new_message}")
+        logger.info("User turn completed (%d messages in history)", len(self.session_data.chat_history))
 
         text = new_message.content[0]
         self.session_data.chat_history.append({"role": "user", "content": text})
 
-        logger.info(f"chat :: {self.chat_ctx}")
+        tracker = self.session_data.interest_tracker
+        if tracker is not None:
+            new_interests = tracker.observe(text)
+            if new_interests:
+                liked = ", ".join(item for items in new_interests.values() for item in items)
+                turn_ctx.add_message(
+                    role="system",
+                    content=f"The child just told you they like: {liked}. Weave it in naturally when it fits.",
+                )
+
+        # Counts only: formatting the whole context every turn costs more than the turn's own logic.
+        log_event(logger, "turn.context", logging.DEBUG, device_id=self.session_data.device_id,
+                  items=len(self.chat_ctx.items))
         last_item = self.chat_ctx.items[-1]
 
         if "parent mode" in text.lower() or "parental mode" in text.lower() or "parent" in text.lower():
@@ -49,7 +95,7 @@ class BaseChatAgent(Agent):
                 text = last_item.text_content
                 if text:
                     self.session_data.chat_history.append({"role": "assistant", "content": text})
-                    logger.info(f"Saved assistant msg: {text}")
+                    logger.debug("Saved assistant msg: %s", text)
         else:
             pass
         if self._exit_timer and not self._exit_timer.done():
@@ -11,9 +11,11 @@ from prompts.system_prompts import (
     create_assistant_prompt,
 )
 from typing import Optional
+import config
 from tools.agent_tools import exit_session, get_data, generate_query_summary
 from .router_agent import RouterAgent
 from .base_agent import BaseChatAgent
+from tools.answer_cache import get_answer_cache
 
 
 logger = logging.getLogger("livekit.conversation_continuation_agent")
@@ -21,11 +23,14 @@ logger.info("CONVERSATION CONTINUATION AGENT LOADED")
 
 class ConversationContinuationAgent(BaseChatAgent):
 
-    def __init__(self, room: rtc.Room, session_data: SessionData):
-        super().__init__(instructions=CONVERSATION_CONTINUATION_AGENT_PROMPT, room=room, session_data=session_data) 
+    def __init__(self, room: rtc.Room, session_data: SessionData, chat_ctx: llm.ChatContext | None = None):
+        super().__init__(instructions=CONVERSATION_CONTINUATION_AGENT_PROMPT, room=room, session_data=session_data,
+                         chat_ctx=chat_ctx)
         logger.info("Initializing ConversationContinuationAgent.")
         self.room = room
         self.session_data = session_data
+        if config.ANSWER_CACHE:
+            self.answer_cache = get_answer_cache()
 
     @function_tool
     async def exit(self):
@@ -47,7 +52,7 @@ class ConversationContinuationAgent(BaseChatAgent):
             ]
             query = await generate_query_summary(messages_for_rag)
 
-        logger.info(f"Final RAG input: {query}")
+        logger.debug("Final RAG input: %s", query)
 
         # Call your DB
         result = await get_data(session_data=self.session_data, message=query)
@@ -68,10 +73,10 @@ class ConversationContinuationAgent(BaseChatAgent):
         )
         # full_prompt = f"{CONVERSATION_CONTINUATION_AGENT_PROMPT}\n\n{full_prompt}"
         
-        logger.debug(f"Full system prompt: {full_prompt}")
+        logger.debug("Full system prompt: %s", full_prompt)
         await self.update_instructions(full_prompt)
         logger.info("LLM instructions set for continuation.")
-        logger.info(f"Continumm ::: {self.session}")
+        logger.debug("Continuation session: %s", self.session)
 
     async def on_user_turn_completed(
         self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage
@@ -7,18 +7,30 @@ from prompts.system_prompts import CONVERSATION_STARTER_AGENT_PROMPT, BASE_PROMP
 from .conversation_continuation_agent import ConversationContinuationAgent
 from livekit.agents.voice.agent_activity import AgentActivity, _EndOfTurnInfo
 from .base_agent import BaseChatAgent
+from tools.log_setup import log_event
+from tools.tts_cache import say_cached
 
 logger = logging.getLogger("livekit.conversation_starter_agent")
 logger.info("CONVERSATION STARTER AGENT LOADED")
 
 class ConversationStarterAgent(BaseChatAgent):
-    def __init__(self, room: rtc.Room, session_data: SessionData):
+    def __init__(self, room: rtc.Room, session_data: SessionData, greeting: dict | None = None, ready=None):
+        """
+        `greeting`: a pre-generated greeting row to speak on entry instead of
+        generating one. `ready`: awaitable that completes once `session_data`
+        is fully loaded (when the session started before the bootstrap did).
+        """
         logger.info("ConversationStarterAgent __init__ CALLED")
         super().__init__(instructions=BASE_PROMPT, room=room, session_data=session_data)
         self.room = room
         self.session_data = session_data
+        self.greeting = greeting
+        self.ready = ready
+
+    def _prompt_kwargs(self) -> dict:
+        session_data = self.session_data
         p = session_data.personality or {}
-        self.prompt_kwargs = {
+        return {
             "user_name": session_data.user_name or "friend",
             "age": session_data.age or "",
             "interests": session_data.interests or [],
@@ -34,21 +46,32 @@ class ConversationStarterAgent(BaseChatAgent):
     
     async def on_enter(self):
         logger.info("starter on_enter called")
-        instructions = CONVERSATION_STARTER_AGENT_PROMPT.format(**self.prompt_kwargs)
-        print(f"instructions ::: {instructions}")
-        print(f"session :::: {self.session}")
+        speech = None
+        if self.greeting:
+            # Starts playing now; the context finishes loading underneath it.
+            speech = say_cached(self.session, self.greeting["text"], pitch=self.greeting.get("tts_pitch"))
+            log_event(logger, "greeting.pregenerated", device_id=self.session_data.device_id)
+        if self.ready is not None:
+            await self.ready
+
+        instructions = CONVERSATION_STARTER_AGENT_PROMPT.format(**self._prompt_kwargs())
+        logger.debug("Starter instructions: %s", instructions)
         await self.update_instructions(instructions)
-        
-        logger.info("Updating LLM instructions and generating reply.")
-        try:
-            await self.session.generate_reply(instructions="Greet the kid, say hi, make the greeting feel personalised.")
-            logger.info("Greeting sent.")
 
-        except Exception as e:
-            print(f"error generating greeting, {e}")
+        if speech is not None:
+            await speech
+        else:
+            logger.info("Updating LLM instructions and generating reply.")
+            try:
+                await self.session.generate_reply(instructions="Greet the kid, say hi, make the greeting feel personalised.")
+                logger.info("Greeting sent.")
+
+            except Exception as e:
+                log_event(logger, "greeting.failed", logging.ERROR, error=repr(e))
 
         try :
-            logger.info(f"session data: {self.session_data}")
+            log_event(logger, "session.handoff", logging.DEBUG, device_id=self.session_data.device_id,
+                      messages=len(self.session_data.chat_history))
             self.session.update_agent(
             ConversationContinuationAgent(
                 room=self.room,
@@ -2,10 +2,11 @@ import logging
 from livekit.agents import Agent, RunContext, llm, AgentSession
 from livekit.rtc import Room
 from agents.session_data import SessionData
-from prompts.system_prompts import PARENTAL_PREFERENCE_AGENT_PROMPT
+from prompts.system_prompts import PARENTAL_PREFERENCE_AGENT_PROMPT, PARENTAL_MODE_INTRO
 from livekit.agents.llm import ChatMessage
 from tools.supabase_tools import SupabaseHelper
 from tools.parental_agent_tools import PARENTAL_RULE_TOOLS
+from tools.tts_cache import say_cached
 import asyncio
 
 logger = logging.getLogger("livekit.parental_mode_agent")
@@ -31,8 +32,10 @@ class ParentalModeAgent(Agent):
         )
         await self.update_instructions(updated_prompt)
 
-        await self.session.say(
-            text="Hello! I'm now in Parent mode. I can help you set parental preferences like bedtime, restricted topics, language filters, and more. What would you like to configure?"
+        await say_cached(
+            self.session,
+            PARENTAL_MODE_INTRO,
+            pitch=self.session_data.parental_instructions.get("tts_pitch_preference"),
         )
 
     async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage):
@@ -45,7 +48,5 @@ class ParentalModeAgent(Agent):
                 ConversationStarterAgent(room=self.room, session_data=self.session_data)
             )
             return
-
-        await self.session.generate_reply(
-            instructions=f"Respond to the parent's last message politely and helpfully. Use device_id: {self.device_id} for all tool calls (e.g., {{'device_id': '{self.device_id}', 'time': '9:00 PM'}} for set_bedtime, or {{'device_id': '{self.device_id}', 'rules': {{'bedtime': '9:00 PM', 'restricted_topics': ['violence']}}}} for set_parental_rules)."
-        )
\ No newline at end of file
+        # The session replies (and calls the rule tools) on its own; the
+        # device_id to use is already in the instructions.
\ No newline at end of file
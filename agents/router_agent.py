@@ -9,12 +9,17 @@ from .parental_mode_agent import ParentalModeAgent
 from .session_data import SessionData
 from tools.supabase_tools import SupabaseHelper
 import config
-from prompts.system_prompts import ROUTER_AGENT_PROMPT
+from prompts.system_prompts import ROUTER_AGENT_PROMPT, ROUTER_ERROR_APOLOGY
+from tools.tts_cache import say_cached
+from tools import model_registry
 from livekit import rtc
 
 logger = logging.getLogger("livekit.router")
 logger.info("ROUTER AGENT RUNNING")
 
+# Routing is a three-way tool choice on the critical path: the fast tier, not the chat model.
+routing_llm = model_registry.livekit_llm("routing")
+
 class RouterAgent(Agent):
     def __init__(self, room: rtc.Room, session_data: SessionData):
         logger.info("ConversationStarterAgent __init__ CALLED")
@@ -22,7 +27,7 @@ class RouterAgent(Agent):
                 self.route_to_user_agent,
                 self.route_to_parental_agent,
                 self.route_to_conversation_agent,
-            ])
+            ], llm=routing_llm)
         self.room = room
         self.session_data = session_data
         
@@ -98,7 +103,9 @@ class RouterAgent(Agent):
                 await self.route_to_conversation_agent(context=RunContext(session=self.session))
         except Exception as e:
             logger.error(f"Error processing user message: {e}")
-            await self.session.say(
-                text="Sorry, I couldn't process your request. Let's start a conversation instead."
+            await say_cached(
+                self.session,
+                ROUTER_ERROR_APOLOGY,
+                pitch=self.session_data.parental_instructions.get("tts_pitch_preference"),
             )
             await self.route_to_conversation_agent(context=RunContext(session=self.session))
\ No newline at end of file
@@ -1,4 +1,5 @@
 # in agent/session_data.py
+import uuid
 from dataclasses import dataclass, field
 from typing import Dict, Any
 
@@ -16,7 +17,14 @@ class SessionData:
     interests: list[str] | None = None  
     dob: str | None = None            
     parent_mode: bool = False
+    # Set once the child has said goodbye; such a session isn't resumed.
+    finished: bool = False
+    # Kept across a resume; the finalize queue's idempotency key.
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
     parental_instructions: Dict[str, Any] = field(default_factory=dict)
     preferences: Dict[str, Any] = field(default_factory=dict)
     personality: str | None = None
-    last_messages: list = field(default_factory=list)
\ No newline at end of file
+    last_messages: list = field(default_factory=list)
+    interest_tracker: Any = field(default=None, repr=False)
+    parental_rule_buffer: Any = field(default=None, repr=False)
+    content_guard: Any = field(default=None, repr=False)
\ No newline at end of file
@@ -7,19 +7,30 @@ from livekit.rtc import Room
 from prompts import system_prompts
 from .session_data import SessionData
 from tools.supabase_tools import SupabaseHelper, save_user_data_to_backend
+from tools.fun_facts import get_fun_fact_store
 from .base_agent import BaseChatAgent
 logger = logging.getLogger("livekit.user_agent")
 
+
+def prefetch_fun_facts(session_data: SessionData):
+    """Start loading fun facts for the child's city and age band, as `get_fun_fact` will ask for them."""
+    if session_data.city:
+        get_fun_fact_store().prefetch(session_data.city, session_data.age)
+
+
 class UserAgent(BaseChatAgent):
-    def __init__(self, room: Room, session_data: SessionData, session: AgentSession):
-        super().__init__(instructions=system_prompts.USER_AGENT_PROMPT)
-        self.room = room
-        self.session = session
-        self.session_data = session_data
+    def __init__(self, room: Room, session_data: SessionData, session: AgentSession | None = None,
+                 chat_ctx: llm.ChatContext | None = None):
+        # `session` is kept for old callers; the running session is `self.session` once active.
+        super().__init__(instructions=system_prompts.USER_AGENT_PROMPT, room=room, session_data=session_data,
+                         chat_ctx=chat_ctx)
         self.db_helper = SupabaseHelper()
 
     async def on_enter(self):
         logging.info("User agent activated.")
+        if self.chat_ctx.items:
+            # Resumed after a reconnect; carry on from where the child was.
+            return
         await self.session.generate_reply(
             user_input="Hi, how are you? It's great to see you."
         )
@@ -44,6 +55,8 @@ class UserAgent(BaseChatAgent):
     async def record_city(self, context: RunContext[SessionData], city: str) -> str:
         """Use this tool to record the user's city."""
         context.userdata.city = (city or "").strip()
+        # Load the city's fun facts now so get_fun_fact answers from memory.
+        prefetch_fun_facts(context.userdata)
         return "City recorded."
 
     @function_tool()
@@ -71,6 +84,8 @@ class UserAgent(BaseChatAgent):
 
         context.userdata.dob = birth_date.date().isoformat()
         context.userdata.age = int(age)
+        # Facts are pooled by age band; until now the city's were loaded for the default one.
+        prefetch_fun_facts(context.userdata)
 
         logging.info(f"DOB parsed: {context.userdata.dob}; Age: {context.userdata.age}")
         return f"Date of birth recorded; age calculated as {age}."
@@ -83,11 +98,8 @@ class UserAgent(BaseChatAgent):
         """
         Get one short, kid-friendly fun fact about a city.
         """
-        prompt = f"Tell one short, kid-friendly fun fact about {city}. Keep it to one sentence."
-        # In v1, call the LLM via context.session.llm.chat(...)
-        stream = await context.session.llm.chat(instructions=prompt)
-        fact = "".join([chunk.text async for chunk in stream])
-        return fact.strip()
+        ud: SessionData = context.userdata
+        return await get_fun_fact_store().get(city or ud.city, ud.age, ud.device_id)
 
     # (If this was meant to be different, keep it; otherwise, it's a duplicate of get_fun_fact)
     # @function_tool()
@@ -0,0 +1,602 @@
+"""
+Stub providers for the benchmarks.
+
+Nothing in here talks to the network. LLM / STT / TTS / Supabase / OpenAI
+calls are replaced by sleeps with a configurable latency so the real agent
+classes and ``main.handle_participant`` can be driven in-process. Calls that
+are synchronous in the app (Supabase ``.execute()``) are
+faked with ``time.sleep`` on purpose: they block the event loop in production
+too, and the benchmarks are meant to show it.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from livekit import rtc
+from livekit.agents import llm
+
+# The app builds its clients at import time, so hand it syntactically valid
+# placeholder credentials before anything imports `config`.
+STUB_ENV = {
+    "OPENAI_API_KEY": "sk-benchmark-stub",
+    "DEEPGRAM_API_KEY": "benchmark-stub",
+    "SUPABASE_URL": "http://127.0.0.1:54321",
+    "SUPABASE_KEY": "benchmark.stub.key",
+    "LIVEKIT_URL": "ws://127.0.0.1:7880",
+    "LIVEKIT_API_KEY": "benchmark-stub",
+    "LIVEKIT_API_SECRET": "benchmark-stub",
+}
+
+EMBEDDING_DIM = 1536
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+# Provider usage across every fake, so harnesses can diff it around a turn.
+usage = Counter()
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+@dataclass
+class LatencyProfile:
+    """Mean latency (seconds) of every stubbed dependency."""
+    stt: float = 0.15
+    speech_tail: float = 0.5
+    llm_ttft: float = 0.35
+    tts_ttfb: float = 0.20
+    db: float = 0.04
+    sync_db: float = 0.04
+    embedding: float = 0.12
+    jitter: float = 0.2
+    seed: int = 7
+
+
+_profile = LatencyProfile()
+_rng = random.Random(_profile.seed)
+
+
+def configure(profile: LatencyProfile):
+    global _profile, _rng
+    _profile = profile
+    _rng = random.Random(profile.seed)
+
+
+def latency(name: str) -> float:
+    base = getattr(_profile, name)
+    if not _profile.jitter:
+        return base
+    return max(0.0, base * (1 + _rng.uniform(-_profile.jitter, _profile.jitter)))
+
+
+def fake_embedding(text: str) -> list[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [digest[i % len(digest)] / 255.0 for i in range(EMBEDDING_DIM)]
+
+
+def fake_reply(prompt: str) -> str:
+    """Deterministic short reply; the same prompt always gets the same answer."""
+    replies = [
+        "Wow, that sounds amazing! Tell me more about it.",
+        "Great question! The sky looks blue because air scatters blue light the most.",
+        "Ha! Why did the dinosaur cross the road? Because chickens weren't around yet!",
+        "A blue whale can be as long as three school buses in a row!",
+        "I love chatting with you. What should we explore next?",
+    ]
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return replies[digest[0] % len(replies)]
+
+
+# --- OpenAI ---
+
+class _FakeAsyncCompletions:
+    async def create(self, model=None, messages=None, response_format=None, **kwargs):
+        await asyncio.sleep(latency("llm_ttft"))
+        prompt = "\n".join(str(m.get("content", "")) for m in messages or [])
+        schema = (response_format or {}).get("json_schema", {}).get("name")
+        if schema == "fun_facts":
+            content = json.dumps({"facts": [f"Fun fact number {i} about this city is a happy one." for i in range(8)]})
+        elif response_format is not None:
+            content = json.dumps({"Hobbies": ["lego"], "Sports": [], "Favorite_Food": ["pizza"], "Topics": ["dinosaurs"]})
+        else:
+            content = fake_reply(prompt)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        usage.update(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=None), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        )
+
+
+class _FakeAsyncEmbeddings:
+    async def create(self, input=None, model=None, **kwargs):
+        await asyncio.sleep(latency("embedding"))
+        texts = input if isinstance(input, list) else [input]
+        tokens = sum(count_tokens(str(t)) for t in texts)
+        usage.update(embedding_calls=1, embedding_tokens=tokens)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(str(t))) for i, t in enumerate(texts)],
+            usage=SimpleNamespace(prompt_tokens=tokens),
+        )
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions())
+        self.embeddings = _FakeAsyncEmbeddings()
+
+
+# --- Supabase ---
+
+SAMPLE_PROFILE = {"name": "Sam", "age": 8, "city": "Pune", "interests": ["dinosaurs", "lego"], "birthday": "2017-03-02"}
+FAKE_PARENTAL_RULES = {"bedtime": "20:30:00", "restricted_topics": ["violence"], "language_filter": True}
+
+SAMPLE_SESSION = [
+    {"role": "user", "content": "I built a lego rocket today"},
+    {"role": "assistant", "content": "A rocket! Where is it flying to?"},
+    {"role": "user", "content": "To Mars, with my dog Biscuit"},
+]
+
+
+class _FakeQuery:
+    def __init__(self, table: str):
+        self.table = table
+        self.single_row = False
+
+    def _chain(self, *args, **kwargs):
+        return self
+
+    select = eq = order = range = limit = insert = update = upsert = delete = _chain
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    maybe_single = single
+
+    def execute(self):
+        time.sleep(latency("sync_db"))
+        if self.table == "conversation_logs":
+            rows = [{"id": i, "content": SAMPLE_SESSION, "created_at": "2025-01-01T00:00:00Z"} for i in range(5)]
+        else:
+            rows = []
+        if self.single_row:
+            return SimpleNamespace(data=rows[0] if rows else None)
+        return SimpleNamespace(data=rows)
+
+
+class FakeSupabaseClient:
+    def table(self, name: str):
+        return _FakeQuery(name)
+
+    def rpc(self, name: str, params: dict | None = None):
+        return _FakeQuery(f"rpc:{name}")
+
+
+class FakeSupabaseHelper:
+    """Async surface of `SupabaseHelper` with canned data."""
+
+    def __init__(self):
+        self.client = FakeSupabaseClient()
+
+    async def _wait(self):
+        await asyncio.sleep(latency("db"))
+
+    async def fetch_child_profile(self, device_id: str):
+        await self._wait()
+        return dict(SAMPLE_PROFILE)
+
+    async def fetch_toy_personality(self, child_id: str):
+        await self._wait()
+        return {"energy": 0.9, "humor": 0.8, "curiosity": 0.7, "empathy": 0.95, "role_identity": "Cheerful Friend"}
+
+    async def set_toy_personality(self, personality: str, child_id: str):
+        await self._wait()
+        return {}
+
+    async def fetch_parental_rules(self, child_id: str):
+        await self._wait()
+        return dict(FAKE_PARENTAL_RULES)
+
+    async def update_parental_rule(self, device_id: str, rule: dict) -> bool:
+        await self._wait()
+        return True
+
+    async def set_interests(self, user_id: str, category: str, items: list[str]):
+        await self._wait()
+
+    async def merge_interests(self, user_id: str, interests: dict[str, list[str]], max_items: int = 25):
+        await self._wait()
+        return {category: items[-max_items:] for category, items in interests.items() if items}
+
+    async def get_interests(self, child_id: str):
+        await self._wait()
+        return {"Topics": ["dinosaurs"], "Hobbies": ["lego"]}
+
+    async def log_conversation(self, child_id: str, content: list, embedding: list, session_id: str | None = None):
+        await self._wait()
+
+    async def get_last_n_conversations(self, child_id: str, n: int):
+        await self._wait()
+        return [{"content": SAMPLE_SESSION, "created_at": "2025-01-01T00:00:00Z"} for _ in range(n)]
+
+    async def match_conversations(self, child_id: str, embedding: list, match_threshold: float = 0.50, match_count: int = 5):
+        await self._wait()
+        return [{"content": SAMPLE_SESSION, "similarity": 0.8}]
+
+    async def fetch_pregenerated_greeting(self, device_id: str):
+        await self._wait()
+        from tools.greeting_precompute import rules_fingerprint
+        return {"text": "Hi Sam! Did your lego rocket make it to Mars?", "tts_pitch": None,
+                "rules_hash": rules_fingerprint(FAKE_PARENTAL_RULES)}
+
+    async def save_pregenerated_greeting(self, device_id: str, text: str, tts_pitch: str | None = None,
+                                         rules_hash: str | None = None) -> bool:
+        await self._wait()
+        return True
+
+    async def mark_greeting_used(self, device_id: str):
+        await self._wait()
+
+    async def list_devices_needing_greeting(self, limit: int = 100) -> list[str]:
+        await self._wait()
+        return []
+
+    async def fetch_fun_facts(self, city_key: str, age_band: str, max_age_hours: float, limit: int) -> list[str]:
+        await self._wait()
+        return [f"{city_key.title()} has more trees than you could count in a whole day.",
+                f"Kids in {city_key.title()} love flying kites on windy afternoons."]
+
+    async def save_fun_facts(self, city_key: str, age_band: str, facts: list[str]):
+        await self._wait()
+
+    async def list_popular_cities(self, limit: int = 50, sample: int = 5000) -> list[str]:
+        await self._wait()
+        return ["pune"]
+
+
+# --- TTS ---
+
+class _FakeSynthesis:
+    """`ChunkedStream` stand-in: 20ms frames of silence, ~65ms of audio per word."""
+
+    def __init__(self, text: str, sample_rate: int = 24000):
+        self.text = text
+        self.sample_rate = sample_rate
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        await asyncio.sleep(latency("tts_ttfb"))
+        usage.update(tts_calls=1, tts_chars=len(self.text))
+        samples = self.sample_rate // 50
+        for _ in range(max(1, len(self.text.split()) * 13 // 4)):
+            frame = rtc.AudioFrame(
+                data=b"\x00\x00" * samples, sample_rate=self.sample_rate, num_channels=1, samples_per_channel=samples,
+            )
+            yield SimpleNamespace(frame=frame)
+
+
+class FakeTTS:
+    capabilities = SimpleNamespace(streaming=False)
+
+    def synthesize(self, text: str, **kwargs):
+        return _FakeSynthesis(text)
+
+
+# --- LiveKit ---
+
+class FakeRoom:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeParticipant:
+    def __init__(self, identity: str, metadata: dict | None = None):
+        self.identity = identity
+        self.metadata = json.dumps(metadata or {})
+
+
+class FakeJobContext:
+    def __init__(self, room_name: str):
+        self.room = FakeRoom(room_name)
+        self.job = SimpleNamespace(id=f"job-{room_name}")
+        # What prewarm leaves behind; no VAD or turn detector without audio.
+        self.proc = SimpleNamespace(userdata={"vad": None, "turn_detector": None})
+
+
+async def fake_llm_node(agent, chat_ctx, tools, model_settings):
+    """Replaces `Agent.default.llm_node`: streams a deterministic reply word by word."""
+    prompt = "\n".join(item.text_content or "" for item in chat_ctx.items if item.type == "message")
+    await asyncio.sleep(latency("llm_ttft"))
+    text = fake_reply(prompt)
+    usage.update(llm_calls=1, prompt_tokens=count_tokens(prompt), completion_tokens=count_tokens(text))
+    for i, word in enumerate(text.split(" ")):
+        yield llm.ChatChunk(id="bench", delta=llm.ChoiceDelta(role="assistant", content=word if i == 0 else f" {word}"))
+
+
+async def fake_tts_node(agent, text, model_settings):
+    """Replaces `Agent.default.tts_node`: like its StreamAdapter, one sentence at a time."""
+    buffer = ""
+    async for piece in text:
+        buffer += piece
+        *sentences, buffer = re.split(r"(?<=[.!?])\s+", buffer)
+        for sentence in sentences:
+            async with FakeTTS().synthesize(sentence) as stream:
+                async for event in stream:
+                    yield event.frame
+    if buffer.strip():
+        async with FakeTTS().synthesize(buffer) as stream:
+            async for event in stream:
+                yield event.frame
+
+
+class FakeAgentSession:
+    """
+    Stand-in for `AgentSession` that drives agents without audio or a room.
+    Every session registers itself under its device_id so a harness can pick
+    it up after `handle_participant` returns.
+    """
+    registry: dict = {}
+
+    def __class_getitem__(cls, item):
+        return cls
+
+    def __init__(self, userdata=None, **kwargs):
+        self.userdata = userdata
+        self.current_agent = None
+        self.agents = []
+        self._handlers = defaultdict(list)
+        self._pending = None
+        self._closed = False
+        self.first_audio_at = None
+        self.tts = FakeTTS()
+        self.conn_options = SimpleNamespace(tts_conn_options=None)
+        if userdata is not None:
+            FakeAgentSession.registry[userdata.device_id] = self
+
+    def on(self, event: str, callback=None):
+        if callback is None:
+            def decorator(fn):
+                self._handlers[event].append(fn)
+                return fn
+            return decorator
+        self._handlers[event].append(callback)
+        return callback
+
+    def off(self, event: str, callback):
+        if callback in self._handlers[event]:
+            self._handlers[event].remove(callback)
+
+    def emit(self, event: str, *args):
+        for handler in list(self._handlers[event]):
+            handler(*args)
+
+    async def start(self, room=None, agent=None, **kwargs):
+        await self._activate(agent)
+
+    def update_options(self, **kwargs):
+        self.options = kwargs
+
+    def update_agent(self, agent):
+        # The app both awaits and ignores this call, so hand back a task.
+        self._pending = asyncio.ensure_future(self._activate(agent))
+        return self._pending
+
+    async def _activate(self, agent):
+        previous = self.current_agent
+        if previous is not None:
+            await previous.on_exit()
+        agent.__dict__["_bench_session"] = self
+        self.current_agent = agent
+        self.agents.append(agent)
+        self.emit("agent_changed", agent)
+        await agent.on_enter()
+
+    async def _settle(self):
+        while self._pending is not None and not self._pending.done():
+            await self._pending
+
+    async def generate_reply(self, *, user_input=None, instructions=None, **kwargs):
+        agent = self.current_agent
+        if user_input:
+            agent._chat_ctx.add_message(role="user", content=user_input)
+        chat_ctx = agent._chat_ctx.copy()
+        chat_ctx.items.insert(0, llm.ChatMessage(
+            role="system", content=["\n".join([agent.instructions, instructions or ""])],
+        ))
+        # Goes through the agent's own llm_node and tts_node, so overrides
+        # (guards, caches, chunking) run.
+        parts = []
+
+        async def text_stream():
+            async for chunk in agent.llm_node(chat_ctx, [], None):
+                if isinstance(chunk, str):
+                    piece = chunk
+                elif chunk.delta is not None and chunk.delta.content:
+                    piece = chunk.delta.content
+                else:
+                    continue
+                parts.append(piece)
+                yield piece
+
+        first_audio_at = None
+        async for _ in agent.tts_node(text_stream(), None):
+            if first_audio_at is None:
+                first_audio_at = time.perf_counter()
+                if self.first_audio_at is None:
+                    self.first_audio_at = first_audio_at
+                self.emit("agent_state_changed", SimpleNamespace(
+                    old_state="thinking", new_state="speaking", created_at=time.time()))
+        text = "".join(parts).strip()
+        usage.update(replies=1)
+        item = agent._chat_ctx.add_message(role="assistant", content=text)
+        self.emit("conversation_item_added", SimpleNamespace(item=item))
+        return SimpleNamespace(text=text, first_audio_at=first_audio_at or time.perf_counter())
+
+    def say(self, text: str, audio=None, **kwargs):
+        # Like a SpeechHandle: playback starts now, awaiting it is optional.
+        return asyncio.ensure_future(self._say(text, audio))
+
+    async def _say(self, text: str, audio=None):
+        if audio is not None:
+            # Pre-rendered audio: no TTS round trip before the first frame.
+            async for _ in audio:
+                break
+            usage.update(tts_cached_chars=len(text))
+        else:
+            await asyncio.sleep(latency("tts_ttfb"))
+            usage.update(tts_calls=1, tts_chars=len(text))
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+        self.emit("agent_state_changed", SimpleNamespace(old_state="thinking", new_state="speaking", created_at=time.time()))
+        item = self.current_agent._chat_ctx.add_message(role="assistant", content=text)
+        self.emit("conversation_item_added", SimpleNamespace(item=item))
+        return SimpleNamespace(text=text)
+
+    async def user_turn(self, text: str, tool: str | None = None, args: dict | None = None,
+                        tool_calls: list[dict] | None = None) -> float:
+        """
+        Simulate one child utterance, optionally followed by the tool calls the
+        LLM made for it. Returns the seconds from end of speech to the first
+        audio of the reply.
+        """
+        if tool:
+            tool_calls = [{"name": tool, "arguments": args or {}}]
+        # Interim transcripts while the child speaks, then the silence VAD waits out.
+        words = text.split()
+        for n in sorted({max(1, len(words) // 2), len(words)}):
+            self.emit("user_input_transcribed", SimpleNamespace(
+                transcript=" ".join(words[:n]), is_final=False, created_at=time.time()))
+        await asyncio.sleep(latency("speech_tail"))
+        started = time.perf_counter()
+        self.emit("user_state_changed", SimpleNamespace(old_state="speaking", new_state="listening", created_at=time.time()))
+        await asyncio.sleep(latency("stt"))
+        await self._settle()
+        agent = self.current_agent
+        message = agent._chat_ctx.add_message(role="user", content=text)
+        self.emit("user_input_transcribed", SimpleNamespace(transcript=text, is_final=True, created_at=time.time()))
+        # Like AgentActivity: a mutable copy, and a step's tool calls run concurrently.
+        await agent.on_user_turn_completed(agent.chat_ctx.copy(), message)
+        await self._settle()
+        if tool_calls:
+            agent = self.current_agent
+            await asyncio.gather(*(
+                self._call_tool(agent, call["name"], call.get("arguments") or {}) for call in tool_calls
+            ))
+            await self._settle()
+        reply = await self.generate_reply()
+        return reply.first_audio_at - started
+
+    async def _call_tool(self, agent, name: str, args: dict):
+        from livekit.agents.llm.tool_context import get_raw_function_info, is_raw_function_tool
+
+        context = SimpleNamespace(userdata=self.userdata, session=self)
+        fn = getattr(agent, name, None)
+        if fn is not None:
+            kwargs = {"context": context, **args} if "context" in inspect.signature(fn).parameters else args
+            result = await fn(**kwargs)
+        else:
+            raw = next(
+                (t for t in agent.tools if is_raw_function_tool(t) and get_raw_function_info(t).name == name),
+                None,
+            )
+            if raw is None:
+                raise AttributeError(f"{type(agent).__name__} has no tool {name!r}")
+            result = await raw(raw_arguments=args, context=context)
+        self.emit("function_tools_executed", SimpleNamespace(
+            function_calls=[SimpleNamespace(name=name, arguments=json.dumps(args, default=str))],
+        ))
+        return result
+
+    @property
+    def history(self):
+        return self.current_agent._chat_ctx if self.current_agent is not None else llm.ChatContext()
+
+    async def aclose(self, reason: str = "benchmark"):
+        if self._closed:
+            return
+        self._closed = True
+        for agent in self.agents:
+            timer = getattr(agent, "_exit_timer", None)
+            if timer and not timer.done():
+                timer.cancel()
+        if self._pending and not self._pending.done():
+            self._pending.cancel()
+        self.emit("close", SimpleNamespace(reason=reason))
+
+
+def install(profile: LatencyProfile | None = None):
+    """
+    Import the app with every provider stubbed out and return the `main` module.
+    """
+    configure(profile or LatencyProfile())
+    for key, value in STUB_ENV.items():
+        os.environ.setdefault(key, value)
+
+    from livekit.agents import Agent
+    Agent.default.llm_node = fake_llm_node
+    Agent.default.tts_node = fake_tts_node
+
+    original_session = Agent.__dict__["session"]
+    if not getattr(original_session.fget, "_benchmark_patch", False):
+        def _session(agent):
+            bench = agent.__dict__.get("_bench_session")
+            return bench if bench is not None else original_session.fget(agent)
+        _session._benchmark_patch = True
+        Agent.session = property(_session)
+
+    import main
+    import agents.parental_mode_agent
+    import tools.agent_tools
+    import tools.finalize_queue
+    import tools.fun_facts
+    import tools.model_registry
+    import tools.parental_agent_tools
+    import tools.shared_cache
+    import tools.summariser_tool
+    import tools.tts_cache
+
+    main.AgentSession = FakeAgentSession
+    main.db_helper = FakeSupabaseHelper()
+    tools.summariser_tool.SupabaseHelper = FakeSupabaseHelper
+    tools.agent_tools.db = FakeSupabaseHelper()
+    tools.model_registry.client = FakeAsyncOpenAI()
+    tools.fun_facts._store = tools.fun_facts.FunFactStore(FakeSupabaseHelper())
+    tools.tts_cache._cache = tools.tts_cache.TtsCache(
+        tempfile.mkdtemp(prefix="bench_tts_"), memory_bytes=8 << 20, disk_bytes=64 << 20,
+        tts_factory=lambda pitch: FakeTTS(),
+    )
+    # Fresh per run, so earlier runs' summaries and vectors don't skew the numbers.
+    tools.shared_cache._cache = tools.shared_cache.SharedCache(
+        os.path.join(tempfile.mkdtemp(prefix="bench_shared_"), "cache.sqlite3"), max_bytes=64 << 20,
+    )
+    tools.finalize_queue._queue = tools.finalize_queue.FinalizeQueue(
+        os.path.join(tempfile.mkdtemp(prefix="bench_finalize_"), "queue.sqlite3"),
+    )
+    agents.parental_mode_agent.SupabaseHelper = FakeSupabaseHelper
+    tools.parental_agent_tools.SupabaseHelper = FakeSupabaseHelper
+    return main
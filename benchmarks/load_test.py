@@ -0,0 +1,217 @@
+"""
+In-process load generator.
+
+Simulates N concurrent children joining through `main.handle_participant` and
+talking to the agents with every provider stubbed (see benchmarks/fakes.py).
+Each concurrency level reports throughput, turn latency, event-loop lag and
+memory per session, and the run reports the level where latency degrades.
+
+    python -m benchmarks.load_test --levels 1,5,10,25,50 --turns 6
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import random
+import resource
+import time
+
+from benchmarks import fakes
+from tools.loop_monitor import start_loop_monitor
+
+logger = logging.getLogger("benchmarks.load_test")
+
+DEFAULT_SCRIPT = [
+    {"text": "Hi! Guess what, I saw a T-rex at the museum today"},
+    {"text": "Why is the sky blue?"},
+    {"text": "Do you remember what my dog is called?", "tool": "extract_data", "args": {"query": "dog name"}},
+    {"text": "Tell me a joke about dinosaurs"},
+    {"text": "How big is a blue whale?"},
+    {"text": "Okay bye, I want to stop now", "tool": "exit"},
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LagProbe:
+    """Measures how late a periodic timer fires, plus peak RSS while running."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self.peak_rss = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+
+
+async def run_participant(main, device_id: str, script: list[dict], think_time: float, delay: float, stats: dict):
+    await asyncio.sleep(delay)
+    participant = fakes.FakeParticipant(identity=device_id, metadata={"isNewUser": False})
+    ctx = fakes.FakeJobContext(room_name=f"room-{device_id}")
+    session = None
+    try:
+        started = time.perf_counter()
+        await main.handle_participant(ctx, participant)
+        stats["join"].append(time.perf_counter() - started)
+        session = fakes.FakeAgentSession.registry.pop(device_id)
+        if session.first_audio_at is not None:
+            stats["first_audio"].append(session.first_audio_at - started)
+        for turn in script:
+            await asyncio.sleep(random.uniform(0, think_time))
+            stats["turns"].append(await session.user_turn(**turn))
+    except Exception:
+        logger.exception(f"Simulated participant {device_id} failed")
+        stats["errors"] += 1
+    finally:
+        if session is not None:
+            await session.aclose()
+
+
+async def run_level(main, sessions: int, script: list[dict], think_time: float, ramp: float) -> dict:
+    gc.collect()
+    baseline_rss = rss_bytes()
+    stats = {"join": [], "first_audio": [], "turns": [], "errors": 0}
+    probe = LagProbe()
+    probe_task = asyncio.create_task(probe.run())
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_participant(main, f"load-{sessions}-{i}", script, think_time, ramp * i / sessions, stats)
+        for i in range(sessions)
+    ])
+    wall = time.perf_counter() - started
+    probe_task.cancel()
+
+    return {
+        "sessions": sessions,
+        "turns": len(stats["turns"]),
+        "errors": stats["errors"],
+        "wall_s": round(wall, 3),
+        "throughput_turns_s": round(len(stats["turns"]) / wall, 2) if wall else 0.0,
+        "join_p50_s": round(percentile(stats["join"], 50), 3),
+        "join_p95_s": round(percentile(stats["join"], 95), 3),
+        "first_audio_p95_s": round(percentile(stats["first_audio"], 95), 3),
+        "turn_p50_s": round(percentile(stats["turns"], 50), 3),
+        "turn_p95_s": round(percentile(stats["turns"], 95), 3),
+        "turn_p99_s": round(percentile(stats["turns"], 99), 3),
+        "loop_lag_p50_ms": round(percentile(probe.samples, 50) * 1000, 1),
+        "loop_lag_p99_ms": round(percentile(probe.samples, 99) * 1000, 1),
+        "loop_lag_max_ms": round(max(probe.samples, default=0.0) * 1000, 1),
+        "mem_per_session_kb": round(max(0, probe.peak_rss - baseline_rss) / sessions / 1024, 1),
+    }
+
+
+def find_knee(results: list[dict], degrade_factor: float, max_lag_ms: float) -> dict | None:
+    """First level whose p95 turn latency or loop lag crosses the thresholds."""
+    if not results:
+        return None
+    baseline = results[0]["turn_p95_s"] or 1e-9
+    for result in results[1:]:
+        if result["turn_p95_s"] > baseline * degrade_factor or result["loop_lag_p99_ms"] > max_lag_ms:
+            return result
+    return None
+
+
+def print_report(results: list[dict], knee: dict | None, degrade_factor: float, max_lag_ms: float):
+    columns = [
+        ("sessions", "sessions"), ("turns/s", "throughput_turns_s"), ("join p95", "join_p95_s"),
+        ("first audio p95", "first_audio_p95_s"),
+        ("turn p50", "turn_p50_s"), ("turn p95", "turn_p95_s"), ("turn p99", "turn_p99_s"),
+        ("lag p99 ms", "loop_lag_p99_ms"), ("lag max ms", "loop_lag_max_ms"),
+        ("KB/session", "mem_per_session_kb"), ("errors", "errors"),
+    ]
+    print("  ".join(f"{title:>10}" for title, _ in columns))
+    for result in results:
+        print("  ".join(f"{result[key]:>10}" for _, key in columns))
+    if knee:
+        print(
+            f"\nLatency degrades at {knee['sessions']} concurrent sessions "
+            f"(turn p95 {knee['turn_p95_s']}s vs baseline {results[0]['turn_p95_s']}s, "
+            f"loop lag p99 {knee['loop_lag_p99_ms']}ms)."
+        )
+    else:
+        print(
+            f"\nNo degradation up to {results[-1]['sessions']} sessions "
+            f"(thresholds: p95 x{degrade_factor}, loop lag p99 {max_lag_ms}ms)."
+        )
+
+
+async def run(args):
+    profile = fakes.LatencyProfile(
+        llm_ttft=args.llm_latency,
+        tts_ttfb=args.tts_latency,
+        embedding=args.embedding_latency,
+        db=args.db_latency,
+        sync_db=args.db_latency,
+    )
+    main = fakes.install(profile)
+    if args.log_level:
+        # main.py pins the livekit loggers to DEBUG; leave that alone unless asked.
+        for name in ("", "livekit", "livekit.agents"):
+            logging.getLogger(name).setLevel(args.log_level)
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    script = script[:args.turns] if args.turns else script
+
+    monitor = start_loop_monitor(threshold=args.max_lag_ms / 1000, log_interval=3600)
+    results = []
+    for sessions in args.levels:
+        logger.warning(f"Running load level: {sessions} sessions x {len(script)} turns")
+        results.append(await run_level(main, sessions, script, args.think_time, args.ramp))
+
+    knee = find_knee(results, args.degrade_factor, args.max_lag_ms)
+    print_report(results, knee, args.degrade_factor, args.max_lag_ms)
+    blocking_sites = monitor.top_sites()
+    if blocking_sites:
+        print("\nTop event-loop blocking sites:")
+        for site, count in blocking_sites:
+            print(f"{count:>8}  {site}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"levels": results, "knee": knee, "blocking_sites": blocking_sites}, f, indent=2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load generator for handle_participant.")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 5, 10, 25, 50])
+    parser.add_argument("--turns", type=int, default=0, help="Limit the script to the first N turns.")
+    parser.add_argument("--script", help="JSON list of turns: {text, tool?, args?}.")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Max random pause between turns (s).")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Spread joins over this many seconds.")
+    parser.add_argument("--llm-latency", type=float, default=0.35)
+    parser.add_argument("--tts-latency", type=float, default=0.20)
+    parser.add_argument("--embedding-latency", type=float, default=0.12)
+    parser.add_argument("--db-latency", type=float, default=0.04)
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    parser.add_argument("--max-lag-ms", type=float, default=100.0)
+    parser.add_argument("--log-level", help="Override app log levels (default: keep main.py's).")
+    parser.add_argument("--json", help="Write the report to this file.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,189 @@
+"""
+Recorded-session replay benchmark.
+
+Replays PII-scrubbed recordings (written by tools/session_recorder.py when
+SESSION_RECORDING_DIR is set) through `main.handle_participant` and the agent
+stack with deterministic fake providers. Produces a per-turn latency / token
+report; pass a previous report as --baseline to flag regressions such as
+extra hidden LLM turns or prompt growth.
+
+    python -m benchmarks.replay benchmarks/recordings/*.json --out report.json
+    python -m benchmarks.replay benchmarks/recordings/*.json --baseline report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+
+from benchmarks import fakes
+
+logger = logging.getLogger("benchmarks.replay")
+
+# Placeholders written by PiiScrubber, mapped back to the fake child's data.
+PLACEHOLDERS = {
+    "<NAME>": fakes.SAMPLE_PROFILE["name"],
+    "<CITY>": fakes.SAMPLE_PROFILE["city"],
+    "<DOB>": fakes.SAMPLE_PROFILE["birthday"],
+    "<EMAIL>": "someone@example.com",
+    "<PHONE>": "555 0100",
+}
+
+TRACKED_USAGE = ("replies", "llm_calls", "prompt_tokens", "completion_tokens", "embedding_calls", "tts_chars")
+
+
+def restore(value, device_id: str):
+    if isinstance(value, str):
+        for placeholder, fake in {**PLACEHOLDERS, "<DEVICE>": device_id}.items():
+            value = value.replace(placeholder, fake)
+        return value
+    if isinstance(value, list):
+        return [restore(v, device_id) for v in value]
+    if isinstance(value, dict):
+        return {k: restore(v, device_id) for k, v in value.items()}
+    return value
+
+
+def agent_name(session) -> str | None:
+    return type(session.current_agent).__name__ if session and session.current_agent else None
+
+
+def turn_entry(index: int, kind: str, started_wall: float, started_cpu: float, before: Counter, **extra) -> dict:
+    delta = fakes.usage - before
+    entry = {
+        "turn": index,
+        "kind": kind,
+        "latency_s": round(time.perf_counter() - started_wall, 3),
+        "cpu_ms": round((time.process_time() - started_cpu) * 1000, 2),
+        **{key: delta.get(key, 0) for key in TRACKED_USAGE},
+    }
+    entry["hidden_replies"] = max(0, entry["replies"] - 1)
+    entry.update(extra)
+    return entry
+
+
+async def replay_recording(main, recording: dict) -> dict:
+    device_id = f"replay-{recording['session_id']}"
+    participant = fakes.FakeParticipant(identity=device_id, metadata={"isNewUser": recording.get("is_new_user", False)})
+    ctx = fakes.FakeJobContext(room_name=f"room-{device_id}")
+    turns = []
+
+    before, wall, cpu = fakes.usage.copy(), time.perf_counter(), time.process_time()
+    await main.handle_participant(ctx, participant)
+    session = fakes.FakeAgentSession.registry.pop(device_id)
+    await session._settle()
+    turns.append(turn_entry(0, "join", wall, cpu, before, agent=agent_name(session)))
+
+    try:
+        for index, recorded in enumerate(recording["turns"], start=1):
+            agent_before = agent_name(session)
+            before, wall, cpu = fakes.usage.copy(), time.perf_counter(), time.process_time()
+            error = None
+            latency = {}
+            try:
+                # End of speech -> first audio, like the recorded latency_s.
+                latency["latency_s"] = round(await session.user_turn(
+                    restore(recorded["text"], device_id),
+                    tool_calls=restore(recorded.get("tool_calls") or [], device_id),
+                ), 3)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Turn {index} of {recording['session_id']} failed: {error}")
+            turns.append(turn_entry(
+                index, "user", wall, cpu, before,
+                agent=agent_before,
+                agent_after=agent_name(session),
+                recorded_agent=recorded.get("agent"),
+                recorded_latency_s=recorded.get("latency_s"),
+                error=error,
+                **latency,
+            ))
+    finally:
+        await session.aclose()
+
+    totals = {key: sum(t[key] for t in turns) for key in (*TRACKED_USAGE, "hidden_replies", "latency_s", "cpu_ms")}
+    return {"turns": turns, "totals": totals}
+
+
+def compare(report: dict, baseline: dict, latency_tolerance: float, token_tolerance: float) -> list[str]:
+    """Return human-readable regressions of `report` against `baseline`."""
+    regressions = []
+    for session_id, result in report["recordings"].items():
+        old = baseline.get("recordings", {}).get(session_id)
+        if old is None:
+            continue
+        old_turns = {t["turn"]: t for t in old["turns"]}
+        for turn in result["turns"]:
+            prev = old_turns.get(turn["turn"])
+            if prev is None:
+                continue
+            where = f"{session_id} turn {turn['turn']} ({turn.get('agent')})"
+            if turn["replies"] > prev["replies"] or turn["llm_calls"] > prev["llm_calls"]:
+                regressions.append(
+                    f"{where}: LLM calls {prev['llm_calls']} -> {turn['llm_calls']}, "
+                    f"replies {prev['replies']} -> {turn['replies']}"
+                )
+            if turn["prompt_tokens"] > prev["prompt_tokens"] * (1 + token_tolerance):
+                regressions.append(f"{where}: prompt tokens {prev['prompt_tokens']} -> {turn['prompt_tokens']}")
+            if turn["latency_s"] > prev["latency_s"] * (1 + latency_tolerance) + 0.02:
+                regressions.append(f"{where}: latency {prev['latency_s']}s -> {turn['latency_s']}s")
+            if turn.get("agent_after") != prev.get("agent_after"):
+                regressions.append(f"{where}: handoff {prev.get('agent_after')} -> {turn.get('agent_after')}")
+    return regressions
+
+
+def print_report(report: dict):
+    columns = ("turn", "kind", "latency_s", "cpu_ms", "replies", "llm_calls", "prompt_tokens", "completion_tokens")
+    for session_id, result in report["recordings"].items():
+        print(f"\n== {session_id}")
+        print("  ".join(f"{c:>17}" for c in (*columns, "agent")))
+        for turn in result["turns"]:
+            print("  ".join(f"{turn[c]:>17}" for c in columns) + f"  {turn.get('agent_after') or turn.get('agent')}")
+        print(f"totals: {result['totals']}")
+
+
+async def run(args) -> int:
+    # Zero jitter: the same recording must produce the same numbers on every run.
+    main = fakes.install(fakes.LatencyProfile(jitter=0))
+    for name in ("", "livekit", "livekit.agents"):
+        logging.getLogger(name).setLevel(args.log_level)
+
+    report = {"generated_at": time.time(), "recordings": {}}
+    for path in args.recordings:
+        with open(path) as f:
+            recording = json.load(f)
+        report["recordings"][recording["session_id"]] = await replay_recording(main, recording)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.latency_tolerance, args.token_tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded sessions and report per-turn latency and tokens.")
+    parser.add_argument("recordings", nargs="+", help="Recording JSON files.")
+    parser.add_argument("--out", help="Write the report to this file.")
+    parser.add_argument("--baseline", help="Previous report to compare against; exits 1 on regressions.")
+    parser.add_argument("--latency-tolerance", type=float, default=0.10)
+    parser.add_argument("--token-tolerance", type=float, default=0.05)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -13,4 +13,161 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 BACKEND_URL = os.environ.get("BACKEND_URL")
 AGENT_AUTH_TOKEN = os.environ.get("AGENT_AUTH_TOKEN")
-POSTGRES_URL = os.environ.get("POSTGRES_URL")
\ No newline at end of file
+POSTGRES_URL = os.environ.get("POSTGRES_URL")
+
+# Logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LIVEKIT_LOG_LEVEL = os.environ.get("LIVEKIT_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+LOG_MAX_MESSAGE_CHARS = int(os.environ.get("LOG_MAX_MESSAGE_CHARS", 4000))
+LOG_MAX_ARG_ITEMS = int(os.environ.get("LOG_MAX_ARG_ITEMS", 50))
+
+# Performance tooling
+SESSION_RECORDING_DIR = os.environ.get("SESSION_RECORDING_DIR")
+METRICS_DIR = os.environ.get("METRICS_DIR", "/tmp/joy_agent_metrics")
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", 50))
+LOOP_MONITOR_THRESHOLD_MS = float(os.environ.get("LOOP_MONITOR_THRESHOLD_MS", 100))
+LOOP_MONITOR_LOG_INTERVAL_S = float(os.environ.get("LOOP_MONITOR_LOG_INTERVAL_S", 30))
+PROFILE_SLOW_TURNS = os.environ.get("PROFILE_SLOW_TURNS", "").lower() in ("1", "true", "yes")
+PROFILE_DEVICE_IDS = [d.strip() for d in os.environ.get("PROFILE_DEVICE_IDS", "").split(",") if d.strip()]
+PROFILE_TURN_BUDGET_MS = float(os.environ.get("PROFILE_TURN_BUDGET_MS", 1500))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/joy_agent_profiles")
+
+# Models
+# Per-task overrides of tools/model_registry.DEFAULTS: "task=model[:max_tokens[:timeout_s]],..."
+# Tasks: chat, routing, query_synthesis, summarization, interests, greeting, fun_facts, rag_agent.
+MODEL_TIERS = os.environ.get("MODEL_TIERS", "")
+
+# OpenAI calls from every session share the account's rate limits, learned
+# from response headers. Lanes: live (the child is waiting), retrieval,
+# background. Lower lanes leave this fraction of each limit to the ones
+# above, and give up after waiting this many seconds (live never does).
+OPENAI_SCHEDULER = os.environ.get("OPENAI_SCHEDULER", "true").lower() in ("1", "true", "yes")
+OPENAI_LANE_RESERVES = os.environ.get("OPENAI_LANE_RESERVES", "retrieval=0.05,background=0.25")
+OPENAI_LANE_DEADLINES = os.environ.get("OPENAI_LANE_DEADLINES", "live=2,retrieval=5,background=120")
+OPENAI_BACKGROUND_CONCURRENCY = int(os.environ.get("OPENAI_BACKGROUND_CONCURRENCY", 2))
+
+# Embedding requests from all sessions are batched for up to this long.
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", 64))
+
+# Supabase reads: deadline per read (retries included), a duplicate read
+# once a query has run longer than its recent p95, and a shared breaker
+# that serves the last value read (or a default) while PostgREST is down.
+SUPABASE_READ_DEADLINE_MS = float(os.environ.get("SUPABASE_READ_DEADLINE_MS", 1500))
+SUPABASE_READ_RETRIES = int(os.environ.get("SUPABASE_READ_RETRIES", 2))
+SUPABASE_HEDGE = os.environ.get("SUPABASE_HEDGE", "true").lower() in ("1", "true", "yes")
+SUPABASE_HEDGE_QUANTILE = float(os.environ.get("SUPABASE_HEDGE_QUANTILE", 0.95))
+SUPABASE_BREAKER_FAILURES = int(os.environ.get("SUPABASE_BREAKER_FAILURES", 5))
+SUPABASE_BREAKER_RESET_S = float(os.environ.get("SUPABASE_BREAKER_RESET_S", 30))
+# HTTP timeout of the (sync) client itself: a read abandoned at its deadline
+# still holds an executor thread until the request gives up.
+SUPABASE_CLIENT_TIMEOUT_S = float(os.environ.get("SUPABASE_CLIENT_TIMEOUT_S", 5))
+# Past-session summaries on join; the session starts without them after this.
+SUMMARY_DEADLINE_S = float(os.environ.get("SUMMARY_DEADLINE_S", 6))
+
+# Interests
+INTEREST_MAX_ITEMS = int(os.environ.get("INTEREST_MAX_ITEMS", 25))
+INTEREST_LLM_BATCH_SIZE = int(os.environ.get("INTEREST_LLM_BATCH_SIZE", 4))
+INTEREST_LLM_MAX_WAIT_S = float(os.environ.get("INTEREST_LLM_MAX_WAIT_S", 20))
+INTEREST_LLM_CONCURRENCY = int(os.environ.get("INTEREST_LLM_CONCURRENCY", 2))
+INTEREST_EXIT_FLUSH_TIMEOUT_S = float(os.environ.get("INTEREST_EXIT_FLUSH_TIMEOUT_S", 3))
+
+# Parental mode
+PARENTAL_RULE_COALESCE_MS = float(os.environ.get("PARENTAL_RULE_COALESCE_MS", 50))
+# While a child's rules can't be read the session runs under strict defaults;
+# reading them is retried in the background, backing off from this delay.
+PARENTAL_RULES_RETRY_S = float(os.environ.get("PARENTAL_RULES_RETRY_S", 2))
+PARENTAL_RULES_RETRIES = int(os.environ.get("PARENTAL_RULES_RETRIES", 8))
+CONTENT_GUARD_CLASSIFIER = os.environ.get("CONTENT_GUARD_CLASSIFIER", "")
+CONTENT_GUARD_CLASSIFIER_THRESHOLD = float(os.environ.get("CONTENT_GUARD_CLASSIFIER_THRESHOLD", 0.8))
+
+# Voice
+TTS_VOICE = os.environ.get("TTS_VOICE", "alloy")
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "/tmp/joy_agent_tts_cache")
+TTS_CACHE_MEMORY_MB = float(os.environ.get("TTS_CACHE_MEMORY_MB", 32))
+TTS_CACHE_DISK_MB = float(os.environ.get("TTS_CACHE_DISK_MB", 512))
+# Reply audio is synthesized in chunks, cut at sentence (or, for the first
+# chunk, clause) boundaries once a chunk is at least this long.
+TTS_CHUNKING = os.environ.get("TTS_CHUNKING", "true").lower() in ("1", "true", "yes")
+TTS_FIRST_CHUNK_MIN_CHARS = int(os.environ.get("TTS_FIRST_CHUNK_MIN_CHARS", 12))
+TTS_CHUNK_MIN_CHARS = int(os.environ.get("TTS_CHUNK_MIN_CHARS", 40))
+TTS_CHUNK_MAX_CHARS = int(os.environ.get("TTS_CHUNK_MAX_CHARS", 220))
+TTS_CHUNK_MAX_PARALLEL = int(os.environ.get("TTS_CHUNK_MAX_PARALLEL", 3))
+
+# Turn taking
+# "multilingual", "english" (smaller model) or "vad" for silence timeouts only.
+TURN_DETECTION = os.environ.get("TURN_DETECTION", "multilingual").lower()
+# age band -> endpointing delays in seconds, "ages=min:max". With the turn
+# detector, min applies when it thinks the child is done and max when it
+# thinks they are mid-sentence; younger children pause longer.
+ENDPOINTING_AGE_BANDS = os.environ.get("ENDPOINTING_AGE_BANDS", "3-6=0.8:5.0,7-9=0.6:4.0,10-14=0.5:3.0")
+MIN_ENDPOINTING_DELAY = float(os.environ.get("MIN_ENDPOINTING_DELAY", 0.6))
+MAX_ENDPOINTING_DELAY = float(os.environ.get("MAX_ENDPOINTING_DELAY", 4.0))
+
+# Opt-in: let the session start the reply on the final transcript, before
+# the end of the turn is confirmed (AgentSession's preemptive_generation).
+PREEMPTIVE_REPLIES = os.environ.get("PREEMPTIVE_REPLIES", "false").lower() in ("1", "true", "yes")
+
+# Opt-in: answer general questions ("why is the sky blue?") from answers
+# already generated for other children of the same age band and toy
+# personality, when the question embeddings are at least this similar.
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.92))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 2000))
+ANSWER_CACHE_TTL_H = float(os.environ.get("ANSWER_CACHE_TTL_H", 24))
+ANSWER_CACHE_MAX_WORDS = int(os.environ.get("ANSWER_CACHE_MAX_WORDS", 15))
+# Longest the question embedding may hold up a turn before generating anyway.
+ANSWER_CACHE_LOOKUP_MS = float(os.environ.get("ANSWER_CACHE_LOOKUP_MS", 300))
+
+# Fun facts
+FUN_FACT_POOL_SIZE = int(os.environ.get("FUN_FACT_POOL_SIZE", 8))
+FUN_FACT_TTL_H = float(os.environ.get("FUN_FACT_TTL_H", 24 * 14))
+FUN_FACT_REFILL_BELOW = int(os.environ.get("FUN_FACT_REFILL_BELOW", 2))
+# How long get_fun_fact may wait for a pool still loading from the database
+# (never for generation).
+FUN_FACT_READ_WAIT_MS = float(os.environ.get("FUN_FACT_READ_WAIT_MS", 150))
+
+# A session that drops (not one the child ended) is snapshotted here and
+# resumed, without bootstrap or greeting, if the device rejoins in time.
+SESSION_SNAPSHOTS = os.environ.get("SESSION_SNAPSHOTS", "true").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "/tmp/joy_agent_snapshots")
+SNAPSHOT_TTL_S = float(os.environ.get("SNAPSHOT_TTL_S", 300))
+SNAPSHOT_MAX_ITEMS = int(os.environ.get("SNAPSHOT_MAX_ITEMS", 40))
+
+# Memory lookups (extract_data): pgvector candidates plus BM25 over the
+# child's recent sessions, fused and trimmed to the best sentences.
+RAG_VECTOR_THRESHOLD = float(os.environ.get("RAG_VECTOR_THRESHOLD", 0.35))
+RAG_VECTOR_CANDIDATES = int(os.environ.get("RAG_VECTOR_CANDIDATES", 10))
+RAG_MEMORY_SESSIONS = int(os.environ.get("RAG_MEMORY_SESSIONS", 20))
+RAG_MAX_PASSAGES = int(os.environ.get("RAG_MAX_PASSAGES", 6))
+RAG_MAX_CHARS = int(os.environ.get("RAG_MAX_CHARS", 600))
+# Sentences re-ranked by their own embedding (0 turns it off).
+RAG_RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", 24))
+
+# Post-session work (interests, embedding, conversation log, next greeting)
+# goes through a durable local queue processed by the worker process.
+FINALIZE_QUEUE = os.environ.get("FINALIZE_QUEUE", "true").lower() in ("1", "true", "yes")
+FINALIZE_QUEUE_PATH = os.environ.get("FINALIZE_QUEUE_PATH", "/var/tmp/joy_agent_finalize.sqlite3")
+FINALIZE_BATCH_SIZE = int(os.environ.get("FINALIZE_BATCH_SIZE", 16))
+FINALIZE_WORKERS = int(os.environ.get("FINALIZE_WORKERS", 2))
+FINALIZE_MAX_ATTEMPTS = int(os.environ.get("FINALIZE_MAX_ATTEMPTS", 8))
+FINALIZE_BACKOFF_S = float(os.environ.get("FINALIZE_BACKOFF_S", 5))
+
+# Cache shared by every job process on the host (SQLite, WAL mode). It holds
+# children's profile data: its files are 0600, and its directory is created
+# 0700, so point it at a directory of its own.
+SHARED_CACHE = os.environ.get("SHARED_CACHE", "true").lower() in ("1", "true", "yes")
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "/tmp/joy_agent_shared_cache/cache.sqlite3")
+SHARED_CACHE_MAX_MB = float(os.environ.get("SHARED_CACHE_MAX_MB", 256))
+# How long each kind of entry is kept: last-good Supabase reads (served only
+# while the backend fails), embeddings, and per-transcript summaries.
+SHARED_CACHE_LAST_GOOD_TTL_H = float(os.environ.get("SHARED_CACHE_LAST_GOOD_TTL_H", 24))
+SHARED_CACHE_EMBEDDING_TTL_H = float(os.environ.get("SHARED_CACHE_EMBEDDING_TTL_H", 24 * 7))
+SHARED_CACHE_SUMMARY_TTL_H = float(os.environ.get("SHARED_CACHE_SUMMARY_TTL_H", 24 * 30))
+
+# Greetings
+PREGENERATED_GREETINGS = os.environ.get("PREGENERATED_GREETINGS", "true").lower() in ("1", "true", "yes")
+GREETING_PRECOMPUTE_AUDIO = os.environ.get("GREETING_PRECOMPUTE_AUDIO", "true").lower() in ("1", "true", "yes")
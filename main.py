@@ -2,134 +2,322 @@ import asyncio
 import json
 import logging
 import os
+import sys
 from aiohttp import web
 
 from livekit import rtc
-from livekit.agents import JobContext, JobRequest, AgentSession, Worker, WorkerOptions
+from livekit.agents import JobContext, JobProcess, JobRequest, AgentSession, Plugin, Worker, WorkerOptions
 from livekit.plugins import silero
-from livekit.plugins.openai import LLM as OpenAI_LLM, TTS as OpenAI_TTS
+from livekit.plugins.openai import TTS as OpenAI_TTS
 from livekit.plugins.deepgram import STT as Deepgram_STT
 
 import config
 from tools.supabase_tools import SupabaseHelper
 from tools.summariser_tool import summarize_last_sessions, archive_nth_last_session
+from tools.session_recorder import SessionRecorder
+from tools.loop_monitor import start_loop_monitor
+from tools.turn_profiler import SessionProfiler, profiling_enabled
+from tools import metrics, model_registry
+from tools.log_setup import setup_logging, install_job_filters, log_event
+from tools.interest_matcher import InterestTracker, apply_to_session
+from tools.content_guard import STRICT_RULES, ContentGuard, load_classifier
+from tools.tts_cache import get_tts_cache
+from tools.turn_taking import configure_turn_taking, load_turn_detector
+from tools.session_snapshot import get_snapshot_store, restore, save_on_close
+from tools.finalize_queue import get_finalize_queue
+from tools.greeting_precompute import rules_fingerprint, vet_greeting
+from tools.agent_tools import finalize_on_close, finalize_sessions
+from prompts.system_prompts import CACHED_PHRASES
 from agents.session_data import SessionData
 from agents.conversation_starter_agent import ConversationStarterAgent
+from agents.conversation_continuation_agent import ConversationContinuationAgent
 from agents.user_agent import UserAgent
 from tools.agent_personality import personalities
 from agents.router_agent import RouterAgent
 
 # --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)-8s %(name)s %(message)s",
+setup_logging(
+    level=config.LOG_LEVEL,
+    livekit_level=config.LIVEKIT_LOG_LEVEL,
+    as_json=config.LOG_FORMAT == "json",
+    sample_rates=config.LOG_SAMPLE_RATES,
+    max_chars=config.LOG_MAX_MESSAGE_CHARS,
+    max_items=config.LOG_MAX_ARG_ITEMS,
 )
-logging.getLogger("livekit").setLevel(logging.DEBUG)
-logging.getLogger("livekit.agents").setLevel(logging.DEBUG)
 logger = logging.getLogger("main")
 
 # --- Initialize global services ---
-llm = OpenAI_LLM(api_key=config.OPENAI_API_KEY)
+llm = model_registry.livekit_llm("chat")
 stt = Deepgram_STT(api_key=config.DEEPGRAM_API_KEY)
-tts = OpenAI_TTS(api_key=config.OPENAI_API_KEY, voice="alloy")
-vad = silero.VAD.load()
+tts = OpenAI_TTS(api_key=config.OPENAI_API_KEY, voice=config.TTS_VOICE)
 db_helper = SupabaseHelper()
+guard_classifier = load_classifier(config.CONTENT_GUARD_CLASSIFIER)
+_metrics_publisher = None
+_background_tasks = set()
+_finalizer = None
+
+
+def start_process_monitoring():
+    """Loop watchdog + metrics snapshot publisher, once per process (every job runs in its own)."""
+    global _metrics_publisher
+    start_loop_monitor(
+        interval=config.LOOP_MONITOR_INTERVAL_MS / 1000,
+        threshold=config.LOOP_MONITOR_THRESHOLD_MS / 1000,
+        log_interval=config.LOOP_MONITOR_LOG_INTERVAL_S,
+    )
+    if _metrics_publisher is None:
+        _metrics_publisher = asyncio.create_task(metrics.run_publisher(config.METRICS_DIR))
+
+
+def prewarm(proc: JobProcess):
+    proc.userdata["vad"] = silero.VAD.load()
+    # Map the fixed phrases before a job arrives; sessions then play them without disk I/O.
+    get_tts_cache().preload(CACHED_PHRASES)
+
+
+def turn_taking_models(ctx: JobContext) -> tuple:
+    """VAD from prewarm and this process's turn detector (built on first use; it needs the job context)."""
+    userdata = ctx.proc.userdata
+    if "vad" not in userdata:
+        userdata["vad"] = silero.VAD.load()
+    if "turn_detector" not in userdata:
+        userdata["turn_detector"] = load_turn_detector()
+    return userdata["vad"], userdata["turn_detector"]
 
 
 async def handle_participant(ctx: JobContext, participant: rtc.RemoteParticipant):
     logger.info(f"Handling participant: {participant.identity}")
     try:
         metadata = json.loads(participant.metadata or "{}")
-        logger.debug(f"Parsed metadata: {metadata}")
+        logger.debug("Parsed metadata: %s", metadata)
     except json.JSONDecodeError:
         logger.exception(f"Failed to parse metadata for participant {participant.identity}")
         metadata = {}
 
     device_id = participant.identity
-    logger.info(f"Fetching user data for device_id: {device_id}")
-    await archive_nth_last_session(db=db_helper, child_id=device_id, n=11)
-    try:
-        child_profile = await db_helper.fetch_child_profile(device_id) or {}
-        personality = await db_helper.fetch_toy_personality(device_id) or {}
-        parental_instructions = await db_helper.fetch_parental_rules(device_id) or {}
-        last_sessions = await db_helper.get_last_n_conversations(device_id, 5) or []
-        ctx_summaries = await summarize_last_sessions(last_sessions) or []
-        preferences = await db_helper.get_interests(device_id) or {}
-    except Exception:
-        logger.exception("Failed to fetch data from Supabase. Using empty defaults.")
-        child_profile = {}
-        personality = personalities["cheerful_friend"]
-        parental_instructions = {}
-        last_sessions = []
-        ctx_summaries = []
-        preferences = {}
-
-    # Ensure stable defaults for prompt filling
-    user_name = child_profile.get("name", "friend")
-    age = child_profile.get("age", None)
-    city = child_profile.get("city", None)
-    interests = child_profile.get("interests", []) or []
-    dob = child_profile.get("birthday", None)
-    chat_history=[]
-    try:
-        current_personality = personalities["cheerful_friend"]
-        safe_personality = {
-            "energy": current_personality.energy,
-            "humor": current_personality.humor,
-            "curiosity": current_personality.curiosity,
-            "empathy": current_personality.empathy,
-            "role_identity": current_personality.role_identity,
-        }
-    except KeyError:
-        logger.error(f"Could not find {personality} personality. Using a default personality.")
-        safe_personality = {"energy": 0.5, "humor": 0.5, "curiosity": 0.5, "empathy": 0.5, "role_identity": "Best Friend"}
-    except AttributeError:
-        logger.error("The personality object does not have the expected attributes. Using defaults.")
-        safe_personality = {"energy": 0.5, "humor": 0.5, "curiosity": 0.5, "empathy": 0.5, "role_identity": "Best Friend"}
-
+    is_new_user = bool(metadata.get("isNewUser", False))
     session_data = SessionData(
-        is_new_user=bool(metadata.get("isNewUser", False)),
+        is_new_user=is_new_user,
         device_id=device_id,
-        child_profile=child_profile,
-        last_messages=ctx_summaries,
-        parental_instructions=parental_instructions,
-        preferences=preferences,
-        personality=safe_personality,
-        user_name=user_name,
-        age=age,
-        city=city,
-        interests=interests,
-        dob=dob,
-        chat_history=chat_history
+        interest_tracker=InterestTracker(device_id),
+        content_guard=ContentGuard(
+            classifier=guard_classifier,
+            classifier_threshold=config.CONTENT_GUARD_CLASSIFIER_THRESHOLD,
+        ),
     )
+    session_data.interest_tracker.on_discovered(lambda new: apply_to_session(session_data, new))
 
-    logger.info(f"SessionData successfully constructed. is_new_user: {session_data.is_new_user}")
-    logger.debug(f"Full SessionData object: {session_data}")
+    # A toy rejoining after a drop resumes its snapshot: no fetches, no greeting.
+    snapshot = await get_snapshot_store().take(device_id) if config.SESSION_SNAPSHOTS else None
+    resumed_ctx = restore(session_data, snapshot) if snapshot is not None else None
+    if snapshot is not None and config.FINALIZE_QUEUE:
+        # The dropped session continues here; it's finalized when this one ends.
+        await asyncio.to_thread(get_finalize_queue().cancel, session_data.session_id)
+
+    # A returning child with a pre-generated greeting hears it right away; the
+    # rest of the context loads while it plays.
+    greeting = None
+    if snapshot is None and not is_new_user and config.PREGENERATED_GREETINGS:
+        greeting, rules = await asyncio.gather(
+            db_helper.fetch_pregenerated_greeting(device_id),
+            db_helper.fetch_parental_rules(device_id),
+        )
+        greeting = usable_greeting(session_data, greeting, rules)
+        if greeting:
+            # Its audio was stored at precompute time, after this process indexed the cache.
+            await get_tts_cache().locate(greeting["text"], greeting.get("tts_pitch"))
+    if snapshot is not None:
+        logger.info(f"Resuming {device_id} from its snapshot ({len(resumed_ctx.items)} items)")
+        bootstrap = None
+    elif greeting:
+        logger.info(f"Pre-generated greeting found for {device_id}; loading context in the background")
+        bootstrap = asyncio.create_task(load_session_context(session_data))
+    else:
+        bootstrap = None
+        await load_session_context(session_data)
 
     # ---- Build session ----
     logger.info("Initializing AgentSession...")
+    vad, turn_detector = turn_taking_models(ctx)
     session = AgentSession[SessionData](
         userdata=session_data,
         llm=llm,
         stt=stt,
         vad=vad,        
         tts=tts,
+        preemptive_generation=config.PREEMPTIVE_REPLIES,
+        **({"turn_detection": turn_detector} if turn_detector is not None else {}),
     )
 
-    logger.info(f"Session : {session}")
+    logger.debug("Session : %s", session)
+    if config.SESSION_SNAPSHOTS:
+        save_on_close(session, session_data)
+    if config.FINALIZE_QUEUE:
+        finalize_on_close(session, session_data)
+
+    def on_context_loaded(_=None):
+        attach_observers(session, session_data, metadata)
+        # Endpointing depends on the child's age, which comes with the profile.
+        configure_turn_taking(session, session_data.age, config.TURN_DETECTION if turn_detector is not None else "vad")
+
+    if bootstrap is None:
+        on_context_loaded()
+    else:
+        bootstrap.add_done_callback(on_context_loaded)
 
     # ---- Choose initial agent ----
-    if session_data.is_new_user:
+    if resumed_ctx is not None:
+        agent_cls = UserAgent if snapshot["agent"] == "UserAgent" else ConversationContinuationAgent
+        active_agent = agent_cls(room=ctx.room, session_data=session_data, chat_ctx=resumed_ctx)
+    elif session_data.is_new_user:
         logger.info("New user detected. Starting with UserAgent.")
         active_agent = UserAgent(room=ctx.room, session_data=session_data)
     else:
         logger.info("Existing user detected. Starting with ConversationStarterAgent.")
-        active_agent = ConversationStarterAgent(room=ctx.room, session_data=session_data)
+        active_agent = ConversationStarterAgent(
+            room=ctx.room, session_data=session_data, greeting=greeting, ready=bootstrap,
+        )
     
     await session.start(room=ctx.room, agent=active_agent)
+    if greeting:
+        await db_helper.mark_greeting_used(device_id)
+
+
+def usable_greeting(session_data: SessionData, greeting: dict | None, rules: dict | None) -> dict | None:
+    """`greeting` if the parental rules it was written under still hold and it passes the guard, else None."""
+    if not greeting:
+        return None
+    rules = rules or {}
+    if greeting.get("rules_hash") != rules_fingerprint(rules):
+        log_event(logger, "greeting.stale_rules", device_id=session_data.device_id)
+        return None
+    text = vet_greeting(greeting.get("text"), rules, session_data.content_guard)
+    if text is None:
+        log_event(logger, "greeting.blocked", logging.WARNING, device_id=session_data.device_id)
+        return None
+    return {**greeting, "text": text}
+
+
+def _background(coro, name: str):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+
+    def done(task):
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log_event(logger, "background.failed", logging.WARNING, task=name, error=repr(task.exception()))
+    task.add_done_callback(done)
+
+
+async def _session_summaries(device_id: str) -> list[str]:
+    last_sessions = await db_helper.get_last_n_conversations(device_id, 5) or []
+    try:
+        return await asyncio.wait_for(summarize_last_sessions(last_sessions), config.SUMMARY_DEADLINE_S) or []
+    except Exception as e:
+        log_event(logger, "summaries.degraded", logging.WARNING, device_id=device_id,
+                  error=repr(e) if str(e) else type(e).__name__)
+        return []
+
+
+async def load_session_context(session_data: SessionData):
+    """Profile, personality, rules, past-session summaries and interests, filled into `session_data`."""
+    device_id = session_data.device_id
+    logger.info(f"Fetching user data for device_id: {device_id}")
+    # Archiving the 11th-last session doesn't touch anything read below.
+    _background(archive_nth_last_session(db=db_helper, child_id=device_id, n=11), "archive")
+    # Independent reads, each bounded and with its own fallback: one slow or
+    # failing query degrades its field, not the whole context.
+    child_profile, personality, parental_instructions, ctx_summaries, preferences = await asyncio.gather(
+        db_helper.fetch_child_profile(device_id),
+        db_helper.fetch_toy_personality(device_id),
+        db_helper.fetch_parental_rules(device_id),
+        _session_summaries(device_id),
+        db_helper.get_interests(device_id),
+    )
+    child_profile = child_profile or {}
+    personality = personality or {}
+    parental_instructions = parental_instructions or {}
+    preferences = preferences or {}
+
+    try:
+        current_personality = personalities["cheerful_friend"]
+        safe_personality = {
+            "energy": current_personality.energy,
+            "humor": current_personality.humor,
+            "curiosity": current_personality.curiosity,
+            "empathy": current_personality.empathy,
+            "role_identity": current_personality.role_identity,
+        }
+    except KeyError:
+        logger.error(f"Could not find {personality} personality. Using a default personality.")
+        safe_personality = {"energy": 0.5, "humor": 0.5, "curiosity": 0.5, "empathy": 0.5, "role_identity": "Best Friend"}
+    except AttributeError:
+        logger.error("The personality object does not have the expected attributes. Using defaults.")
+        safe_personality = {"energy": 0.5, "humor": 0.5, "curiosity": 0.5, "empathy": 0.5, "role_identity": "Best Friend"}
+
+    # Ensure stable defaults for prompt filling. Update in place: interests
+    # found and rules changed while this was loading must survive.
+    interests = child_profile.get("interests", []) or []
+    session_data.child_profile = child_profile
+    session_data.last_messages = ctx_summaries
+    session_data.parental_instructions = {**parental_instructions, **session_data.parental_instructions}
+    if parental_instructions == STRICT_RULES:
+        _background(_retry_parental_rules(session_data), "parental_rules_retry")
+    for category, items in preferences.items():
+        known = session_data.preferences.setdefault(category, [])
+        known[:0] = [item for item in items if item not in known]
+    session_data.personality = safe_personality
+    session_data.user_name = child_profile.get("name", "friend")
+    session_data.age = child_profile.get("age", None)
+    session_data.city = child_profile.get("city", None)
+    session_data.interests = interests + [i for i in session_data.interests or [] if i not in interests]
+    session_data.dob = child_profile.get("birthday", None)
+
+    logger.info(f"SessionData successfully constructed. is_new_user: {session_data.is_new_user}")
+    log_event(logger, "session.context_loaded", logging.DEBUG, device_id=device_id,
+              summaries=len(ctx_summaries), interests=len(session_data.interests), rules=len(parental_instructions))
+
+
+async def _retry_parental_rules(session_data: SessionData):
+    """Keeps reading the child's rules while the session runs under STRICT_RULES; swaps them in once read."""
+    device_id = session_data.device_id
+    for attempt in range(config.PARENTAL_RULES_RETRIES):
+        await asyncio.sleep(min(60.0, config.PARENTAL_RULES_RETRY_S * 2 ** attempt))
+        rules = await db_helper.fetch_parental_rules(device_id)
+        if rules == STRICT_RULES:
+            continue
+        # Rules the parent changed during the session (parent mode) still win.
+        changed = {k: v for k, v in session_data.parental_instructions.items() if STRICT_RULES.get(k) != v}
+        session_data.parental_instructions = {**rules, **changed}
+        if session_data.content_guard is not None:
+            session_data.content_guard.sync(session_data.parental_instructions)
+        log_event(logger, "parental_rules.recovered", device_id=device_id, attempts=attempt + 1)
+        return
+    log_event(logger, "parental_rules.unavailable", logging.WARNING, device_id=device_id,
+              attempts=config.PARENTAL_RULES_RETRIES)
+
+
+def attach_observers(session, session_data: SessionData, metadata: dict):
+    if config.SESSION_RECORDING_DIR:
+        SessionRecorder(session_data, config.SESSION_RECORDING_DIR).attach(session)
+
+    if profiling_enabled(session_data.device_id, metadata, config.PROFILE_SLOW_TURNS, config.PROFILE_DEVICE_IDS):
+        SessionProfiler(
+            session_data.device_id,
+            directory=config.PROFILE_DIR,
+            budget=config.PROFILE_TURN_BUDGET_MS / 1000,
+            interval=config.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        ).attach(session)
+
 
 async def create_agent(ctx: JobContext):
     logger.info(f"Starting agent for job {ctx.job.id}")
+    install_job_filters(
+        sample_rates=config.LOG_SAMPLE_RATES,
+        max_chars=config.LOG_MAX_MESSAGE_CHARS,
+        max_items=config.LOG_MAX_ARG_ITEMS,
+    )
+    start_process_monitoring()
 
     shutdown_event = asyncio.Event()
 
@@ -150,9 +338,15 @@ async def health_check(_request):
     return web.Response(text="OK")
 
 
+async def metrics_endpoint(_request):
+    text = await asyncio.to_thread(metrics.render_prometheus, config.METRICS_DIR)
+    return web.Response(text=text, content_type="text/plain")
+
+
 async def run_http_server():
     app = web.Application()
     app.router.add_get("/", health_check)
+    app.router.add_get("/metrics", metrics_endpoint)
     runner = web.AppRunner(app)
     await runner.setup()
     port = int(os.environ.get("PORT", 5000))
@@ -161,10 +355,24 @@ async def run_http_server():
     logger.info(f"HTTP server running on port {port}")
 
 
+async def _run_finalizer():
+    """Processes the finalize queue for the life of the worker, restarting it if it ever fails."""
+    restarts = 0
+    while True:
+        try:
+            await get_finalize_queue().run(finalize_sessions)
+            return
+        except Exception as e:
+            restarts += 1
+            log_event(logger, "finalize.worker_restarted", logging.ERROR, restarts=restarts, error=repr(e))
+            await asyncio.sleep(min(60.0, 2.0 ** min(restarts, 6)))
+
+
 # --- Main ---
 async def run_livekit_worker():
     options = WorkerOptions(
         entrypoint_fnc=create_agent,
+        prewarm_fnc=prewarm,
         ws_url=config.LIVEKIT_URL,
         api_key=config.LIVEKIT_API_KEY,
         api_secret=config.LIVEKIT_API_SECRET,
@@ -174,8 +382,25 @@ async def run_livekit_worker():
 
 
 async def main():
+    start_process_monitoring()
+    # Job processes read the cache from disk, so warming once here covers them all.
+    _background(get_tts_cache().warm(CACHED_PHRASES), "tts_cache_warm")
+    # Job processes only enqueue; this long-lived process does the post-session work.
+    if config.FINALIZE_QUEUE:
+        global _finalizer
+        _finalizer = asyncio.create_task(_run_finalizer(), name="finalize_queue")
     await asyncio.gather(run_livekit_worker(), run_http_server())
 
 
+def download_model_files():
+    """Fetch the VAD and turn-detector weights ahead of time (e.g. at image build)."""
+    for plugin in Plugin.registered_plugins:
+        logger.info(f"Downloading files for {plugin.package}")
+        plugin.download_files()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if sys.argv[1:] == ["download-files"]:
+        download_model_files()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,75 @@
+-- Bulk, order-preserving interest merge used by the agent on session exit.
+-- One call replaces the per-category SELECT + UPDATE/INSERT round trips.
+
+-- Existing items first, then new ones; duplicates (case/whitespace-insensitive)
+-- keep their first position. When over the cap the oldest items are dropped.
+create or replace function public.merge_interest_items(p_existing text[], p_new text[], p_max_items int)
+returns text[]
+language sql
+immutable
+as $$
+    select coalesce(array_agg(item order by first_pos), '{}')
+    from (
+        select item, first_pos
+        from (
+            select (array_agg(btrim(raw) order by pos))[1] as item, min(pos) as first_pos
+            from unnest(coalesce(p_existing, '{}') || coalesce(p_new, '{}')) with ordinality as t(raw, pos)
+            where btrim(raw) <> ''
+            group by lower(btrim(raw))
+        ) deduped
+        order by first_pos desc
+        limit greatest(p_max_items, 0)
+    ) capped;
+$$;
+
+-- The old per-category SELECT + INSERT raced, and set_interests upserted
+-- without a conflict target, so a child can have several rows for one
+-- category. Fold each group's items into its first row and drop the rest
+-- before the unique index goes on.
+with ranked as (
+    select ctid as row_ctid, user_id, category, items,
+           row_number() over (partition by user_id, category order by ctid) as n
+    from public.user_interests
+),
+duplicated as (
+    select user_id, category from ranked where n > 1 group by user_id, category
+),
+merged as (
+    select r.user_id, r.category,
+           public.merge_interest_items('{}', array_agg(i.item order by r.n, i.pos), 2147483647) as items
+    from ranked r
+    join duplicated d using (user_id, category)
+    cross join lateral unnest(coalesce(r.items, '{}')) with ordinality as i(item, pos)
+    group by r.user_id, r.category
+),
+kept as (
+    update public.user_interests ui
+    set items = m.items
+    from merged m, ranked r
+    where r.n = 1 and r.user_id = m.user_id and r.category = m.category and ui.ctid = r.row_ctid
+)
+delete from public.user_interests ui
+using ranked r
+where ui.ctid = r.row_ctid and r.n > 1;
+
+create unique index if not exists user_interests_user_id_category_key
+    on public.user_interests (user_id, category);
+
+-- p_interests: {"Hobbies": ["lego"], "Topics": ["dinosaurs"], ...}
+-- The upsert takes a row lock per category, so two sessions ending together
+-- for the same child merge on top of each other instead of overwriting.
+create or replace function public.merge_user_interests(p_user_id text, p_interests jsonb, p_max_items int default 25)
+returns table (category text, items text[])
+language sql
+as $$
+    insert into public.user_interests as ui (user_id, category, items)
+    select
+        p_user_id,
+        c.key,
+        public.merge_interest_items('{}', array(select jsonb_array_elements_text(c.value)), p_max_items)
+    from jsonb_each(p_interests) as c
+    where jsonb_typeof(c.value) = 'array' and jsonb_array_length(c.value) > 0
+    on conflict (user_id, category) do update
+        set items = public.merge_interest_items(ui.items, excluded.items, p_max_items)
+    returning ui.category, ui.items;
+$$;
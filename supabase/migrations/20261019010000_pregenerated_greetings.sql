@@ -0,0 +1,15 @@
+-- Next-session greeting per device, generated when a session is finalized
+-- (or by `python -m tools.greeting_precompute --sweep`) and spoken as soon
+-- as the child joins.
+
+create table if not exists public.pregenerated_greetings (
+    device_id text primary key,
+    text text not null,
+    tts_pitch text,
+    created_at timestamptz not null default now(),
+    used_at timestamptz
+);
+
+create index if not exists pregenerated_greetings_used_at_idx
+    on public.pregenerated_greetings (used_at)
+    where used_at is not null;
@@ -0,0 +1,15 @@
+-- Vetted, pre-generated fun facts per city and age band. Job processes load
+-- a pool on demand; `python -m tools.fun_facts --refill` tops up the cities
+-- children actually live in.
+
+create table if not exists public.fun_facts (
+    id bigserial primary key,
+    city_key text not null,
+    age_band text not null,
+    fact text not null,
+    created_at timestamptz not null default now(),
+    unique (city_key, age_band, fact)
+);
+
+create index if not exists fun_facts_lookup_idx
+    on public.fun_facts (city_key, age_band, created_at desc);
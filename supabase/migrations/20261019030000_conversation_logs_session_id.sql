@@ -0,0 +1,9 @@
+-- Idempotency key for finalized sessions: the finalize queue may retry a
+-- session whose insert already landed, and the upsert on session_id makes
+-- that a no-op. Rows logged before this have no session_id.
+
+alter table public.conversation_logs
+    add column if not exists session_id text;
+
+create unique index if not exists conversation_logs_session_id_key
+    on public.conversation_logs (session_id);
@@ -0,0 +1,21 @@
+-- A pre-generated greeting is only spoken while the parental rules it was
+-- written under still hold: rules_hash is their fingerprint at generation
+-- time, compared with the current rules at join.
+
+alter table public.pregenerated_greetings
+    add column if not exists rules_hash text;
+
+-- Devices the sweep should (re)generate for: those whose greeting has been
+-- spoken and those that never had one, the longest-waiting first.
+create or replace function public.devices_needing_greeting(p_limit int default 100)
+returns table (device_id text)
+language sql
+stable
+as $$
+    select cp.device_id
+    from public.child_profiles cp
+    left join public.pregenerated_greetings pg on pg.device_id = cp.device_id
+    where cp.device_id is not null and (pg.device_id is null or pg.used_at is not null)
+    order by pg.used_at nulls first
+    limit greatest(p_limit, 0);
+$$;
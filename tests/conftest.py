@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app builds its clients at import time; give it the benchmarks' placeholder credentials.
+from benchmarks.fakes import STUB_ENV  # noqa: E402
+
+for key, value in STUB_ENV.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+
+import pytest
+from livekit.agents import llm
+
+from agents.session_data import SessionData
+from tools import answer_cache
+from tools.answer_cache import AnswerCache
+
+
+class FakeGateway:
+    """Same text, same vector; different texts land well below any useful threshold."""
+
+    async def embed(self, text, lane="retrieval"):
+        return [float(b) - 127.5 for b in hashlib.sha256(text.encode("utf-8")).digest()]
+
+
+@pytest.fixture(autouse=True)
+def gateway(monkeypatch):
+    monkeypatch.setattr(answer_cache, "get_embedding_gateway", lambda: FakeGateway())
+
+
+def child(name="Maya", **kwargs) -> SessionData:
+    return SessionData(**{"device_id": name.lower(), "is_new_user": False, "user_name": name, "age": 7,
+                          "child_profile": {"city": "Leeds", "interests": ["dinosaurs"]}, **kwargs})
+
+
+def asking(text: str) -> llm.ChatContext:
+    chat = llm.ChatContext()
+    chat.add_message(role="user", content=text)
+    return chat
+
+
+async def answer(cache: AnswerCache, text: str, session_data: SessionData, reply: str | None = None):
+    turn = await cache.lookup(asking(text), session_data)
+    if turn is None or turn.answer is not None or reply is None:
+        return turn
+    async for _ in turn.record(_stream(reply)):
+        pass
+    return turn
+
+
+async def _stream(text):
+    for word in text.split(" "):
+        yield word + " "
+
+
+@pytest.mark.parametrize("question", [
+    "what is my dog called",
+    "do you remember what we played",
+    "why did mom say no",
+    "where does maya live",
+    "what is the weather in leeds",
+    "what did i tell you yesterday",
+])
+def test_personal_questions_skip_the_cache(question):
+    assert asyncio.run(AnswerCache().lookup(asking(question), child())) is None
+
+
+def test_statements_and_tool_follow_ups_skip_the_cache():
+    cache = AnswerCache()
+    assert asyncio.run(cache.lookup(asking("I like turtles"), child())) is None
+    chat = asking("why is the sky blue")
+    chat.add_message(role="assistant", content="Let me check.")
+    assert asyncio.run(cache.lookup(chat, child())) is None
+
+
+def test_a_general_answer_is_shared_with_the_name_swapped():
+    async def run():
+        cache = AnswerCache(threshold=0.99)
+        first = await answer(cache, "Why is the sky blue?", child(), "Great question Maya! Sunlight scatters.")
+        assert first.answer is None
+        second = await cache.lookup(asking("why is the sky blue"), child("Leo"))
+        return "".join([chunk async for chunk in second.replay()])
+
+    assert asyncio.run(run()) == "Great question Leo! Sunlight scatters."
+
+
+def test_children_under_other_rules_or_ages_do_not_share_answers():
+    async def run():
+        cache = AnswerCache(threshold=0.99)
+        await answer(cache, "why is the sky blue", child(), "Sunlight scatters.")
+        strict = await cache.lookup(asking("why is the sky blue"),
+                                    child("Leo", parental_instructions={"restricted_topics": ["space"]}))
+        older = await cache.lookup(asking("why is the sky blue"), child("Leo", age=12))
+        return strict.answer, older.answer
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_answers_about_the_childs_interests_are_not_stored():
+    async def run():
+        cache = AnswerCache(threshold=0.99)
+        await answer(cache, "why do birds sing", child(), "Like your dinosaurs, birds love to call out.")
+        return await cache.lookup(asking("why do birds sing"), child("Leo"))
+
+    assert asyncio.run(run()).answer is None
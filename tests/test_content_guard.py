@@ -0,0 +1,90 @@
+import asyncio
+
+from livekit.agents import llm
+
+from tools.content_guard import REDIRECT, STRICT_RULES, ContentGuard
+from tools.speech_chunker import ChunkSplitter
+
+
+async def _tokens(pieces):
+    for piece in pieces:
+        yield piece
+
+
+def guarded(guard: ContentGuard, pieces) -> list:
+    async def run():
+        return [chunk async for chunk in guard.filter_stream(_tokens(pieces))]
+
+    return asyncio.run(run())
+
+
+def words(text: str) -> list[str]:
+    return [word + " " for word in text.split(" ")]
+
+
+def test_restricted_topics_and_their_giveaway_words_are_suppressed():
+    guard = ContentGuard({"restricted_topics": ["horror"]})
+    assert guard.check("Let's read a scary story") is None
+    assert guard.check("Horror movies are fun") is None
+    assert guard.check("Dinosaurs were huge") == "Dinosaurs were huge"
+
+
+def test_profanity_is_cut_only_with_the_language_filter():
+    assert ContentGuard({"language_filter": True}).check("What the hell, that was fun") == "What the, that was fun"
+    assert ContentGuard({}).check("What the hell") == "What the hell"
+    assert not ContentGuard({}).active
+    assert ContentGuard(STRICT_RULES).check("The soldiers went to war") is None
+
+
+def test_rules_are_recompiled_when_they_change():
+    guard = ContentGuard({})
+    guard.sync({"restricted_topics": ["space"]})
+    assert guard.check("Rockets go fast") is not None
+    assert guard.check("Space is big") is None
+    guard.sync({})
+    assert guard.check("Space is big") == "Space is big"
+
+
+def test_the_stream_is_released_clause_by_clause():
+    guard = ContentGuard({"restricted_topics": ["violence"]})
+    released = []
+
+    async def tokens():
+        for token in words("Oh wow, that is so cool! The war began, and then it ended. Dinosaurs were big."):
+            yield token
+
+    async def run():
+        async for chunk in guard.filter_stream(tokens()):
+            released.append(chunk)
+
+    asyncio.run(run())
+    # The first clause goes out on its own; the suppressed sentence goes entirely.
+    assert released == ["Oh wow, ", "that is so cool! ", "Dinosaurs were big. "]
+
+
+def test_the_first_tts_chunk_is_not_held_to_the_sentence_end():
+    guard = ContentGuard({"language_filter": True})
+    splitter = ChunkSplitter(first_min_chars=6, min_chars=40, max_chars=220)
+    first = []
+
+    async def tokens():
+        for token in words("Oh wow, dinosaurs are amazing and they lived a long long time ago."):
+            yield token
+            if first:
+                return
+
+    async def run():
+        async for chunk in guard.filter_stream(tokens()):
+            first.extend(splitter.push(chunk))
+
+    asyncio.run(run())
+    assert first == ["Oh wow,"]
+
+
+def test_a_fully_suppressed_reply_becomes_the_redirect_and_tool_calls_pass():
+    guard = ContentGuard({"restricted_topics": ["violence"]})
+    assert guarded(guard, words("Guns, guns and more guns.")) == [REDIRECT]
+
+    call = llm.FunctionToolCall(name="exit", arguments="{}", call_id="c1")
+    tool_chunk = llm.ChatChunk(id="1", delta=llm.ChoiceDelta(role="assistant", tool_calls=[call]))
+    assert guarded(guard, ["Bye now! ", tool_chunk]) == ["Bye now! ", tool_chunk]
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from tools import model_registry, shared_cache
+from tools.embedding_gateway import EmbeddingGateway
+
+
+class FakeEmbeddings:
+    def __init__(self, bad: str | None = None):
+        self.bad = bad
+        self.calls = []
+
+    async def create(self, input, model):
+        self.calls.append(list(input))
+        if self.bad in input:
+            response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+            raise openai.BadRequestError("invalid input", response=response, body=None)
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))])
+                                     for i, text in enumerate(input)])
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    def install(**kwargs):
+        fake = FakeEmbeddings(**kwargs)
+        monkeypatch.setattr(model_registry, "client", SimpleNamespace(embeddings=fake))
+        return fake
+
+    monkeypatch.setattr(shared_cache, "get_shared_cache", lambda: None)
+    return install
+
+
+def test_concurrent_callers_share_one_request(embeddings):
+    fake = embeddings()
+
+    async def run():
+        gateway = EmbeddingGateway(max_wait=0.01, max_batch=10)
+        return await asyncio.gather(gateway.embed("a"), gateway.embed("bb"), gateway.embed("a"),
+                                    gateway.embed_many(["ccc", "bb"], lane="background"))
+
+    assert asyncio.run(run()) == [[1.0], [2.0], [1.0], [[3.0], [2.0]]]
+    assert fake.calls == [["a", "bb", "ccc"]]
+
+
+def test_full_batches_and_long_texts_go_out_on_their_own(embeddings):
+    fake = embeddings()
+
+    async def run():
+        gateway = EmbeddingGateway(max_wait=0.01, max_batch=2, solo_chars=5)
+        return await gateway.embed_many(["a", "b", "c", "x" * 6])
+
+    assert asyncio.run(run()) == [[1.0], [1.0], [1.0], [6.0]]
+    assert sorted(fake.calls) == [["a", "b"], ["c"], ["x" * 6]]
+
+
+def test_a_rejected_batch_is_split_so_only_the_bad_text_fails(embeddings):
+    fake = embeddings(bad="bad")
+
+    async def run():
+        gateway = EmbeddingGateway(max_wait=0.01, max_batch=10)
+        return await asyncio.gather(gateway.embed("good"), gateway.embed("bad"), gateway.embed("   "),
+                                    return_exceptions=True)
+
+    good, bad, empty = asyncio.run(run())
+    assert good == [4.0]
+    assert isinstance(bad, openai.BadRequestError)
+    assert isinstance(empty, ValueError)
+    assert fake.calls[0] == ["good", "bad"]
+    assert sorted(fake.calls[1:]) == [["bad"], ["good"]]
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import stat
+import time
+
+from tools import agent_tools
+from tools.finalize_queue import FinalizeQueue
+
+
+def make_queue(tmp_path, **kwargs) -> FinalizeQueue:
+    return FinalizeQueue(path=str(tmp_path / "queue" / "q.sqlite3"), **{"backoff": 0.0, "max_attempts": 2, **kwargs})
+
+
+def test_enqueue_replaces_a_pending_payload(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue("s1", {"n": 1})
+    assert queue.enqueue("s1", {"n": 2})
+    jobs = queue.claim(10)
+    assert [(job.key, job.payload, job.attempts) for job in jobs] == [("s1", {"n": 2}, 1)]
+
+
+def test_a_job_that_ran_is_not_enqueued_again(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("s1", {})
+    queue.complete(queue.claim(1)[0].key)
+    assert not queue.enqueue("s1", {})
+    assert queue.claim(10) == []
+    assert queue.stats() == {"done": 1}
+
+
+def test_delayed_jobs_wait_and_can_be_cancelled(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("s1", {}, delay=60)
+    assert queue.claim(10) == []
+    assert queue.cancel("s1")
+    assert not queue.cancel("s1")
+    assert queue.stats() == {}
+
+
+def test_running_jobs_cannot_be_cancelled(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("s1", {})
+    queue.claim(1)
+    assert not queue.cancel("s1")
+
+
+def test_failures_retry_then_give_up(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("s1", {})
+    queue.fail(queue.claim(1)[0], ValueError("first"))
+    assert queue.stats() == {"pending": 1}
+    job = queue.claim(1)[0]
+    assert job.attempts == 2
+    queue.fail(job, ValueError("second"))
+    assert queue.stats() == {"failed": 1}
+    assert queue.claim(10) == []
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = make_queue(tmp_path, lease=0.01)
+    queue.enqueue("s1", {})
+    assert len(queue.claim(1)) == 1
+    time.sleep(0.02)
+    jobs = queue.claim(1)
+    assert [job.attempts for job in jobs] == [2]
+
+
+def test_process_records_each_result(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("ok", {"ok": True})
+    queue.enqueue("bad", {"ok": False})
+
+    async def handler(payloads):
+        return [None if payload["ok"] else ValueError("no") for payload in payloads]
+
+    asyncio.run(queue.run(handler, drain=True))
+    assert queue.stats() == {"done": 1, "failed": 1}
+
+
+def test_files_are_private(tmp_path):
+    old = os.umask(0o022)
+    try:
+        queue = make_queue(tmp_path)
+        queue.enqueue("s1", {"chat_history": []})
+    finally:
+        os.umask(old)
+    directory = tmp_path / "queue"
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o700
+    for path in directory.iterdir():
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_failed_interest_merge_fails_the_session(monkeypatch):
+    class Gateway:
+        async def embed_many(self, texts, lane):
+            return [[0.1] for _ in texts]
+
+    class DB:
+        logged = []
+
+        async def merge_interests(self, device_id, interests):
+            raise RuntimeError("rpc down")
+
+        async def log_conversation(self, **kwargs):
+            self.logged.append(kwargs)
+
+    monkeypatch.setattr(agent_tools, "get_embedding_gateway", Gateway)
+    monkeypatch.setattr(agent_tools, "db", DB())
+    monkeypatch.setattr(agent_tools, "schedule_greeting", lambda db, device_id: None)
+    payload = {"device_id": "d", "session_id": "s", "interests": {"Sports": ["chess"]},
+               "chat_history": [{"role": "user", "content": "I play chess"}]}
+    [result] = asyncio.run(agent_tools.finalize_sessions([payload]))
+    assert isinstance(result, RuntimeError)
+    assert DB.logged == []
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agents import user_agent
+from agents.session_data import SessionData
+from tools import fun_facts, shared_cache
+from tools.fun_facts import FALLBACK_FACTS, FunFactStore, age_band
+
+
+class FakeFacts:
+    def __init__(self):
+        self.reads = []
+
+    async def fetch_fun_facts(self, city_key, band, max_age_hours, limit):
+        self.reads.append((city_key, band))
+        await asyncio.sleep(0.01)
+        return [f"Fact {i} about {city_key} for ages {band}." for i in range(3)]
+
+    async def save_fun_facts(self, city_key, band, facts):
+        pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FunFactStore(FakeFacts(), pool_size=2, refill_below=0, read_wait=0.0)
+    monkeypatch.setattr(shared_cache, "get_shared_cache", lambda: None)
+    monkeypatch.setattr(user_agent, "get_fun_fact_store", lambda: store)
+    monkeypatch.setattr(fun_facts, "generate_facts", lambda *args: asyncio.sleep(0, []))
+    return store
+
+
+def test_age_bands():
+    assert [age_band(a) for a in (2, 5, 8, "12", 20, None, "?")] == ["3-6", "3-6", "7-9", "10-14", "10-14", "7-9", "7-9"]
+
+
+def test_facts_rotate_per_child_and_fall_back_when_used_up(store):
+    async def run():
+        await store.prefetch("Pune", 8)
+        return [await store.get(" pune ", 8, "toy-1") for _ in range(4)], await store.get("Pune", 8, "toy-2")
+
+    served, other = asyncio.run(run())
+    assert len(set(served[:3])) == 3 and all("ages 7-9" in fact for fact in served[:3])
+    assert served[3] in FALLBACK_FACTS
+    assert "ages 7-9" in other
+    assert store.db.reads == [("pune", "7-9")]
+
+
+def test_onboarding_prefetches_the_band_get_fun_fact_will_use(store):
+    agent = user_agent.UserAgent(room=None, session_data=SessionData(device_id="toy-1", is_new_user=True))
+    context = SimpleNamespace(userdata=agent.session_data)
+
+    async def run():
+        await agent.record_city(context, "Pune")
+        await agent.calculate_and_record_age(context, "May 5, 2020")
+        await asyncio.sleep(0.05)
+        # No read timeout to spare: served only if the prefetch already loaded this band.
+        return await agent.get_fun_fact(context, "")
+
+    fact = asyncio.run(run())
+    band = age_band(agent.session_data.age)
+    assert fact.endswith(f"ages {band}.")
+    assert store.db.reads == [("pune", "7-9"), ("pune", band)]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from tools.hybrid_retrieval import BM25, hybrid_context, passages, rrf, tokenize
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("Do you remember my dog, Biscuit?") == ["dog", "biscuit"]
+
+
+def test_bm25_ranks_the_exact_name_first():
+    docs = [tokenize(text) for text in (
+        "user: I built a lego rocket",
+        "user: my dog Biscuit loves the park",
+        "user: we went to the park",
+    )]
+    scores = BM25(docs).scores(tokenize("Biscuit"))
+    assert scores[1] > 0
+    assert scores[0] == scores[2] == 0
+
+
+def test_bm25_prefers_shorter_documents_for_the_same_match():
+    docs = [["dog", "park"], ["dog", "park", "rocket", "lego", "mars", "moon"]]
+    scores = BM25(docs).scores(["dog"])
+    assert scores[0] > scores[1]
+
+
+def test_bm25_empty_corpus():
+    assert BM25([]).scores(["dog"]) == []
+
+
+def test_rrf_rewards_items_ranked_high_in_several_lists():
+    fused = rrf([[1, 2, 3], [2, 1]], k=60)
+    assert fused[1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[2] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[3] == pytest.approx(1 / 63)
+    assert max(fused, key=fused.get) in (1, 2)
+    assert min(fused, key=fused.get) == 3
+
+
+def test_passages_split_messages_and_summaries():
+    messages = [{"role": "user", "content": "I love dinosaurs. T-rex is my favourite!"},
+                {"role": "assistant", "content": ""}]
+    assert passages(messages) == ["user: I love dinosaurs.", "user: T-rex is my favourite!"]
+    assert passages("They talked about Mars. And rockets.") == ["They talked about Mars.", "And rockets."]
+
+
+def test_hybrid_context_finds_an_exact_name_the_vectors_missed():
+    vector_rows = [{"id": 1, "content": "They talked about space. Rockets go very fast."}]
+    memory_rows = [{"id": 2, "content": [{"role": "user", "content": "My puppy is called Biscuit. He is brown."}]},
+                   {"id": 1, "content": "They talked about space. Rockets go very fast."}]
+    context = asyncio.run(hybrid_context("what was Biscuit like", [0.1, 0.2], vector_rows, memory_rows,
+                                         max_passages=2, max_chars=500, rerank_candidates=0))
+    lines = context.split("\n")
+    assert lines[0] == "user: My puppy is called Biscuit."
+    assert len(lines) == 2
+
+
+def test_hybrid_context_respects_the_character_budget():
+    rows = [{"id": i, "content": f"Sentence number {i} is about dinosaurs."} for i in range(5)]
+    context = asyncio.run(hybrid_context("dinosaurs", [0.1], rows, [], max_passages=5, max_chars=60,
+                                         rerank_candidates=0))
+    assert len(context.split("\n")) == 1
+    assert asyncio.run(hybrid_context("anything", [0.1], [], [], rerank_candidates=0)) == ""
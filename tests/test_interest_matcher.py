@@ -0,0 +1,77 @@
+import asyncio
+
+from agents.session_data import SessionData
+from tools import interest_matcher
+from tools.interest_matcher import InterestTracker, apply_to_session, match_interests
+
+
+def test_lexicon_prefers_the_longest_phrase():
+    assert match_interests("I had ice cream and played with my toy cars") == {
+        "Favorite_Food": ["ice cream"], "Hobbies": ["toy cars"]}
+    assert match_interests("nothing to see here") == {}
+
+
+def test_a_stated_preference_counts_at_once_and_a_mention_on_the_second_time():
+    async def run():
+        tracker = InterestTracker("toy-1", max_wait=60)
+        assert tracker.observe("I love dinosaurs") == {"Topics": ["dinosaurs"]}
+        assert tracker.observe("we went swimming") == {}
+        assert tracker.observe("swimming was cold") == {"Sports": ["swimming"]}
+        assert tracker.observe("swimming again") == {}
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert tracker.discovered == {"Topics": ["dinosaurs"], "Sports": ["swimming"]}
+    assert tracker.unclassified() == []
+
+
+def test_turns_the_lexicon_cannot_call_are_classified_in_a_batch(monkeypatch):
+    batches = []
+
+    async def classify(turns):
+        batches.append(list(turns))
+        return {"Hobbies": ["origami"], "Favorite_Food": []}
+
+    monkeypatch.setattr(interest_matcher, "classify_turns", classify)
+
+    async def run():
+        tracker = InterestTracker("toy-1", batch_size=2, max_wait=60)
+        assert tracker.observe("I love folding paper cranes") == {}
+        assert tracker.observe("I don't like pizza") == {}
+        await asyncio.wait_for(tracker._flush_task, 1)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert batches == [["I love folding paper cranes", "I don't like pizza"]]
+    assert tracker.discovered == {"Hobbies": ["origami"]}
+
+
+def test_turns_whose_classification_failed_are_kept(monkeypatch):
+    calls = []
+
+    async def classify(turns):
+        calls.append(list(turns))
+        if len(calls) == 1:
+            raise RuntimeError("rate limited")
+        return {"Hobbies": ["knitting"]}
+
+    monkeypatch.setattr(interest_matcher, "classify_turns", classify)
+
+    async def run():
+        tracker = InterestTracker("toy-1", batch_size=10, max_wait=60)
+        tracker.observe("I really enjoy knitting")
+        await tracker.flush()
+        assert tracker.unclassified() == ["I really enjoy knitting"]
+        return await tracker.close(timeout=1), tracker
+
+    discovered, tracker = asyncio.run(run())
+    assert calls == [["I really enjoy knitting"]] * 2
+    assert discovered == {"Hobbies": ["knitting"]}
+    assert tracker.unclassified() == []
+
+
+def test_discoveries_reach_the_session():
+    session_data = SessionData(device_id="toy-1", is_new_user=False, preferences={"Topics": ["space"]})
+    apply_to_session(session_data, {"Topics": ["space", "dinosaurs"], "Sports": ["chess"]})
+    assert session_data.preferences == {"Topics": ["space", "dinosaurs"], "Sports": ["chess"]}
+    assert session_data.interests == ["space", "dinosaurs", "chess"]
@@ -0,0 +1,51 @@
+"""
+The migration's merge_interest_items() against a real Postgres. Skipped
+unless TEST_DATABASE_URL points at a database psycopg can reach; runs in a
+transaction that is rolled back.
+"""
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DSN = os.environ.get("TEST_DATABASE_URL")
+MIGRATION = next((Path(__file__).parent.parent / "supabase" / "migrations").glob("20261019000000*.sql"))
+
+pytestmark = pytest.mark.skipif(not DSN, reason="TEST_DATABASE_URL not set")
+
+
+@pytest.fixture
+def merge():
+    function = re.search(r"create or replace function public\.merge_interest_items.*?\$\$;",
+                         MIGRATION.read_text(), re.DOTALL | re.IGNORECASE).group(0)
+    with psycopg.connect(DSN) as conn:
+        conn.execute(function)
+
+        def run(existing, new, max_items=25):
+            return conn.execute("select public.merge_interest_items(%s::text[], %s::text[], %s)",
+                                (existing, new, max_items)).fetchone()[0]
+
+        yield run
+        conn.rollback()
+
+
+def test_appends_new_items_in_order(merge):
+    assert merge(["lego", "pizza"], ["chess"]) == ["lego", "pizza", "chess"]
+
+
+def test_dedupes_case_insensitively_keeping_the_first_spelling(merge):
+    assert merge(["Lego", "pizza"], ["lego", " PIZZA ", "chess"]) == ["Lego", "pizza", "chess"]
+
+
+def test_drops_blank_items_and_handles_nulls(merge):
+    assert merge(None, ["", "  ", "chess"]) == ["chess"]
+    assert merge(["lego"], None) == ["lego"]
+    assert merge(None, None) == []
+
+
+def test_cap_keeps_the_most_recent_items(merge):
+    assert merge(["a", "b", "c"], ["d"], 2) == ["c", "d"]
+    assert merge(["a"], ["b"], 0) == []
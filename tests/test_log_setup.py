@@ -0,0 +1,60 @@
+import logging
+import queue
+
+from tools.log_setup import LazyQueueHandler, PayloadCapFilter, StructuredFormatter, log_event
+
+
+def prepared(handler: LazyQueueHandler, emit) -> logging.LogRecord:
+    logger = logging.getLogger("livekit.test_log_setup")
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    emit(logger)
+    return handler.queue.get_nowait()
+
+
+def test_containers_are_snapshotted_not_formatted():
+    history = [{"role": "user", "content": "hi"}]
+    handler = LazyQueueHandler(queue.SimpleQueue())
+    record = prepared(handler, lambda logger: logger.debug("chat :: %s", history))
+    # Still unformatted: the listener thread does the work.
+    assert record.msg == "chat :: %s"
+    history.append({"role": "assistant", "content": "hello"})
+    history[0]["content"] = "changed"
+    assert record.getMessage() == "chat :: [{'role': 'user', 'content': 'hi'}]"
+
+
+def test_snapshots_are_capped():
+    handler = LazyQueueHandler(queue.SimpleQueue(), max_items=3)
+    record = prepared(handler, lambda logger: logger.debug("%s", list(range(10))))
+    assert record.args == ([0, 1, 2],)
+
+
+def test_objects_are_not_repred_on_the_caller():
+    class Expensive:
+        calls = 0
+
+        def __repr__(self):
+            Expensive.calls += 1
+            return "expensive"
+
+    handler = LazyQueueHandler(queue.SimpleQueue())
+    record = prepared(handler, lambda logger: logger.debug("%s", [Expensive()]))
+    assert Expensive.calls == 0
+    assert record.getMessage() == "[expensive]"
+
+
+def test_event_fields_are_snapshotted():
+    interests = {"Sports": ["chess"]}
+    handler = LazyQueueHandler(queue.SimpleQueue())
+    record = prepared(handler, lambda logger: log_event(logger, "interests.discovered", interests=interests))
+    interests["Sports"].append("football")
+    line = StructuredFormatter(as_json=False, max_chars=4000).format(record)
+    assert line.endswith("interests={'Sports': ['chess']}")
+
+
+def test_payload_cap_marks_what_it_dropped():
+    cap = PayloadCapFilter(max_chars=5, max_items=2)
+    record = logging.LogRecord("livekit.x", logging.DEBUG, "", 0, "%s %s", ("abcdefgh", [1, 2, 3]), None)
+    cap.filter(record)
+    assert record.args == ("abcde... [+3 chars]", "[1, 2]... [+1 items]")
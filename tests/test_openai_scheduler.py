@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tools.openai_scheduler import OpenAIScheduler, QueueDeadlineExceeded, estimate_tokens, parse_duration
+
+
+def headers(requests=100, remaining_requests=100, tokens=10_000, remaining_tokens=10_000, reset="1s", **extra):
+    return {
+        "x-ratelimit-limit-requests": str(requests), "x-ratelimit-remaining-requests": str(remaining_requests),
+        "x-ratelimit-reset-requests": reset,
+        "x-ratelimit-limit-tokens": str(tokens), "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        "x-ratelimit-reset-tokens": reset, **extra,
+    }
+
+
+def response(status=200, **kwargs) -> httpx.Response:
+    return httpx.Response(status, headers=headers(**kwargs))
+
+
+def make_scheduler(**kwargs) -> OpenAIScheduler:
+    return OpenAIScheduler(**{"reserves": {"retrieval": 0.05, "background": 0.25},
+                              "deadlines": {"live": 0.2, "retrieval": 0.2, "background": 0.2},
+                              "background_concurrency": 2, **kwargs})
+
+
+def test_parse_duration():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1.5s") == 1.5
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("2") == 2.0
+    assert parse_duration("") is None
+
+
+def test_estimate_counts_the_prompt_and_the_output_cap():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions",
+                            json={"model": "m", "max_tokens": 100, "messages": [{"content": "x" * 400}]})
+    assert estimate_tokens(request) == len(request.content) // 4 + 100
+
+
+def test_unknown_budgets_admit_everything():
+    async def run():
+        scheduler = make_scheduler()
+        for _ in range(5):
+            await scheduler.acquire("background", 1_000, "m")
+            scheduler.release("background", None, "m")
+
+    asyncio.run(run())
+
+
+def test_lower_lanes_leave_the_reserve_to_the_live_lane():
+    async def run():
+        scheduler = make_scheduler()
+        await scheduler.acquire("live", 1, "m")
+        # 20 of 100 requests left: under the background reserve (25), over the retrieval one (5).
+        scheduler.release("live", response(remaining_requests=20, reset="60s"), "m")
+        await scheduler.acquire("retrieval", 1, "m")
+        scheduler.release("retrieval", None, "m")
+        with pytest.raises(QueueDeadlineExceeded):
+            await scheduler.acquire("background", 1, "m")
+        await scheduler.acquire("live", 1, "m")
+        # Other models have budgets of their own.
+        await scheduler.acquire("background", 1, "other")
+
+    asyncio.run(run())
+
+
+def test_background_concurrency_is_capped():
+    async def run():
+        scheduler = make_scheduler()
+        await scheduler.acquire("background", 1, "m")
+        await scheduler.acquire("background", 1, "m")
+        third = asyncio.create_task(scheduler.acquire("background", 1, "m"))
+        await asyncio.sleep(0.05)
+        assert not third.done()
+        scheduler.release("background", None, "m")
+        await asyncio.wait_for(third, 1)
+
+    asyncio.run(run())
+
+
+def test_a_waiting_live_request_holds_back_lower_lanes():
+    async def run():
+        scheduler = make_scheduler(deadlines={"live": 5, "retrieval": 5, "background": 5})
+        await scheduler.acquire("live", 1, "m")
+        scheduler.release("live", response(remaining_requests=0, reset="0.3s"), "m")
+        order = []
+
+        async def acquire(name):
+            await scheduler.acquire(name, 1, "m")
+            order.append(name)
+
+        live = asyncio.create_task(acquire("live"))
+        await asyncio.sleep(0.01)
+        # The window is still closed; once it reopens the live request goes first.
+        retrieval = asyncio.create_task(acquire("retrieval"))
+        await asyncio.wait_for(asyncio.gather(live, retrieval), 2)
+        assert order == ["live", "retrieval"]
+
+    asyncio.run(run())
+
+
+def test_a_429_pauses_the_model_and_live_goes_ahead_late():
+    async def run():
+        scheduler = make_scheduler()
+        await scheduler.acquire("live", 1, "m")
+        scheduler.release("live", httpx.Response(429, headers={"retry-after-ms": "500"}), "m")
+        assert scheduler.limits("m").paused_until > time.monotonic()
+        with pytest.raises(QueueDeadlineExceeded):
+            await scheduler.acquire("retrieval", 1, "m")
+        started = time.monotonic()
+        await scheduler.acquire("live", 1, "m")
+        # Past its deadline the live lane is admitted anyway, before the pause ends.
+        assert 0.15 <= time.monotonic() - started < 0.45
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from agents.session_data import SessionData
+from tools.parental_agent_tools import ParentalRuleBuffer, validate_rules
+
+
+class FakeRules:
+    def __init__(self, result=True):
+        self.result = result
+        self.writes = []
+
+    async def update_parental_rule(self, device_id, update_data):
+        self.writes.append((device_id, dict(update_data)))
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def make_buffer(result=True) -> tuple[ParentalRuleBuffer, FakeRules]:
+    buffer = ParentalRuleBuffer(SessionData(device_id="toy-1", is_new_user=False), window=0.01)
+    buffer.supabase = FakeRules(result)
+    return buffer, buffer.supabase
+
+
+def test_rules_are_validated_and_normalised():
+    assert validate_rules({"bedtime": "8:30 PM", "language_filter": True, "restricted_topics": ["horror"]}) == {
+        "bedtime": "20:30:00", "language_filter": True, "restricted_topics": ["horror"]}
+    for bad in ({"bedtime": "late"}, {"language_filter": "yes"}, {"restricted_topics": [1]},
+                {"tts_pitch_preference": True}, {"favourite_colour": "red"}):
+        with pytest.raises(ValueError):
+            validate_rules(bad)
+    with pytest.raises(ValueError):
+        validate_rules(["bedtime"])
+
+
+def test_one_turns_changes_are_written_once():
+    buffer, fake = make_buffer()
+    updates = []
+    buffer.on_update(lambda rules: updates.append(dict(rules)))
+
+    async def run():
+        return await asyncio.gather(buffer.stage("toy-1", {"bedtime": "20:00:00"}),
+                                    buffer.stage("other", {"language_filter": True}))
+
+    first, second = asyncio.run(run())
+    assert fake.writes == [("toy-1", {"bedtime": "20:00:00", "language_filter": True})]
+    assert "bedtime=20:00:00" in first and "language_filter=True" in first
+    assert second == "Saved together with the other rule changes above."
+    assert updates == [{"bedtime": "20:00:00", "language_filter": True}]
+    assert buffer.session_data.parental_instructions == updates[0]
+
+
+@pytest.mark.parametrize("result", [False, RuntimeError("db down")])
+def test_a_failed_write_is_reported_to_every_caller(result):
+    buffer, _ = make_buffer(result)
+
+    async def run():
+        return await asyncio.gather(buffer.stage("toy-1", {"bedtime": "20:00:00"}),
+                                    buffer.stage("toy-1", {"language_filter": True}))
+
+    for message in asyncio.run(run()):
+        assert message.startswith("Failed to update parental rules")
+    assert buffer.session_data.parental_instructions == {}
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from tools import resilience
+from tools.resilience import CircuitBreaker, CircuitOpen
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failures):
+        breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failures=3, reset_after=60)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failures=1, reset_after=0)
+    _open(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failures=1, reset_after=0)
+    _open(breaker)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_cancelled_probe_releases_the_breaker():
+    breaker = CircuitBreaker("test", failures=1, reset_after=0)
+    _open(breaker)
+
+    async def run():
+        started = asyncio.Event()
+
+        async def attempt():
+            started.set()
+            await asyncio.sleep(10)
+
+        probe = asyncio.create_task(resilience.call("test", attempt, deadline=10, breaker=breaker))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok():
+            return "ok"
+
+        return await resilience.call("test", ok, deadline=1, breaker=breaker)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_rejects_without_calling():
+    breaker = CircuitBreaker("test", failures=1, reset_after=60)
+    _open(breaker)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpen):
+        asyncio.run(resilience.call("test", attempt, deadline=1, breaker=breaker))
+    assert not calls
+
+
+def test_retries_then_succeeds():
+    outcomes = [ValueError("flaky"), "ok"]
+
+    async def attempt():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    breaker = CircuitBreaker("test", failures=1)
+    assert asyncio.run(resilience.call("test", attempt, deadline=1, retries=1, backoff=0, breaker=breaker)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_permanent_errors_dont_count_against_the_backend():
+    breaker = CircuitBreaker("test", failures=1)
+
+    async def attempt():
+        raise KeyError("not found")
+
+    with pytest.raises(KeyError):
+        asyncio.run(resilience.call("test", attempt, deadline=1, retries=3, breaker=breaker,
+                                    permanent=lambda e: isinstance(e, KeyError)))
+    assert breaker.state == "closed"
+
+
+def test_hedge_returns_the_faster_attempt():
+    delays = [0.5, 0.0]
+
+    async def attempt():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert asyncio.run(resilience.hedged("test", attempt, hedge_after=0.01)) == 0.0
@@ -0,0 +1,36 @@
+import pytest
+
+from tools.session_recorder import PiiScrubber
+
+
+@pytest.fixture
+def scrub():
+    return PiiScrubber(device_id="dev-123", name="Aarav", city="Pune").text
+
+
+@pytest.mark.parametrize("text", [
+    "my dog likes bones",
+    "my mom said I can play",
+    "Why is the Sky blue",
+    "I love Minecraft and Pokemon",
+    "I have 100000 stickers",
+    "Is it called a volcano?",
+])
+def test_ordinary_speech_is_left_alone(scrub, text):
+    assert scrub(text) == text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("my dog Biscuit likes bones", "my dog <NAME> likes bones"),
+    ("My best friend Sam is funny", "My best friend <NAME> is funny"),
+    ("her name is priya", "her name is <NAME>"),
+    ("I'm Aarav and I live in Pune", "I'm <NAME> and I live in <CITY>"),
+    ("my pin code is 411001", "my pin code is <POSTCODE>"),
+    ("we live at SW1A 1AA", "we live at <POSTCODE>"),
+    ("I live at 12 Baker Street", "I live at <ADDRESS>"),
+    ("I go to Green Valley School", "I go to <SCHOOL>"),
+    ("mail mom at mom@example.com", "mail mom at <EMAIL>"),
+    ("call +91 98765 43210", "call <PHONE>"),
+])
+def test_identifiers_are_replaced(scrub, text, expected):
+    assert scrub(text) == expected
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+import zlib
+from types import SimpleNamespace
+
+from livekit.agents import llm
+
+from agents.session_data import SessionData
+from tools.session_snapshot import SnapshotStore, decode, encode, restore, save_on_close
+
+
+def make_session_data(**kwargs) -> SessionData:
+    return SessionData(**{"device_id": "toy-1", "is_new_user": False, "user_name": "Maya", "age": 7,
+                          "chat_history": [{"role": "user", "content": "hi"}],
+                          "parental_instructions": {"restricted_topics": ["horror"]},
+                          "interest_tracker": object(), "content_guard": object(), **kwargs})
+
+
+def make_history(turns: int) -> llm.ChatContext:
+    history = llm.ChatContext()
+    history.add_message(role="system", content="You are Joy.")
+    for i in range(turns):
+        history.add_message(role="user", content=f"question {i}")
+        history.add_message(role="assistant", content=f"answer {i}")
+    return history
+
+
+def test_encode_restore_round_trip():
+    original = make_session_data()
+    payload = decode(encode(original, make_history(3), "ConversationContinuationAgent", max_items=4))
+    assert payload["agent"] == "ConversationContinuationAgent"
+
+    resumed = SessionData(device_id="toy-1", is_new_user=True)
+    chat = restore(resumed, payload)
+    assert (resumed.user_name, resumed.age, resumed.session_id) == ("Maya", 7, original.session_id)
+    assert resumed.chat_history == original.chat_history
+    assert resumed.parental_instructions == {"restricted_topics": ["horror"]}
+    # Live helpers are rebuilt, not restored.
+    assert resumed.interest_tracker is None and resumed.content_guard is None
+    # Instructions are dropped and only the last items kept.
+    assert [item.text_content for item in chat.items] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+
+def test_corrupt_or_old_snapshots_decode_to_none():
+    assert decode(b"not zlib") is None
+    blob = encode(make_session_data(), None, "")
+    assert decode(blob)["chat_ctx"] == {"items": []}
+    assert decode(zlib.compress(b'{"v": 0}')) is None
+
+
+def test_store_take_removes_and_respects_the_ttl(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), ttl=60)
+    store.save("toy-1", encode(make_session_data(), None, ""))
+    assert asyncio.run(store.take("toy-1"))["session_data"]["user_name"] == "Maya"
+    assert asyncio.run(store.take("toy-1")) is None
+
+    store.save("toy-1", encode(make_session_data(), None, ""))
+    old = time.time() - 120
+    os.utime(store._path("toy-1"), (old, old))
+    assert asyncio.run(store.take("toy-1")) is None
+    assert not os.listdir(tmp_path)
+
+
+def test_saved_only_when_the_session_may_be_resumed(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), ttl=60)
+
+    class Session:
+        current_agent = None
+        history = make_history(1)
+
+        def on(self, event, callback):
+            self.close = callback
+
+    def close(reason, **kwargs):
+        session = Session()
+        data = make_session_data(**kwargs)
+        save_on_close(session, data, store)
+        session.close(SimpleNamespace(reason=reason))
+        return asyncio.run(store.take(data.device_id))
+
+    assert close("user_initiated") is None
+    assert close("participant_disconnected", finished=True) is None
+    assert close("participant_disconnected") is not None
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import stat
+import time
+
+from tools.shared_cache import SharedCache
+
+
+def make_cache(tmp_path, **kwargs) -> SharedCache:
+    return SharedCache(path=str(tmp_path / "cache" / "cache.sqlite3"), **{"max_bytes": 1 << 20, **kwargs})
+
+
+def test_values_round_trip_and_namespaces_are_separate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_many_sync("profile", {"a": {"name": "Maya", "age": 7}, "b": [1, 2]}, ttl=60)
+    cache.put_many_sync("embedding", {"a": b"\x00\x01"}, ttl=60)
+    assert cache.get_many_sync("profile", ["a", "b", "c"]) == {"a": {"name": "Maya", "age": 7}, "b": [1, 2]}
+    assert cache.get_many_sync("embedding", ["a"]) == {"a": b"\x00\x01"}
+    assert cache.get_many_sync("profile", []) == {}
+
+
+def test_expired_entries_are_misses_and_trimmed(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_many_sync("summary", {"old": "x"}, ttl=-1)
+    cache.put_many_sync("summary", {"new": "y"}, ttl=60)
+    assert cache.get_many_sync("summary", ["old", "new"]) == {"new": "y"}
+    cache.trim_sync()
+    assert cache._connection().execute("SELECT key FROM entries").fetchall() == [("new",)]
+
+
+def test_trim_drops_the_least_recently_used_first(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10_000)
+    cache.put_many_sync("n", {"cold": "x" * 3000, "warm": "y" * 3000}, ttl=60)
+    conn = cache._connection()
+    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = 'cold'", (time.time() - 3600,))
+    # Past 90% of max_bytes: the write itself triggers the trim.
+    cache.put_many_sync("n", {"hot": "z" * 4000}, ttl=60)
+    assert cache.get_many_sync("n", ["cold", "warm", "hot"]).keys() == {"warm", "hot"}
+
+
+def test_reads_refresh_stale_access_times(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_many_sync("n", {"k": 1}, ttl=60)
+    conn = cache._connection()
+    conn.execute("UPDATE entries SET accessed_at = 0")
+    assert cache.get_many_sync("n", ["k"]) == {"k": 1}
+    assert conn.execute("SELECT accessed_at FROM entries").fetchone()[0] > time.time() - 60
+
+
+def test_async_api_and_private_file(tmp_path):
+    cache = make_cache(tmp_path)
+
+    async def run():
+        await cache.set("n", "k", {"v": 1}, ttl=60)
+        return await cache.get("n", "k"), await cache.get("n", "missing")
+
+    assert asyncio.run(run()) == ({"v": 1}, None)
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(cache.path)).st_mode) == 0o700
+
+
+def test_errors_are_misses(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    cache = SharedCache(path=str(blocker / "cache.sqlite3"))
+    assert cache.get_many_sync("n", ["k"]) == {}
+    cache.put_many_sync("n", {"k": 1}, ttl=60)
@@ -0,0 +1,101 @@
+import asyncio
+
+from tools.single_flight import SingleFlight, coalesce
+
+
+def test_concurrent_calls_share_one_run():
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def run():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("a", fetch, "a") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == ["a"]
+    assert all(result == {"key": "a"} for result in results)
+
+
+def test_every_caller_gets_its_own_copy():
+    held = {"items": [1]}
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return held
+
+    async def run():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("a", fetch) for _ in range(3)))
+
+    results = asyncio.run(run())
+    results[0]["items"].append(2)
+    assert results[1] == results[2] == {"items": [1]}
+    assert held == {"items": [1]}
+    assert len({id(result) for result in results}) == 3
+    assert all(result is not held for result in results)
+
+
+def test_nothing_is_cached_after_the_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight("test")
+        return [await flight.do("a", fetch), await flight.do("a", fetch)]
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_errors_reach_every_caller():
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("down")
+
+    async def run():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("a", fetch) for _ in range(2)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_leader_cancelled_others_still_get_the_result():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flight = SingleFlight("test")
+        leader = asyncio.create_task(flight.do("a", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("a", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_coalesce_keys_on_arguments_without_self():
+    class Helper:
+        def __init__(self):
+            self.calls = 0
+
+        @coalesce
+        async def fetch(self, key):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return key
+
+    async def run(helper):
+        return await asyncio.gather(helper.fetch("a"), helper.fetch("a"), helper.fetch("b"))
+
+    helper = Helper()
+    assert asyncio.run(run(helper)) == ["a", "a", "b"]
+    assert helper.calls == 2
@@ -0,0 +1,48 @@
+from tools.speech_chunker import ChunkSplitter
+
+
+def split(pieces, **kwargs) -> list[str]:
+    splitter = ChunkSplitter(**{"first_min_chars": 12, "min_chars": 40, "max_chars": 220, **kwargs})
+    chunks = []
+    for piece in pieces:
+        chunks.extend(splitter.push(piece))
+    rest = splitter.flush()
+    return chunks + ([rest] if rest else [])
+
+
+def tokens(text: str) -> list[str]:
+    return [word + " " for word in text.split(" ")]
+
+
+def test_first_chunk_goes_out_at_the_first_clause():
+    splitter = ChunkSplitter(first_min_chars=12, min_chars=40, max_chars=220)
+    assert splitter.push("Oh wow, dinosaurs") == []
+    assert splitter.push(" are amazing, ") == ["Oh wow, dinosaurs are amazing,"]
+
+
+def test_later_chunks_wait_for_a_sentence_end():
+    text = "Oh wow, that is so cool! Wow! Did you know some dinosaurs had feathers? They did."
+    assert split(tokens(text)) == [
+        "Oh wow, that is so cool!",
+        "Wow! Did you know some dinosaurs had feathers?",
+        "They did.",
+    ]
+
+
+def test_a_boundary_needs_the_next_token():
+    splitter = ChunkSplitter(first_min_chars=1, min_chars=1, max_chars=220)
+    assert splitter.push("It weighs 3.") == []
+    assert splitter.push("5 tonnes. ") == ["It weighs 3.5 tonnes."]
+
+
+def test_long_text_is_cut_at_a_word():
+    chunks = split(["word " * 100], max_chars=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == ["word"] * 100
+
+
+def test_flush_returns_the_rest_once():
+    splitter = ChunkSplitter(first_min_chars=12, min_chars=40, max_chars=220)
+    splitter.push("Hi there")
+    assert splitter.flush() == "Hi there"
+    assert splitter.flush() is None
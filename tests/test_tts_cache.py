@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+from benchmarks.fakes import FakeTTS
+from tools.tts_cache import ALL_PITCHES, TtsCache, cache_key
+
+
+def make_cache(tmp_path, factories=None, **kwargs) -> TtsCache:
+    def factory(pitch):
+        if factories is not None:
+            factories.append(pitch)
+        return FakeTTS()
+
+    return TtsCache(str(tmp_path / "tts"), **{"memory_bytes": 8 << 20, "disk_bytes": 64 << 20,
+                                               "voice": "test", "tts_factory": factory, **kwargs})
+
+
+async def collect(frames) -> int:
+    return sum([1 async for _ in frames])
+
+
+def test_pitch_is_normalized_in_the_key():
+    assert cache_key("v", "High", "hi there") == cache_key("v", "high", "hi  there")
+    assert cache_key("v", "squeaky", "hi") == cache_key("v", None, "hi")
+    assert cache_key("v", "low", "hi") != cache_key("v", None, "hi")
+
+
+def test_warm_covers_every_pitch_and_a_second_process_preloads_them(tmp_path):
+    factories = []
+    cache = make_cache(tmp_path, factories)
+    asyncio.run(cache.warm(["Hello!"]))
+    assert sorted(factories, key=str) == sorted(ALL_PITCHES, key=str)
+
+    other = make_cache(tmp_path)
+    assert other.preload(["Hello!", "Never stored."]) == len(ALL_PITCHES)
+    for pitch in ALL_PITCHES:
+        assert asyncio.run(collect(other.frames("Hello!", pitch))) > 0
+    assert other.frames("Never stored.") is None
+
+
+def test_clips_stored_elsewhere_hit_once_located(tmp_path):
+    asyncio.run(make_cache(tmp_path).warm(["Welcome back!"], pitches=("low",)))
+    cache = make_cache(tmp_path)
+    assert cache.frames("Welcome back!", "low") is None
+
+    async def run():
+        assert await cache.locate("Welcome back!", "LOW")
+        return await collect(cache.frames("Welcome back!", "low"))
+
+    assert asyncio.run(run()) > 0
+    assert cache._clips
+
+
+def test_a_clip_trimmed_after_it_was_located_is_spoken_live(tmp_path):
+    asyncio.run(make_cache(tmp_path).warm(["Bye!"], pitches=(None,)))
+    cache = make_cache(tmp_path)
+
+    async def run():
+        await cache.locate("Bye!")
+        os.remove(cache._path(cache_key("test", None, "Bye!")))
+        return await collect(cache.frames("Bye!"))
+
+    assert asyncio.run(run()) > 0
+    assert cache.frames("Bye!") is None
+
+
+def test_eviction_keeps_unstarted_and_playing_clips_readable(tmp_path):
+    asyncio.run(make_cache(tmp_path).warm(["One.", "Two."], pitches=(None,)))
+    cache = make_cache(tmp_path, memory_bytes=1)
+    cache.preload(["One."])
+    unstarted = cache.frames("One.")
+    cache.preload(["Two."])
+    assert list(cache._clips) == [cache_key("test", None, "Two.")]
+    assert asyncio.run(collect(unstarted)) > 0
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import config
+from tools import metrics, turn_taking
+from tools.turn_taking import TurnLatencyObserver, endpointing_for_age, parse_age_bands
+
+
+def test_parses_ranges_and_delays():
+    assert parse_age_bands("3-6=0.8:5.0,7-9=0.6:4.0") == [(3, 6, 0.8, 5.0), (7, 9, 0.6, 4.0)]
+
+
+def test_single_age_and_single_delay():
+    assert parse_age_bands(" 10 = 0.5 ") == [(10, 10, 0.5, 0.5)]
+
+
+def test_skips_empty_and_malformed_parts():
+    assert parse_age_bands("") == []
+    assert parse_age_bands(None) == []
+    assert parse_age_bands("3-6=0.8:5.0,,junk") == [(3, 6, 0.8, 5.0)]
+
+
+def test_endpointing_follows_the_age_band(monkeypatch):
+    monkeypatch.setattr(turn_taking, "AGE_BANDS", [(3, 6, 0.8, 5.0), (7, 9, 0.6, 4.0)])
+    assert endpointing_for_age(4) == ("3-6", 0.8, 5.0)
+    assert endpointing_for_age("9") == ("7-9", 0.6, 4.0)
+    default = ("default", config.MIN_ENDPOINTING_DELAY, config.MAX_ENDPOINTING_DELAY)
+    assert endpointing_for_age(12) == default
+    assert endpointing_for_age(None) == default
+    assert endpointing_for_age("seven") == default
+
+
+def test_latency_is_measured_from_the_end_of_speech_to_the_first_reply_audio():
+    observer = TurnLatencyObserver("test-band", "test-detector")
+    key = metrics._key("eou_to_reply_seconds", {"band": "test-band", "detector": "test-detector"})
+
+    def user(old, new, at):
+        observer._on_user_state_changed(SimpleNamespace(old_state=old, new_state=new, created_at=at))
+
+    def agent(new, at):
+        observer._on_agent_state_changed(SimpleNamespace(new_state=new, created_at=at))
+
+    user("listening", "speaking", 10.0)
+    user("speaking", "listening", 11.0)
+    agent("thinking", 11.2)
+    agent("speaking", 11.5)
+    agent("speaking", 13.0)  # Same turn, still speaking: not a second sample.
+    snapshot = metrics._histograms[key].snapshot()
+    assert snapshot["count"] == 1
+    assert abs(snapshot["sum"] - 0.5) < 1e-9
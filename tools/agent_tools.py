@@ -1,53 +1,132 @@
+import asyncio
+import sqlite3
 from livekit.agents import function_tool
 from livekit import rtc
+import config
 from .supabase_tools import SupabaseHelper
 from agents.session_data import SessionData
-from agents.user_interests_agent import UserInterestAgent
-from openai import OpenAI
-from config import OPENAI_API_KEY
 import logging
+from .log_setup import log_event
+from .greeting_precompute import schedule_greeting
+from . import model_registry
+from .embedding_gateway import get_embedding_gateway
+from .finalize_queue import get_finalize_queue
+from .hybrid_retrieval import hybrid_context
+from .interest_matcher import classify_turns
+from .session_snapshot import RESUMABLE_REASONS
 
 db = SupabaseHelper()
-agent = UserInterestAgent()
-client = OpenAI(api_key=OPENAI_API_KEY) 
 
 logger = logging.getLogger('livekit.router')
 
+# The exit tool's job waits this long for the close that follows the goodbye
+# (which re-enqueues it with every turn and no delay); it's the fallback if
+# the close never comes.
+EXIT_GRACE_S = 30.0
+
+
+def finalize_payload(session_data: SessionData) -> dict | None:
+	"""What finalizing the session needs, as JSON; None if nothing was said."""
+	if not session_data.chat_history:
+		return None
+	tracker = session_data.interest_tracker
+	return {
+		"session_id": session_data.session_id,
+		"device_id": session_data.device_id,
+		"chat_history": list(session_data.chat_history),
+		"interests": tracker.discovered if tracker is not None else {},
+		"unclassified": tracker.unclassified() if tracker is not None else [],
+	}
+
+
 async def exit_session(session_data: SessionData):
-	logger.info(f"Chat : {session_data.chat_history}")
-	await agent.process_message(user_id=session_data.device_id,message=session_data.chat_history)
-	
-	chat_history = session_data.chat_history
-
-	text_to_embed = " ".join([m['content'] for m in chat_history])
-	logger.info(f"Text to embed : {text_to_embed}")
-	response = client.embeddings.create(
-		input=[text_to_embed],
-		model="text-embedding-3-small"
-	)
-	embedding_vector = response.data[0].embedding
-	print(embedding_vector)
-
-	result = await db.log_conversation(child_id=session_data.device_id, content=session_data.chat_history, embedding=embedding_vector)
-	
-	return result
+	log_event(logger, "session.exit", logging.DEBUG, device_id=session_data.device_id,
+			  messages=len(session_data.chat_history))
+	session_data.finished = True
+	payload = finalize_payload(session_data)
+	if payload is None:
+		return None
+	if config.FINALIZE_QUEUE:
+		await asyncio.to_thread(get_finalize_queue().enqueue, session_data.session_id, payload, EXIT_GRACE_S)
+		return None
+	[error] = await finalize_sessions([payload])
+	if error is not None:
+		log_event(logger, "session.finalize_failed", logging.ERROR, device_id=session_data.device_id, error=repr(error))
+	return None
+
+
+def finalize_on_close(session, session_data: SessionData, queue=None):
+	"""Enqueue `session` for finalization when it closes, however it closes."""
+	queue = queue or get_finalize_queue()
+
+	def on_close(ev):
+		payload = finalize_payload(session_data)
+		if payload is None:
+			return
+		reason = str(getattr(ev.reason, "value", ev.reason))
+		# A drop may be resumed from its snapshot (which cancels this); finalize once that chance has passed.
+		resumable = config.SESSION_SNAPSHOTS and not session_data.finished and reason in RESUMABLE_REASONS
+		try:
+			queue.enqueue(session_data.session_id, payload, delay=config.SNAPSHOT_TTL_S if resumable else 0.0)
+		except sqlite3.Error as e:
+			log_event(logger, "session.enqueue_failed", logging.ERROR, device_id=session_data.device_id, error=repr(e))
+
+	session.on("close", on_close)
+
+
+async def finalize_sessions(payloads: list[dict]) -> list[Exception | None]:
+	"""
+	The finalize queue's handler: one embeddings request for every
+	transcript in the batch, then each session's interests, conversation
+	log and next greeting. Returns None or the error, per session.
+	"""
+	gateway = get_embedding_gateway()
+	texts = [" ".join(m['content'] for m in payload["chat_history"]) for payload in payloads]
+	try:
+		vectors = await gateway.embed_many(texts, lane="background")
+	except Exception:
+		# One text can fail the whole batch; embed them one by one so only its session is retried.
+		vectors = await asyncio.gather(*(gateway.embed(text, lane="background") for text in texts),
+									   return_exceptions=True)
+	results = await asyncio.gather(*(_finalize(payload, vector) for payload, vector in zip(payloads, vectors)),
+								   return_exceptions=True)
+	return [result if isinstance(result, Exception) else None for result in results]
+
+
+async def _finalize(payload: dict, embedding: list[float] | Exception):
+	if isinstance(embedding, Exception):
+		raise embedding
+	device_id = payload["device_id"]
+	# Interests were tagged turn by turn; only the leftovers are classified here.
+	interests = {category: list(items) for category, items in (payload.get("interests") or {}).items()}
+	if payload.get("unclassified"):
+		for category, items in (await classify_turns(payload["unclassified"])).items():
+			known = interests.setdefault(category, [])
+			known.extend(item for item in items if item not in known)
+	if interests:
+		await db.merge_interests(device_id, interests)
+
+	await db.log_conversation(child_id=device_id, content=payload["chat_history"], embedding=embedding,
+							  session_id=payload["session_id"])
+	log_event(logger, "session.finalized", device_id=device_id, session_id=payload["session_id"],
+			  messages=len(payload["chat_history"]), dims=len(embedding))
+	# Next session's greeting, from the summaries and interests just saved.
+	schedule_greeting(db, device_id)
 
 async def get_data(message: str, session_data: SessionData):
-    print(f"message : {message}")
+    log_event(logger, "rag.query", logging.DEBUG, device_id=session_data.device_id, query=message)
 
-    response = client.embeddings.create(
-        input=[message],
-        model="text-embedding-3-small"
-    )
-    embedding = response.data[0].embedding
+    embedding = await get_embedding_gateway().embed(message, lane="retrieval")
 
-    result = await db.get_rag_context(child_id=session_data.device_id, embedding=embedding)
+    # Vector matches miss exact names ("Biscuit"); recent sessions are scored lexically as well.
+    vector_rows, memory_rows = await asyncio.gather(
+        db.match_conversations(child_id=session_data.device_id, embedding=embedding,
+                               match_threshold=config.RAG_VECTOR_THRESHOLD, match_count=config.RAG_VECTOR_CANDIDATES),
+        db.get_last_n_conversations(session_data.device_id, config.RAG_MEMORY_SESSIONS),
+    )
+    result = await hybrid_context(message, embedding, vector_rows, memory_rows)
 
-    # Ensure it's a text string the LLM can read
-    if isinstance(result, list):
-        result = "\n".join([r["content"] for r in result if "content" in r])
-    
-    print(f"result from RAG retrieval ::: {result}")
+    log_event(logger, "rag.result", device_id=session_data.device_id, chars=len(result or ""))
     return result
 
 async def generate_query_summary(chat_history: list) -> str:
@@ -73,15 +152,11 @@ async def generate_query_summary(chat_history: list) -> str:
         messages.append({"role": msg['role'], "content": msg['content']})
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.0
-        )
+        response = await model_registry.complete("query_synthesis", messages, temperature=0.0)
         summary = response.choices[0].message.content.strip()
-        print(f"Synthesized query for RAG: {summary}")
+        log_event(logger, "rag.query_synthesized", logging.DEBUG, query=summary)
         return summary
     except Exception as e:
-        print(f"Error generating query summary: {e}")
+        log_event(logger, "rag.query_synthesis_failed", logging.WARNING, error=repr(e))
         return chat_history[-1]['content']
 
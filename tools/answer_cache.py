@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+from livekit.agents import llm
+
+import config
+from tools import metrics
+from tools.embedding_gateway import get_embedding_gateway
+from tools.fun_facts import age_band
+from tools.greeting_precompute import rules_fingerprint
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.answer_cache")
+
+NAME_SLOT = "{name}"
+
+metrics.describe("answer_cache_lookups_total", "Answer cache lookups, by outcome (and reason when skipped).")
+metrics.describe("answer_cache_similarity", "Best cosine similarity found by answer cache lookups.")
+metrics.describe("answer_cache_entries", "Answers currently held by the answer cache.")
+metrics.describe("answer_cache_evictions_total", "Answers dropped from the answer cache, by reason.")
+
+QUESTION_RE = re.compile(
+    r"^\s*(why|how|what|what's|whats|where|when|who|which|is|are|do|does|did|can|could|would|will)\b", re.IGNORECASE)
+# Anything about the child, the people around them or this conversation
+# needs the full context; only general questions are shared between children.
+PERSONAL_RE = re.compile(
+    r"\b(i|i'm|im|i've|i'd|i'll|me|my|mine|myself|we|we're|us|our|ours|remember|told|said|earlier|"
+    r"yesterday|today|tonight|tomorrow|last time|mom|mum|dad|brother|sister|friend|teacher)\b", re.IGNORECASE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", text or "").lower().split())
+
+
+def personality_key(personality) -> tuple:
+    """Role plus traits rounded to one decimal, so near-identical toys share answers."""
+    if not isinstance(personality, dict):
+        return (str(personality or ""),)
+    traits = tuple(sorted((k, round(v, 1)) for k, v in personality.items() if isinstance(v, (int, float))))
+    return (str(personality.get("role_identity") or ""), *traits)
+
+
+class _Entry:
+    __slots__ = ("partition", "question", "answer", "vector", "created_at", "hits")
+
+    def __init__(self, partition: tuple, question: str, answer: str, vector: np.ndarray):
+        self.partition = partition
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.created_at = time.monotonic()
+        self.hits = 0
+
+
+class CachedTurn:
+    """One cacheable turn: replays a cached answer, or records the generated one."""
+
+    def __init__(self, cache: "AnswerCache", partition: tuple, question: str, vector, personal_terms: list[str],
+                 name: str, answer: str | None = None):
+        self.cache = cache
+        self.partition = partition
+        self.question = question
+        self.vector = vector
+        self.personal_terms = personal_terms
+        self.name = name
+        self.answer = answer
+
+    async def replay(self):
+        answer = self.answer.replace(NAME_SLOT, self.name or "friend")
+        yield answer
+
+    async def record(self, stream):
+        """Passes the LLM stream through and stores the answer if it was a plain, complete text reply."""
+        parts = []
+        plain = True
+        async for chunk in stream:
+            if isinstance(chunk, str):
+                parts.append(chunk)
+            elif isinstance(chunk, llm.ChatChunk) and chunk.delta is not None:
+                if chunk.delta.tool_calls:
+                    plain = False
+                parts.append(chunk.delta.content or "")
+            else:
+                plain = False
+            yield chunk
+        if plain and self.vector is not None:
+            self.cache.store(self, "".join(parts).strip())
+
+
+class AnswerCache:
+    """
+    Process-wide cache of answers to general questions ("why is the sky
+    blue?"), shared between children of the same age band, toy
+    personality and parental rules. A question matches a cached one when
+    their embeddings' cosine similarity reaches `threshold`. Answers are
+    stored with the child's name replaced by a slot and filled back in for
+    whoever asks next; entries expire after `ttl_hours` and the least recently used go
+    first once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: float = config.ANSWER_CACHE_SIMILARITY,
+                 max_entries: int = config.ANSWER_CACHE_MAX_ENTRIES, ttl_hours: float = config.ANSWER_CACHE_TTL_H,
+                 max_words: int = config.ANSWER_CACHE_MAX_WORDS,
+                 lookup_timeout: float = config.ANSWER_CACHE_LOOKUP_MS / 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl_hours * 3600
+        self.max_words = max_words
+        self.lookup_timeout = lookup_timeout
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._partitions = {}  # partition -> (ids, matrix), rebuilt after changes
+        self._next_id = 0
+
+    def _skip(self, reason: str) -> None:
+        metrics.inc("answer_cache_lookups_total", outcome="skipped", reason=reason)
+        return None
+
+    async def lookup(self, chat_ctx: llm.ChatContext, session_data) -> CachedTurn | None:
+        """The turn to serve or record, or None when this turn shouldn't touch the cache."""
+        last = chat_ctx.items[-1] if chat_ctx.items else None
+        if last is None or last.type != "message" or last.role != "user":
+            # Follow-up generation after a tool call.
+            return self._skip("tool_turn")
+        question = normalize(last.text_content)
+        if not question or len(question.split()) > self.max_words or not QUESTION_RE.match(question):
+            return self._skip("not_question")
+
+        profile = session_data.child_profile or {}
+        name = (session_data.user_name or profile.get("name") or "").strip()
+        # Name and city first: asking about either makes the question personal.
+        personal_terms = [normalize(t) for t in (name, profile.get("city") or session_data.city,
+                                                 *(profile.get("interests") or []))]
+        padded = f" {question} "
+        if PERSONAL_RE.search(question) or any(f" {term} " in padded for term in personal_terms[:2] if term):
+            return self._skip("personal")
+
+        # Children under different parental rules never share answers.
+        partition = (age_band(profile.get("age") or session_data.age), personality_key(session_data.personality),
+                     rules_fingerprint(session_data.parental_instructions))
+        turn = CachedTurn(self, partition, question, None, personal_terms, name)
+        try:
+            turn.vector = await asyncio.wait_for(self._embed(question), self.lookup_timeout)
+        except Exception as e:
+            log_event(logger, "answer_cache.embed_failed", logging.DEBUG, error=repr(e))
+            metrics.inc("answer_cache_lookups_total", outcome="miss", reason="embed_failed")
+            return turn
+
+        entry_id, similarity = self._nearest(partition, turn.vector)
+        if similarity is not None:
+            metrics.observe("answer_cache_similarity", similarity)
+        if entry_id is None or similarity < self.threshold:
+            metrics.inc("answer_cache_lookups_total", outcome="miss")
+            return turn
+
+        self._entries.move_to_end(entry_id)
+        entry = self._entries[entry_id]
+        entry.hits += 1
+        turn.answer = entry.answer
+        metrics.inc("answer_cache_lookups_total", outcome="hit")
+        log_event(logger, "answer_cache.hit", logging.DEBUG, similarity=round(similarity, 3),
+                  question=question, cached_question=entry.question)
+        return turn
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(await get_embedding_gateway().embed(text, lane="live"), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _nearest(self, partition: tuple, vector: np.ndarray) -> tuple[int | None, float | None]:
+        self._expire()
+        if partition not in self._partitions:
+            ids = [i for i, e in self._entries.items() if e.partition == partition]
+            if not ids:
+                return None, None
+            self._partitions[partition] = (ids, np.stack([self._entries[i].vector for i in ids]))
+        ids, matrix = self._partitions[partition]
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        return ids[best], float(scores[best])
+
+    def store(self, turn: CachedTurn, answer: str):
+        if not answer:
+            return
+        text = normalize(answer)
+        # Answers that lean on this child's city or interests don't carry over.
+        if any(term and term != normalize(turn.name) and term in text for term in turn.personal_terms):
+            return
+        if turn.name:
+            answer = re.sub(rf"\b{re.escape(turn.name)}\b", NAME_SLOT, answer, flags=re.IGNORECASE)
+        entry = _Entry(turn.partition, turn.question, answer, turn.vector)
+        self._entries[self._next_id] = entry
+        self._next_id += 1
+        self._partitions.pop(turn.partition, None)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), "capacity")
+        metrics.set_gauge("answer_cache_entries", len(self._entries))
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [i for i, e in self._entries.items() if now - e.created_at > self.ttl]
+        for entry_id in expired:
+            self._evict(entry_id, "expired")
+        if expired:
+            metrics.set_gauge("answer_cache_entries", len(self._entries))
+
+    def _evict(self, entry_id: int, reason: str):
+        entry = self._entries.pop(entry_id)
+        self._partitions.pop(entry.partition, None)
+        metrics.inc("answer_cache_evictions_total", reason=reason)
+
+
+_cache = None
+
+
+def get_answer_cache() -> AnswerCache:
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache()
+    return _cache
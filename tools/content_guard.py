@@ -0,0 +1,164 @@
+import importlib
+import logging
+import re
+import time
+from typing import AsyncIterable, Callable
+
+from livekit.agents import llm
+
+from tools import metrics
+from tools.speech_chunker import CLAUSE_BOUNDARY, SENTENCE_BOUNDARY
+
+logger = logging.getLogger("livekit.content_guard")
+
+metrics.describe("content_guard_sentences_total", "Sentences checked by the content guard, by action.")
+metrics.describe("content_guard_check_seconds", "Time to check one sentence.")
+
+# Extra words that give a restricted topic away without naming it.
+TOPIC_TERMS = {
+    "violence": ("violent", "kill", "kills", "killed", "killing", "murder", "blood", "bloody", "gun", "guns",
+                 "shoot", "shooting", "weapon", "weapons", "stab", "stabbing", "war", "wars", "bomb", "bombs"),
+    "politics": ("political", "politician", "politicians", "election", "elections", "vote", "voting",
+                 "president", "prime minister", "parliament", "government"),
+    "religion": ("religious", "god", "gods", "church", "temple", "mosque", "prayer", "pray"),
+    "death": ("die", "dies", "died", "dying", "dead", "funeral"),
+    "horror": ("scary", "ghost", "ghosts", "zombie", "zombies", "monster", "monsters", "haunted"),
+    "drugs": ("drug", "alcohol", "beer", "wine", "smoking", "cigarette", "cigarettes"),
+    "romance": ("dating", "kiss", "kissing", "boyfriend", "girlfriend"),
+}
+
+PROFANITY = (
+    "damn", "dammit", "hell", "crap", "crappy", "shit", "shitty", "bullshit", "fuck", "fucking", "fucked",
+    "bitch", "bastard", "ass", "asshole", "dick", "piss", "pissed", "bloody hell", "wtf",
+)
+
+# Enforced while a child's rules can't be read: every known topic restricted, language filtered.
+STRICT_RULES = {"restricted_topics": sorted(TOPIC_TERMS), "language_filter": True}
+
+REDIRECT = "Hmm, let's talk about something else! What else would you like to explore?"
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\n+")
+# Where a streamed reply is checked and released: the boundaries TTS chunking
+# cuts at, with the whitespace after them so the chunker sees the cut at once.
+RELEASE_POINT = re.compile(rf"(?:(?P<sentence>{SENTENCE_BOUNDARY.pattern})|{CLAUSE_BOUNDARY.pattern})\s*")
+
+
+def _alternation(terms) -> re.Pattern | None:
+    terms = sorted({t.strip().lower() for t in terms if t and t.strip()}, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(t).replace(r"\ ", r"\s+") for t in terms) + r")\b", re.IGNORECASE)
+
+
+def load_classifier(spec: str) -> Callable[[str], float] | None:
+    """`"package.module:function"` -> callable(sentence) returning an unsafe score in [0, 1]."""
+    if not spec:
+        return None
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class ContentGuard:
+    """
+    Hard enforcement of the child's parental rules on what the agent says.
+    Restricted topics (plus common giveaway words) suppress the sentence;
+    with `language_filter` on, profanity is cut out of it. An optional
+    local classifier can flag sentences the word lists miss. Everything is
+    compiled into a couple of regexes, so a check costs microseconds.
+    """
+
+    def __init__(self, rules: dict | None = None, classifier: Callable[[str], float] | None = None,
+                 classifier_threshold: float = 0.8):
+        self.classifier = classifier
+        self.classifier_threshold = classifier_threshold
+        self._fingerprint = None
+        self.topic_re = None
+        self.profanity_re = None
+        self.sync(rules or {})
+
+    @staticmethod
+    def _fingerprint_of(rules: dict) -> tuple:
+        return tuple(rules.get("restricted_topics") or ()), bool(rules.get("language_filter"))
+
+    def sync(self, rules: dict):
+        """Recompiles if the restricted topics or language filter changed since the last call."""
+        fingerprint = self._fingerprint_of(rules)
+        if fingerprint == self._fingerprint:
+            return
+        topics, language_filter = fingerprint
+        terms = []
+        for topic in topics:
+            terms.append(topic)
+            terms.extend(TOPIC_TERMS.get(topic.strip().lower(), ()))
+        self.topic_re = _alternation(terms)
+        self.profanity_re = _alternation(PROFANITY) if language_filter else None
+        self._fingerprint = fingerprint
+        logger.info(f"Content guard compiled: {len(topics)} restricted topics, language filter {language_filter}")
+
+    @property
+    def active(self) -> bool:
+        return self.topic_re is not None or self.profanity_re is not None or self.classifier is not None
+
+    def check(self, sentence: str) -> str | None:
+        """The sentence as it may be spoken, or None to suppress it."""
+        started = time.perf_counter()
+        action = "pass"
+        if self.topic_re is not None and self.topic_re.search(sentence):
+            sentence, action = None, "suppressed"
+        elif self.classifier is not None and self.classifier(sentence) >= self.classifier_threshold:
+            sentence, action = None, "suppressed"
+        elif self.profanity_re is not None:
+            cleaned, count = self.profanity_re.subn("", sentence)
+            if count:
+                sentence, action = re.sub(r"\s{2,}", " ", cleaned).replace(" ,", ",").strip(), "rewritten"
+        metrics.observe("content_guard_check_seconds", time.perf_counter() - started)
+        metrics.inc("content_guard_sentences_total", action=action)
+        return sentence
+
+    async def filter_stream(self, stream: AsyncIterable) -> AsyncIterable:
+        """
+        Wraps an `llm_node` stream: text is held back to the next clause or
+        sentence end (the points TTS chunking cuts at), checked, then
+        released as a plain string. Once a clause is suppressed, the rest of
+        its sentence is too. Tool calls and other chunks pass through
+        untouched. If everything in a reply is suppressed, a neutral
+        redirect is said instead.
+        """
+        buffer = ""
+        spoke = suppressed = dropping = False
+        async for chunk in stream:
+            if isinstance(chunk, str):
+                text = chunk
+            elif isinstance(chunk, llm.ChatChunk) and chunk.delta is not None and chunk.delta.content:
+                text = chunk.delta.content
+                if chunk.delta.tool_calls:
+                    yield llm.ChatChunk(id=chunk.id, delta=llm.ChoiceDelta(
+                        role=chunk.delta.role, tool_calls=chunk.delta.tool_calls), usage=chunk.usage)
+            else:
+                yield chunk
+                continue
+
+            buffer += text
+            start = 0
+            for match in RELEASE_POINT.finditer(buffer):
+                piece, start = buffer[start:match.end()], match.end()
+                if not piece.strip():
+                    continue
+                allowed = None if dropping else self.check(piece.strip())
+                if allowed is None:
+                    suppressed = True
+                    dropping = match.group("sentence") is None
+                elif allowed:
+                    spoke = True
+                    yield allowed + " "
+            buffer = buffer[start:]
+
+        if buffer.strip() and not dropping:
+            allowed = self.check(buffer.strip())
+            if allowed is None:
+                suppressed = True
+            elif allowed:
+                spoke = True
+                yield allowed
+        if suppressed and not spoke:
+            yield REDIRECT
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+import numpy as np
+import openai
+
+import config
+from tools import metrics, model_registry, openai_scheduler, shared_cache
+from tools.openai_scheduler import LANES
+
+logger = logging.getLogger("livekit.embedding_gateway")
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+metrics.describe("embedding_batch_size", "Texts per embeddings request sent by the gateway.")
+metrics.describe("embedding_batch_wait_seconds", "Time a text waited for its batch to be sent.")
+metrics.describe("embedding_requests_total", "Embeddings requests sent by the gateway, by outcome (ok, error, split).")
+
+
+class _Pending:
+    __slots__ = ("text", "lane", "future", "queued_at")
+
+    def __init__(self, text: str, lane: str, future: asyncio.Future):
+        self.text = text
+        self.lane = lane
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class EmbeddingGateway:
+    """
+    Collects embedding requests from every session in the worker for up to
+    `max_wait` seconds and sends them as one `embeddings.create` call of at
+    most `max_batch` texts (and `max_batch_chars` characters), then hands
+    each caller its own vector. A batch runs in the highest lane of the
+    texts in it. Texts longer than `solo_chars` go on their own, and a
+    batch OpenAI rejects as invalid is retried one text at a time, so a bad
+    input can only fail its own caller; empty texts fail without a request.
+    Vectors are kept in the shared cache, so a text embedded by any job
+    process on the host isn't sent again.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, max_wait: float = config.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+                 max_batch: int = config.EMBEDDING_BATCH_MAX_SIZE, max_batch_chars: int = 200_000,
+                 solo_chars: int = 8_000):
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.max_batch_chars = max_batch_chars
+        self.solo_chars = solo_chars
+        # Created from the worker's event loop; sync callers in executor threads submit to it.
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+        self._pending = []
+        self._pending_chars = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def embed(self, text: str, lane: str = "retrieval") -> list[float]:
+        return (await self.embed_many([text], lane))[0]
+
+    async def embed_many(self, texts: list[str], lane: str = "retrieval") -> list[list[float]]:
+        self.loop = asyncio.get_running_loop()
+        cache = shared_cache.get_shared_cache()
+        if cache is None:
+            return await self._embed(texts, lane)
+        # Vectors are deterministic per model and text; any job process on the host may have one.
+        keys = {text: hashlib.sha1(f"{self.model}|{text}".encode("utf-8")).hexdigest() for text in texts}
+        found = await cache.get_many("embedding", list(set(keys.values())))
+        vectors = {text: np.frombuffer(found[key], dtype=np.float32).tolist()
+                   for text, key in keys.items() if key in found}
+        missing = [text for text in keys if text not in vectors]
+        if missing:
+            fresh = dict(zip(missing, await self._embed(missing, lane)))
+            cache.put_many("embedding", {keys[text]: np.asarray(vector, dtype=np.float32).tobytes()
+                                         for text, vector in fresh.items()},
+                           ttl=config.SHARED_CACHE_EMBEDDING_TTL_H * 3600)
+            vectors.update(fresh)
+        return [vectors[text] for text in texts]
+
+    async def _embed(self, texts: list[str], lane: str) -> list[list[float]]:
+        futures = []
+        for text in texts:
+            future = self.loop.create_future()
+            futures.append(future)
+            if not text or not text.strip():
+                future.set_exception(ValueError("cannot embed an empty text"))
+                continue
+            pending = _Pending(text, lane, future)
+            if len(text) > self.solo_chars:
+                self._send([pending])
+                continue
+            if self._pending_chars + len(text) > self.max_batch_chars:
+                self._flush()
+            self._pending.append(pending)
+            self._pending_chars += len(text)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = self.loop.call_later(self.max_wait, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_chars = self._pending, [], 0
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: list[_Pending]):
+        task = asyncio.create_task(self._request(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _request(self, batch: list[_Pending]):
+        now = time.monotonic()
+        for pending in batch:
+            metrics.observe("embedding_batch_wait_seconds", now - pending.queued_at)
+        # Sessions often embed the same text (a shared question); send it once.
+        unique = list(dict.fromkeys(p.text for p in batch))
+        metrics.observe("embedding_batch_size", len(unique))
+        lane = min((p.lane for p in batch), key=lambda name: LANES.index(name) if name in LANES else len(LANES))
+        try:
+            with openai_scheduler.lane(lane):
+                response = await model_registry.client.embeddings.create(input=unique, model=self.model)
+        except Exception as e:
+            if isinstance(e, openai.BadRequestError) and len(unique) > 1:
+                # One input the API won't take rejects the whole request; find it.
+                metrics.inc("embedding_requests_total", outcome="split")
+                for text in unique:
+                    self._send([p for p in batch if p.text == text])
+                return
+            metrics.inc("embedding_requests_total", outcome="error")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        metrics.inc("embedding_requests_total", outcome="ok")
+        vectors = {unique[item.index]: item.embedding for item in response.data}
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(vectors[pending.text])
+
+
+_gateway = None
+
+
+def get_embedding_gateway() -> EmbeddingGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = EmbeddingGateway()
+    return _gateway
@@ -0,0 +1,271 @@
+"""
+Durable queue for post-session work. A session's transcript and leftover
+interest turns are written here when it ends (the exit tool, the idle
+timer, a drop) and the room closes right away; the worker process runs
+the finalization in batches off the call path, retrying with backoff.
+
+Jobs live in a local SQLite file (WAL mode) shared by every process on
+the host, keyed by session id: enqueueing a session that is already
+pending replaces its payload, and one that already ran is ignored. A
+dropped session is enqueued with a delay of SNAPSHOT_TTL_S and cancelled
+if the device resumes it, so it is finalized once, with everything said.
+
+Normally run by the worker process (see `main.py`); it can also be run on
+its own:
+
+    python -m tools.finalize_queue            # keep processing
+    python -m tools.finalize_queue --drain    # process what is due, then exit
+    python -m tools.finalize_queue --stats
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import config
+from tools import metrics
+from tools.shared_cache import make_private
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.finalize_queue")
+
+metrics.describe("finalize_jobs_total", "Session finalization jobs, by outcome (enqueued, done, retried, failed, cancelled).")
+metrics.describe("finalize_job_delay_seconds", "Time from a job becoming due to it being processed.")
+metrics.describe("finalize_batch_size", "Jobs processed per finalization batch.")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, run_after);
+"""
+
+
+class Job:
+    __slots__ = ("key", "payload", "attempts", "run_after")
+
+    def __init__(self, key: str, payload: dict, attempts: int, run_after: float):
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.run_after = run_after
+
+
+class FinalizeQueue:
+    """
+    Jobs are `pending` until claimed, `running` while leased to a worker
+    (for `lease` seconds; an expired lease is claimed again), then `done`,
+    or `failed` after `max_attempts`. Done and failed rows are kept for
+    `keep_done` seconds so duplicates stay no-ops and failures can be
+    inspected.
+    """
+
+    def __init__(self, path: str = config.FINALIZE_QUEUE_PATH, batch_size: int = config.FINALIZE_BATCH_SIZE,
+                 workers: int = config.FINALIZE_WORKERS, max_attempts: int = config.FINALIZE_MAX_ATTEMPTS,
+                 backoff: float = config.FINALIZE_BACKOFF_S, lease: float = 300.0, poll: float = 1.0,
+                 keep_done: float = 24 * 3600.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.poll = poll
+        self.keep_done = keep_done
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Payloads are whole transcripts: only the worker's user may read them.
+        make_private(self.path)
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # A job must survive the process (or host) going down right after it's written.
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.executescript(_SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def enqueue(self, key: str, payload: dict, delay: float = 0.0) -> bool:
+        """
+        Synchronous on purpose: it runs as the session closes, when the job
+        process may be about to exit. Returns False if `key` already ran
+        (or is running), in which case nothing changes.
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            """INSERT INTO jobs (key, payload, state, run_after, created_at, updated_at)
+               VALUES (?, ?, 'pending', ?, ?, ?)
+               ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, run_after = excluded.run_after,
+                   updated_at = excluded.updated_at
+               WHERE jobs.state = 'pending'""",
+            (key, json.dumps(payload, separators=(",", ":"), default=str), now + delay, now, now),
+        )
+        if cursor.rowcount:
+            metrics.inc("finalize_jobs_total", outcome="enqueued")
+            log_event(logger, "finalize.enqueued", key=key, delay=round(delay, 1))
+        return bool(cursor.rowcount)
+
+    def cancel(self, key: str) -> bool:
+        """Drops `key` if it hasn't started (a dropped session that was resumed)."""
+        cursor = self._connection().execute("DELETE FROM jobs WHERE key = ? AND state = 'pending'", (key,))
+        if cursor.rowcount:
+            metrics.inc("finalize_jobs_total", outcome="cancelled")
+        return bool(cursor.rowcount)
+
+    def claim(self, limit: int) -> list[Job]:
+        """Leases up to `limit` due jobs, oldest due first."""
+        now = time.time()
+        rows = self._connection().execute(
+            """UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ?
+               WHERE key IN (SELECT key FROM jobs
+                             WHERE (state = 'pending' AND run_after <= ?) OR (state = 'running' AND lease_until < ?)
+                             ORDER BY run_after LIMIT ?)
+               RETURNING key, payload, attempts, run_after""",
+            (now + self.lease, now, now, now, limit),
+        ).fetchall()
+        return [Job(key, json.loads(payload), attempts, run_after) for key, payload, attempts, run_after in rows]
+
+    def complete(self, key: str):
+        self._connection().execute(
+            "UPDATE jobs SET state = 'done', payload = '{}', error = NULL, updated_at = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        metrics.inc("finalize_jobs_total", outcome="done")
+
+    def fail(self, job: Job, error: Exception):
+        """Schedules a retry with jittered exponential backoff, or gives up after `max_attempts`."""
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            state, run_after, outcome = "failed", now, "failed"
+        else:
+            state, outcome = "pending", "retried"
+            run_after = now + self.backoff * 2 ** (job.attempts - 1) * random.uniform(0.5, 1.5)
+        self._connection().execute(
+            "UPDATE jobs SET state = ?, run_after = ?, lease_until = 0, error = ?, updated_at = ? WHERE key = ?",
+            (state, run_after, repr(error), now, job.key),
+        )
+        metrics.inc("finalize_jobs_total", outcome=outcome)
+        log_event(logger, "finalize.job_failed", logging.ERROR if state == "failed" else logging.WARNING,
+                  key=job.key, attempts=job.attempts, final=state == "failed", error=repr(error))
+
+    def purge(self):
+        self._connection().execute(
+            "DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (time.time() - self.keep_done,)
+        )
+
+    def stats(self) -> dict:
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    async def process(self, jobs: list[Job], handler):
+        """
+        Runs `handler(payloads)`, which returns one result per job: None
+        on success or the exception that job failed with, and records them.
+        """
+        now = time.time()
+        for job in jobs:
+            metrics.observe("finalize_job_delay_seconds", max(0.0, now - job.run_after))
+        metrics.observe("finalize_batch_size", len(jobs))
+        try:
+            results = await handler([job.payload for job in jobs])
+        except Exception as e:
+            results = [e] * len(jobs)
+        for job, error in zip(jobs, results):
+            if error is None:
+                await asyncio.to_thread(self.complete, job.key)
+            else:
+                await asyncio.to_thread(self.fail, job, error)
+
+    async def run(self, handler, drain: bool = False):
+        """
+        Claims due jobs in batches of `batch_size` with up to `workers`
+        batches in flight, polling every `poll` seconds when idle. With
+        `drain`, returns once nothing is due and every batch has finished.
+        """
+        slots = asyncio.Semaphore(self.workers)
+        running = set()
+        last_purge = 0.0
+
+        async def process(jobs):
+            try:
+                await self.process(jobs, handler)
+            except Exception as e:
+                log_event(logger, "finalize.batch_failed", logging.ERROR, error=repr(e))
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    jobs = await asyncio.to_thread(self.claim, self.batch_size)
+                except Exception as e:
+                    log_event(logger, "finalize.claim_failed", logging.ERROR, error=repr(e))
+                    jobs = []
+                if jobs:
+                    task = asyncio.create_task(process(jobs))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    continue
+                slots.release()
+                if drain:
+                    if not running:
+                        return
+                    await asyncio.wait(set(running))
+                    continue
+                if time.time() - last_purge > 3600:
+                    last_purge = time.time()
+                    try:
+                        await asyncio.to_thread(self.purge)
+                    except Exception as e:
+                        log_event(logger, "finalize.purge_failed", logging.WARNING, error=repr(e))
+                await asyncio.sleep(self.poll)
+        finally:
+            # Jobs still leased when this stops are claimed again once the lease runs out.
+            for task in running:
+                task.cancel()
+
+
+_queue = None
+
+
+def get_finalize_queue() -> FinalizeQueue:
+    global _queue
+    if _queue is None:
+        _queue = FinalizeQueue()
+    return _queue
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Process queued session finalizations.")
+    parser.add_argument("--drain", action="store_true", help="Process the jobs that are due, then exit.")
+    parser.add_argument("--stats", action="store_true", help="Print job counts by state and exit.")
+    args = parser.parse_args()
+
+    queue = get_finalize_queue()
+    if args.stats:
+        print(json.dumps(queue.stats()))
+        return
+    from tools.agent_tools import finalize_sessions
+    await queue.run(finalize_sessions, drain=args.drain)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,281 @@
+"""
+Pools of vetted, pre-generated fun facts per city and age band, so
+`UserAgent.get_fun_fact` answers from memory instead of an LLM call.
+
+A pool is loaded from the `fun_facts` table when the child's city is
+recorded, topped up in the background as it runs low or goes stale, and
+rotated per child (across job processes, through the shared cache) so
+nobody hears the same fact twice. Refill the common
+cities ahead of time with:
+
+    python -m tools.fun_facts --refill --limit 50
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+
+import config
+from tools import metrics, model_registry, shared_cache
+from tools.content_guard import PROFANITY, TOPIC_TERMS, _alternation
+from tools.log_setup import log_event
+from tools.supabase_tools import SupabaseHelper
+
+logger = logging.getLogger("livekit.fun_facts")
+
+metrics.describe("fun_facts_served_total", "Fun facts handed to the agent, by source.")
+metrics.describe("fun_facts_generated_total", "Fun facts generated and accepted into a pool.")
+metrics.describe("fun_facts_rejected_total", "Generated fun facts that failed vetting.")
+
+AGE_BANDS = ((3, 6), (7, 9), (10, 14))
+
+# Said when a city's pool isn't loaded yet; the real facts arrive in the background.
+FALLBACK_FACTS = (
+    "Every city has a nickname, a favourite food and secret stories. What's the best thing about yours?",
+    "Did you know some cities are so old that people have lived there for thousands of years?",
+    "Did you know a city's streets are like a giant maze that thousands of people solve every day?",
+)
+
+# Nothing a young child shouldn't hear, whatever the parents later allow.
+_UNSAFE_RE = _alternation([
+    term for topic in ("violence", "death", "horror", "drugs", "romance", "politics", "religion")
+    for term in (topic, *TOPIC_TERMS[topic])
+] + list(PROFANITY))
+
+FACTS_SCHEMA = {
+    "name": "fun_facts",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"facts": {"type": "array", "items": {"type": "string"}}},
+        "required": ["facts"],
+        "additionalProperties": False,
+    },
+}
+
+FACTS_PROMPT = """
+Write {count} different fun facts about {city} for a child aged {band}.
+Each fact is one short sentence (under 25 words), true, cheerful and easy to picture.
+No wars, disasters, deaths, crime, religion or politics.
+Avoid these facts you already gave: {avoid}
+"""
+
+
+def city_key(city: str) -> str:
+    return re.sub(r"\s+", " ", (city or "").strip().lower())
+
+
+def age_band(age) -> str:
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return "7-9"
+    for low, high in AGE_BANDS:
+        if low <= age <= high:
+            return f"{low}-{high}"
+    return f"{AGE_BANDS[0][0]}-{AGE_BANDS[0][1]}" if age < AGE_BANDS[0][0] else f"{AGE_BANDS[-1][0]}-{AGE_BANDS[-1][1]}"
+
+
+def vet(fact: str) -> bool:
+    fact = fact.strip()
+    return 10 <= len(fact) <= 220 and "\n" not in fact and not _UNSAFE_RE.search(fact)
+
+
+async def generate_facts(city: str, band: str, count: int, avoid: list[str]) -> list[str]:
+    response = await model_registry.complete(
+        "fun_facts",
+        [{"role": "user", "content": FACTS_PROMPT.format(
+            count=count, city=city, band=band, avoid="; ".join(avoid[-10:]) or "none")}],
+        response_format={"type": "json_schema", "json_schema": FACTS_SCHEMA},
+        temperature=0.9,
+    )
+    facts = [str(f).strip() for f in json.loads(response.choices[0].message.content or "{}").get("facts") or []]
+    accepted = [f for f in facts if vet(f) and f not in avoid]
+    metrics.inc("fun_facts_generated_total", len(accepted))
+    if len(accepted) < len(facts):
+        metrics.inc("fun_facts_rejected_total", len(facts) - len(accepted))
+    return accepted
+
+
+class _Pool:
+    def __init__(self, facts: list[str]):
+        self.facts = facts
+        self.loaded_at = time.monotonic()
+
+
+def _fact_id(fact: str) -> str:
+    return hashlib.sha1(fact.encode("utf-8")).hexdigest()[:12]
+
+
+class FunFactStore:
+    """
+    Process-wide cache of fact pools keyed by (city, age band). Reads come
+    from memory; the database read and any generation run in background
+    tasks, one per key however many sessions ask. Pools hold at most
+    `max_facts` facts (the newest) and only the `max_pools` most recently
+    used are kept. What each child has heard lives in the shared cache, so
+    rotation carries over to the next job process; a bounded LRU keeps the
+    recent children's history in memory.
+    """
+
+    def __init__(self, db: SupabaseHelper, pool_size: int = config.FUN_FACT_POOL_SIZE,
+                 ttl_hours: float = config.FUN_FACT_TTL_H, refill_below: int = config.FUN_FACT_REFILL_BELOW,
+                 read_wait: float = config.FUN_FACT_READ_WAIT_MS / 1000, max_pools: int = 512,
+                 max_devices: int = 2000, history: int = 200):
+        self.db = db
+        self.pool_size = pool_size
+        self.max_facts = pool_size * 4
+        self.ttl = ttl_hours * 3600
+        self.refill_below = refill_below
+        self.read_wait = read_wait
+        self.max_pools = max_pools
+        self.max_devices = max_devices
+        self.history = history
+        self._pools = OrderedDict()
+        self._reads = {}
+        self._refills = {}
+        self._served = OrderedDict()
+
+    def prefetch(self, city: str, age=None) -> asyncio.Future:
+        """Start loading the pool for `city` (call as soon as the city is known)."""
+        key = (city_key(city), age_band(age))
+        task = self._reads.get(key)
+        if task is None:
+            if key in self._pools:
+                done = asyncio.get_running_loop().create_future()
+                done.set_result(None)
+                return done
+            task = self._reads[key] = asyncio.create_task(self._read(key, city))
+            task.add_done_callback(lambda _: self._reads.pop(key, None))
+        return task
+
+    def _put_pool(self, key: tuple, pool: _Pool):
+        self._pools[key] = pool
+        self._pools.move_to_end(key)
+        while len(self._pools) > self.max_pools:
+            self._pools.popitem(last=False)
+
+    async def _read(self, key: tuple, city: str):
+        facts = await self.db.fetch_fun_facts(*key, max_age_hours=self.ttl / 3600, limit=self.pool_size * 2)
+        random.shuffle(facts)
+        self._put_pool(key, _Pool(facts))
+        if len(facts) < self.pool_size:
+            self._refill(key, city)
+
+    def _refill(self, key: tuple, city: str):
+        if key not in self._refills:
+            task = self._refills[key] = asyncio.create_task(self._generate(key, city))
+            task.add_done_callback(lambda _: self._refills.pop(key, None))
+
+    async def _generate(self, key: tuple, city: str):
+        pool = self._pools.get(key)
+        known = list(pool.facts) if pool else []
+        try:
+            facts = await generate_facts(city, key[1], self.pool_size, known)
+            if facts:
+                await self.db.save_fun_facts(*key, facts)
+        except Exception as e:
+            log_event(logger, "fun_facts.refill_failed", logging.WARNING, city=key[0], band=key[1], error=repr(e))
+            return
+        if pool is None or time.monotonic() - pool.loaded_at > self.ttl:
+            self._put_pool(key, _Pool(facts + known[:self.pool_size]))
+        else:
+            # Newest last; the oldest go once the pool is full.
+            pool.facts = (pool.facts + facts)[-self.max_facts:]
+        log_event(logger, "fun_facts.refilled", city=key[0], band=key[1], added=len(facts))
+
+    async def _heard(self, device_id: str) -> list[str]:
+        """Ids of the facts this child has heard, oldest first."""
+        heard = self._served.get(device_id)
+        if heard is None:
+            cache = shared_cache.get_shared_cache()
+            heard = list(await cache.get("fun_facts_heard", device_id) or []) if cache is not None else []
+            self._served[device_id] = heard
+            while len(self._served) > self.max_devices:
+                self._served.popitem(last=False)
+        self._served.move_to_end(device_id)
+        return heard
+
+    def _mark_heard(self, device_id: str, heard: list[str], fact: str):
+        heard.append(_fact_id(fact))
+        del heard[:-self.history]
+        cache = shared_cache.get_shared_cache()
+        if cache is not None:
+            cache.put("fun_facts_heard", device_id, list(heard), ttl=self.ttl)
+
+    async def get(self, city: str, age=None, device_id: str = "") -> str:
+        """A fact this child hasn't heard yet. Never waits on an LLM."""
+        key = (city_key(city), age_band(age))
+        pool = self._pools.get(key)
+        if pool is None:
+            try:
+                # Only the database read; generation carries on in the background.
+                await asyncio.wait_for(asyncio.shield(self.prefetch(city, age)), self.read_wait)
+            except Exception:
+                pass
+            pool = self._pools.get(key)
+        else:
+            self._pools.move_to_end(key)
+
+        heard = await self._heard(device_id)
+        heard_ids = set(heard)
+        unseen = [f for f in pool.facts if _fact_id(f) not in heard_ids] if pool is not None else []
+        if pool is not None and (len(unseen) <= self.refill_below or time.monotonic() - pool.loaded_at > self.ttl):
+            self._refill(key, city)
+        if not unseen:
+            metrics.inc("fun_facts_served_total", source="fallback")
+            return random.choice(FALLBACK_FACTS)
+
+        fact = unseen[0]
+        self._mark_heard(device_id, heard, fact)
+        metrics.inc("fun_facts_served_total", source="pool")
+        return fact
+
+    async def fill(self, city: str, age=None):
+        """Load and top up one pool, waiting for generation (for the refill CLI)."""
+        key = (city_key(city), age_band(age))
+        await self.prefetch(city, age)
+        task = self._refills.get(key)
+        if task is not None:
+            await task
+
+
+_store = None
+
+
+def get_fun_fact_store() -> FunFactStore:
+    global _store
+    if _store is None:
+        _store = FunFactStore(SupabaseHelper())
+    return _store
+
+
+async def _main(args):
+    store = FunFactStore(SupabaseHelper())
+    cities = args.city or await store.db.list_popular_cities(args.limit)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(city, low):
+        async with semaphore:
+            await store.fill(city, low)
+
+    await asyncio.gather(*(one(city, low) for city in cities for low, _ in AGE_BANDS))
+    logger.info(f"Fun fact refill done for {len(cities)} cities")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Pre-generate fun fact pools.")
+    parser.add_argument("--refill", action="store_true", help="Top up the most common cities.")
+    parser.add_argument("--city", action="append", help="Top up this city (repeatable).")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    if not (args.refill or args.city):
+        parser.error("nothing to do: pass --refill or --city")
+    asyncio.run(_main(args))
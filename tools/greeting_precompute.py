@@ -0,0 +1,188 @@
+"""
+Pre-generates each child's next greeting so it can be spoken the moment
+they join, instead of after the profile / summaries bootstrap and a live
+LLM call.
+
+The greeting follows the child's parental rules: they are in the prompt,
+the text is checked with the ContentGuard before it is stored, and it is
+only spoken while the rules still match the fingerprint stored with it.
+
+Run on session finalize (see `schedule_greeting`) and as a sweep for
+devices whose greeting has been used or that never had one:
+
+    python -m tools.greeting_precompute --sweep --limit 200
+    python -m tools.greeting_precompute --device <device_id>
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+
+import config
+from prompts.system_prompts import GREETING_PRECOMPUTE_PROMPT
+from tools import metrics, model_registry
+from tools.content_guard import SENTENCE_END, ContentGuard
+from tools.log_setup import log_event
+from tools.supabase_tools import SupabaseHelper
+from tools.tts_cache import get_tts_cache
+
+logger = logging.getLogger("livekit.greeting_precompute")
+
+metrics.describe("greetings_precomputed_total", "Greetings generated ahead of the next session.")
+metrics.describe("greetings_rejected_total", "Generated greetings dropped by the content guard.")
+
+RECENT_SESSION_CHARS = 600
+# Columns of a parental_rules row that aren't rules.
+RULE_METADATA = {"id", "device_id", "child_id", "created_at", "updated_at", "last_updated"}
+
+# Finalize-time jobs are fire-and-forget; keep them referenced until done.
+_background = set()
+
+
+def _render_session(content) -> str:
+    """A conversation_logs row is either a message list or (once archived) a summary string."""
+    if isinstance(content, list):
+        lines = [f"{m.get('role')}: {m.get('content')}" for m in content if isinstance(m, dict)]
+        text = "\n".join(lines)
+    else:
+        text = str(content or "")
+    return text[-RECENT_SESSION_CHARS:]
+
+
+def _rule_items(rules: dict) -> dict:
+    return {k: v for k, v in (rules or {}).items() if k not in RULE_METADATA and v not in (None, "", [], {})}
+
+
+def rules_fingerprint(rules: dict) -> str:
+    """Identifies the parental rules a greeting was written under; bookkeeping columns don't count."""
+    return hashlib.sha1(json.dumps(_rule_items(rules), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _render_rules(rules: dict) -> str:
+    items = _rule_items(rules)
+    items.pop("tts_pitch_preference", None)
+    return "\n".join(f"- {k}: {v}" for k, v in items.items()) or "None."
+
+
+def vet_greeting(text: str, rules: dict, guard: ContentGuard | None = None) -> str | None:
+    """
+    `text` as it may be spoken under `rules` (profanity removed), or None if
+    any sentence touches a restricted topic. A greeting is said without
+    passing through `llm_node`, so it is checked here instead.
+    """
+    if guard is None:
+        guard = ContentGuard(rules)
+    else:
+        guard.sync(rules)
+    checked = []
+    for sentence in SENTENCE_END.split(text or ""):
+        if not sentence.strip():
+            continue
+        allowed = guard.check(sentence)
+        if allowed is None:
+            return None
+        checked.append(allowed)
+    return " ".join(checked) or None
+
+
+async def generate_greeting(profile: dict, interests: dict, recent_sessions: list, role_identity: str,
+                            rules: dict | None = None) -> str:
+    flat_interests = list(profile.get("interests") or [])
+    for items in (interests or {}).values():
+        flat_interests.extend(item for item in items if item not in flat_interests)
+    prompt = GREETING_PRECOMPUTE_PROMPT.format(
+        user_name=profile.get("name") or "friend",
+        age=profile.get("age") or 8,
+        interests=", ".join(flat_interests) or "unknown",
+        role_identity=role_identity,
+        parental_rules=_render_rules(rules),
+        recent_sessions="\n---\n".join(_render_session(row.get("content")) for row in recent_sessions) or "Nothing yet.",
+    )
+    response = await model_registry.complete("greeting", [{"role": "user", "content": prompt}], temperature=0.8)
+    return response.choices[0].message.content.strip().strip('"')
+
+
+async def precompute_greeting(db: SupabaseHelper, device_id: str, synthesize_audio: bool = config.GREETING_PRECOMPUTE_AUDIO) -> str | None:
+    """Generate and store the next greeting for `device_id` (and warm its audio on this host)."""
+    profile, rules, interests, recent, personality = await asyncio.gather(
+        db.fetch_child_profile(device_id),
+        db.fetch_parental_rules(device_id),
+        db.get_interests(device_id),
+        db.get_last_n_conversations(device_id, 3),
+        db.fetch_toy_personality(device_id),
+    )
+    if not profile:
+        return None
+    rules = rules or {}
+    text = await generate_greeting(
+        profile, interests or {}, recent or [], (personality or {}).get("role_identity", "Best Friend"), rules,
+    )
+    if not text:
+        return None
+    vetted = vet_greeting(text, rules)
+    if vetted is None:
+        # No greeting beats an unsafe one: the next session greets live, through the guard.
+        metrics.inc("greetings_rejected_total")
+        log_event(logger, "greeting.rejected", logging.WARNING, device_id=device_id)
+        return None
+    text = vetted
+    pitch = rules.get("tts_pitch_preference")
+    await db.save_pregenerated_greeting(device_id, text, tts_pitch=pitch, rules_hash=rules_fingerprint(rules))
+    if synthesize_audio:
+        await get_tts_cache().ensure(text, pitch)
+    metrics.inc("greetings_precomputed_total")
+    log_event(logger, "greeting.precomputed", device_id=device_id, chars=len(text))
+    return text
+
+
+def schedule_greeting(db: SupabaseHelper, device_id: str):
+    """Fire-and-forget precompute after a session is finalized."""
+    async def run():
+        try:
+            await precompute_greeting(db, device_id)
+        except Exception as e:
+            log_event(logger, "greeting.precompute_failed", logging.WARNING, device_id=device_id, error=repr(e))
+
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+async def sweep(db: SupabaseHelper, limit: int, concurrency: int = 4) -> int:
+    """Regenerate greetings for devices whose last one has been spoken, or that have none."""
+    device_ids = await db.list_devices_needing_greeting(limit)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(device_id):
+        async with semaphore:
+            try:
+                return await precompute_greeting(db, device_id) is not None
+            except Exception:
+                logger.exception(f"Greeting precompute failed for {device_id}")
+                return False
+
+    done = sum(await asyncio.gather(*(one(d) for d in device_ids)))
+    logger.info(f"Greeting sweep: {done}/{len(device_ids)} devices updated")
+    return done
+
+
+async def _main(args):
+    db = SupabaseHelper()
+    if args.device:
+        for device_id in args.device:
+            print(device_id, await precompute_greeting(db, device_id, synthesize_audio=not args.no_audio))
+    if args.sweep:
+        await sweep(db, args.limit, args.concurrency)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Pre-generate next-session greetings.")
+    parser.add_argument("--sweep", action="store_true", help="Regenerate greetings that have been used or are missing.")
+    parser.add_argument("--device", action="append", help="Regenerate for this device id (repeatable).")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--no-audio", action="store_true", help="Store text only; skip warming the TTS cache.")
+    asyncio.run(_main(parser.parse_args()))
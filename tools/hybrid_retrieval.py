@@ -0,0 +1,154 @@
+"""
+Hybrid retrieval over a child's past sessions for `extract_data`.
+
+Candidates come from two places: the pgvector matches for the query
+(`match_conversations`) and the child's recent sessions. Both are split
+into sentences, and each sentence is ranked three ways:
+- BM25 against the query, which catches exact names ("Biscuit")
+- the vector rank of the session it came from
+- for the best few, its own embedding's cosine to the query
+
+The ranks are fused with reciprocal rank fusion, and only the top
+sentences, within RAG_MAX_CHARS, go into the prompt instead of whole
+sessions.
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+import config
+from tools import metrics
+from tools.embedding_gateway import get_embedding_gateway
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.hybrid_retrieval")
+
+metrics.describe("rag_passages", "Sentences returned to the LLM per memory lookup.")
+metrics.describe("rag_context_chars", "Characters of memory returned to the LLM per lookup.")
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her him his how i if in is it its "
+    "me my of on or our she so that the their them they this to was we were what when where which who why "
+    "will with you your about remember tell".split()
+)
+# The usual constant: it damps the difference between the first few ranks.
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def passages(content) -> list[str]:
+    """Sentences of a conversation_logs row: a message list, or (once archived) a summary string."""
+    if isinstance(content, list):
+        lines = [(m.get("role"), str(m.get("content") or "")) for m in content if isinstance(m, dict)]
+    else:
+        lines = [(None, str(content or ""))]
+    found = []
+    for role, text in lines:
+        for sentence in SENTENCE_RE.split(text.strip()):
+            if sentence.strip():
+                found.append(f"{role}: {sentence.strip()}" if role else sentence.strip())
+    return found
+
+
+class BM25:
+    """Okapi BM25 over a small, in-memory corpus."""
+
+    def __init__(self, docs: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = [Counter(doc) for doc in docs]
+        self.lengths = [len(doc) for doc in docs]
+        self.avg_length = (sum(self.lengths) / len(docs)) if docs else 0.0
+        frequency = Counter(token for doc in self.docs for token in doc)
+        n = len(docs)
+        self.idf = {token: math.log(1 + (n - df + 0.5) / (df + 0.5)) for token, df in frequency.items()}
+
+    def scores(self, query: list[str]) -> list[float]:
+        result = []
+        for doc, length in zip(self.docs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            result.append(sum(
+                self.idf[token] * doc[token] * (self.k1 + 1) / (doc[token] + norm)
+                for token in query if token in doc
+            ))
+        return result
+
+
+def rrf(rankings: list[list[int]], k: int = RRF_K) -> dict[int, float]:
+    """Reciprocal rank fusion of rankings (best first) over the same items."""
+    fused = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def _doc_key(row: dict):
+    if row.get("id") is not None:
+        return row["id"]
+    return hashlib.sha1(json.dumps(row.get("content"), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def hybrid_context(query: str, query_embedding: list[float], vector_rows: list[dict], memory_rows: list[dict],
+                         max_passages: int = config.RAG_MAX_PASSAGES, max_chars: int = config.RAG_MAX_CHARS,
+                         rerank_candidates: int = config.RAG_RERANK_CANDIDATES) -> str:
+    """The most relevant sentences from `vector_rows` (best first) and `memory_rows`, one per line."""
+    vector_rank, docs = {}, {}
+    for row in vector_rows or []:
+        key = _doc_key(row)
+        vector_rank.setdefault(key, len(vector_rank))
+        docs.setdefault(key, row.get("content"))
+    for row in memory_rows or []:
+        docs.setdefault(_doc_key(row), row.get("content"))
+
+    candidates, seen = [], set()
+    for key, content in docs.items():
+        for passage in passages(content):
+            if passage not in seen:
+                seen.add(passage)
+                candidates.append((key, passage))
+    if not candidates:
+        return ""
+
+    query_tokens = tokenize(query)
+    lexical = BM25([tokenize(passage) for _, passage in candidates]).scores(query_tokens)
+    by_lexical = sorted((i for i, score in enumerate(lexical) if score > 0), key=lambda i: -lexical[i])
+    by_vector = sorted((i for i, (key, _) in enumerate(candidates) if key in vector_rank),
+                       key=lambda i: (vector_rank[candidates[i][0]], -lexical[i]))
+    fused = rrf([by_lexical, by_vector])
+
+    if rerank_candidates and fused:
+        # Sessions match as a whole; re-rank the leading sentences by their own similarity to the query.
+        shortlist = sorted(fused, key=lambda i: -fused[i])[:rerank_candidates]
+        try:
+            vectors = await get_embedding_gateway().embed_many([candidates[i][1] for i in shortlist], lane="retrieval")
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            matrix = np.asarray(vectors, dtype=np.float32)
+            similarity = matrix @ query_vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector) + 1e-9)
+            by_similarity = [shortlist[j] for j in np.argsort(-similarity)]
+            fused = rrf([by_lexical, by_vector, by_similarity])
+        except Exception as e:
+            log_event(logger, "rag.rerank_failed", logging.WARNING, error=repr(e))
+
+    chosen, chars = [], 0
+    for i in sorted(fused, key=lambda i: -fused[i]):
+        passage = candidates[i][1]
+        if chars + len(passage) > max_chars and chosen:
+            break
+        chosen.append(passage[:max_chars])
+        chars += len(chosen[-1])
+        if len(chosen) >= max_passages:
+            break
+    metrics.observe("rag_passages", len(chosen))
+    metrics.observe("rag_context_chars", chars)
+    return "\n".join(chosen)
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import re
+import time
+
+import config
+from tools import metrics, model_registry
+from tools.log_setup import log_event
+from tools.supabase_tools import INTEREST_CATEGORIES
+
+logger = logging.getLogger("livekit.interest_matcher")
+
+metrics.describe("interest_matches_total", "Interests tagged by the local lexicon.")
+metrics.describe("interest_llm_batches_total", "Batched LLM calls for ambiguous turns.")
+metrics.describe("interest_llm_turns_total", "Ambiguous turns sent to the LLM.")
+
+# canonical interest -> phrases that mention it
+LEXICON = {
+    "Hobbies": {
+        "drawing": ("draw", "drawing", "drawings", "colouring", "coloring", "sketch", "sketching"),
+        "painting": ("paint", "painting", "paintings"),
+        "lego": ("lego", "legos", "building blocks", "blocks"),
+        "reading": ("read", "reading", "books", "stories", "comics"),
+        "music": ("music", "singing", "sing", "songs", "piano", "guitar", "drums", "violin"),
+        "dancing": ("dance", "dancing", "ballet"),
+        "video games": ("video games", "videogames", "gaming", "minecraft", "roblox", "fortnite"),
+        "puzzles": ("puzzle", "puzzles", "rubik's cube", "jigsaw"),
+        "crafts": ("craft", "crafts", "origami", "clay", "slime"),
+        "gardening": ("gardening", "plants", "planting"),
+        "cooking": ("cooking", "baking"),
+        "toy cars": ("toy cars", "hot wheels", "cars"),
+    },
+    "Sports": {
+        "football": ("football", "soccer"),
+        "cricket": ("cricket",),
+        "basketball": ("basketball",),
+        "badminton": ("badminton",),
+        "tennis": ("tennis",),
+        "swimming": ("swim", "swimming"),
+        "cycling": ("cycling", "cycle", "bike", "biking", "bicycle"),
+        "running": ("running", "race", "races"),
+        "skating": ("skating", "skateboard", "skateboarding"),
+        "chess": ("chess",),
+        "karate": ("karate", "taekwondo", "judo", "martial arts"),
+        "gymnastics": ("gymnastics",),
+    },
+    "Favorite_Food": {
+        "pizza": ("pizza",),
+        "pasta": ("pasta", "noodles", "spaghetti", "maggi"),
+        "ice cream": ("ice cream", "icecream"),
+        "chocolate": ("chocolate", "chocolates"),
+        "burger": ("burger", "burgers"),
+        "fries": ("fries", "french fries", "chips"),
+        "cake": ("cake", "cupcake", "cupcakes"),
+        "mango": ("mango", "mangoes"),
+        "biryani": ("biryani",),
+        "dosa": ("dosa", "idli"),
+        "cookies": ("cookie", "cookies", "biscuits"),
+    },
+    "Topics": {
+        "dinosaurs": ("dinosaur", "dinosaurs", "t-rex", "trex"),
+        "space": ("space", "planets", "planet", "stars", "rocket", "rockets", "astronaut", "astronauts", "moon", "mars"),
+        "animals": ("animals", "animal", "dogs", "puppies", "cats", "kittens", "lions", "tigers", "elephants"),
+        "ocean": ("ocean", "sea creatures", "sharks", "whales", "dolphins"),
+        "robots": ("robot", "robots", "robotics", "coding"),
+        "science": ("science", "experiments", "experiment"),
+        "history": ("history", "kings", "queens", "pyramids", "egypt"),
+        "geography": ("geography", "countries", "maps", "volcanoes", "volcano"),
+        "superheroes": ("superhero", "superheroes", "spiderman", "batman", "superman"),
+        "magic": ("magic", "wizards", "harry potter"),
+        "trains": ("trains", "train"),
+    },
+}
+
+# "I like / love / my favourite / I'm into / I play ..." - the child is telling us a preference.
+PREFERENCE_CUE = re.compile(
+    r"\b(?:i\s+(?:really\s+)?(?:like|love|enjoy|adore|play|collect)|i'?m\s+(?:really\s+)?into|"
+    r"my\s+fav(?:ou?rite)?s?|favou?rite|i\s+want\s+to\s+be)\b",
+    re.IGNORECASE,
+)
+NEGATION_CUE = re.compile(r"\b(?:don'?t|do\s+not|doesn'?t|never|hate|not\s+really|dislike|bored\s+of)\b", re.IGNORECASE)
+
+
+def _compile_lexicon(lexicon: dict) -> tuple[re.Pattern, dict]:
+    phrases = {}
+    for category, interests in lexicon.items():
+        for canonical, aliases in interests.items():
+            for alias in aliases:
+                phrases[alias.lower()] = (category, canonical)
+    # Longest first so "ice cream" wins over "cream", "toy cars" over "cars".
+    alternation = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE), phrases
+
+
+LEXICON_RE, PHRASES = _compile_lexicon(LEXICON)
+
+
+def match_interests(text: str) -> dict[str, list[str]]:
+    """category -> canonical interests mentioned in `text`, in order of appearance."""
+    found = {}
+    for match in LEXICON_RE.finditer(text or ""):
+        category, canonical = PHRASES[match.group(0).lower()]
+        items = found.setdefault(category, [])
+        if canonical not in items:
+            items.append(canonical)
+    return found
+
+
+INTEREST_SCHEMA = {
+    "name": "child_interests",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {category: {"type": "array", "items": {"type": "string"}} for category in INTEREST_CATEGORIES},
+        "required": list(INTEREST_CATEGORIES),
+        "additionalProperties": False,
+    },
+}
+
+CLASSIFIER_PROMPT = """
+You detect personal interests of a child (age 4-12) from things they said.
+Only include things the child clearly likes or does; skip dislikes, questions and passing mentions.
+Use short lowercase names (e.g. "lego", "football", "pizza", "dinosaurs").
+Categories: Hobbies, Sports, Favorite_Food, Topics. Use empty arrays when nothing fits.
+"""
+
+# Interest classification is background work: cap how much of the process's
+# OpenAI concurrency it can take from live turns.
+_llm_lane = asyncio.Semaphore(config.INTEREST_LLM_CONCURRENCY)
+
+
+async def classify_turns(turns: list[str]) -> dict[str, list[str]]:
+    """One structured-output LLM call for a batch of ambiguous child turns."""
+    said = "\n".join(f"- {turn}" for turn in turns)
+    async with _llm_lane:
+        response = await model_registry.complete(
+            "interests",
+            [
+                {"role": "system", "content": CLASSIFIER_PROMPT},
+                {"role": "user", "content": f"The child said:\n{said}"},
+            ],
+            response_format={"type": "json_schema", "json_schema": INTEREST_SCHEMA},
+            temperature=0.0,
+        )
+    metrics.inc("interest_llm_batches_total")
+    metrics.inc("interest_llm_turns_total", len(turns))
+    data = json.loads(response.choices[0].message.content or "{}")
+    return {
+        category: [str(item).strip().lower() for item in data.get(category) or [] if str(item).strip()]
+        for category in INTEREST_CATEGORIES
+    }
+
+
+def apply_to_session(session_data, new: dict[str, list[str]]):
+    """Folds newly found interests into the live SessionData so later prompts see them."""
+    if session_data.interests is None:
+        session_data.interests = []
+    for category, items in new.items():
+        known = session_data.preferences.setdefault(category, [])
+        known.extend(item for item in items if item not in known)
+        session_data.interests.extend(item for item in items if item not in session_data.interests)
+
+
+class InterestTracker:
+    """
+    Per-session interest detection. Each user turn goes through the local
+    lexicon; turns that state a preference the lexicon can't resolve (or
+    negate one) are queued and sent to the LLM in batches, off the reply
+    path. `discovered` holds everything found so far, ready to be merged
+    into `user_interests` on exit.
+    """
+
+    def __init__(self, device_id: str, batch_size: int = config.INTEREST_LLM_BATCH_SIZE,
+                 max_wait: float = config.INTEREST_LLM_MAX_WAIT_S):
+        self.device_id = device_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.discovered = {}
+        self._mentions = {}
+        self._pending = []
+        self._classifying = []
+        self._pending_since = None
+        self._flush_task = None
+        self._wake = asyncio.Event()
+        self._on_discovered = []
+
+    def on_discovered(self, callback):
+        """`callback(new: dict[str, list[str]])` whenever new interests are confirmed."""
+        self._on_discovered.append(callback)
+
+    def observe(self, text: str) -> dict[str, list[str]]:
+        """Tags one user turn; returns the interests it newly confirmed."""
+        if not text or not text.strip():
+            return {}
+        matched = match_interests(text)
+        stated = bool(PREFERENCE_CUE.search(text))
+        negated = bool(NEGATION_CUE.search(text))
+
+        if negated or (stated and not matched):
+            # "I don't like pizza" / "I love origami": the lexicon can't call it.
+            if stated or matched:
+                self._queue(text)
+            return {}
+
+        confirmed = {}
+        for category, items in matched.items():
+            for item in items:
+                key = (category, item)
+                self._mentions[key] = self._mentions.get(key, 0) + 1
+                # A stated preference counts at once; a bare mention once it comes up again.
+                if stated or self._mentions[key] >= 2:
+                    confirmed.setdefault(category, []).append(item)
+        if confirmed:
+            metrics.inc("interest_matches_total", sum(len(v) for v in confirmed.values()))
+        return self._add(confirmed)
+
+    def _add(self, interests: dict[str, list[str]]) -> dict[str, list[str]]:
+        new = {}
+        for category, items in interests.items():
+            if not items:
+                continue
+            known = self.discovered.setdefault(category, [])
+            for item in items:
+                if item not in known:
+                    known.append(item)
+                    new.setdefault(category, []).append(item)
+        if new:
+            log_event(logger, "interests.discovered", device_id=self.device_id, interests=new)
+            for callback in self._on_discovered:
+                callback(new)
+        return new
+
+    def _queue(self, text: str):
+        self._pending.append(text)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_when_ready())
+
+    async def _flush_when_ready(self):
+        # Turns queued while a flush runs (or put back after a failed one) go in the next round.
+        while self._pending:
+            remaining = self.max_wait - (time.monotonic() - self._pending_since)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, remaining))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Classify whatever is queued now."""
+        if not self._pending:
+            return
+        turns, self._pending, self._pending_since = self._pending, [], None
+        self._classifying.extend(turns)
+        try:
+            self._add(await classify_turns(turns))
+        except BaseException as e:
+            # Back in the queue: retried after max_wait, or handed to finalization by unclassified().
+            self._pending[:0] = turns
+            self._pending_since = time.monotonic()
+            if not isinstance(e, Exception):
+                raise
+            log_event(logger, "interests.classify_failed", logging.WARNING, device_id=self.device_id,
+                      turns=len(turns), error=repr(e))
+        finally:
+            for turn in turns:
+                self._classifying.remove(turn)
+
+    def unclassified(self) -> list[str]:
+        """Turns queued for the LLM or being classified now; they're finalized after the session if it ends first."""
+        return self._classifying + self._pending
+
+    async def close(self, timeout: float = config.INTEREST_EXIT_FLUSH_TIMEOUT_S) -> dict[str, list[str]]:
+        """Flush queued turns now (bounded by `timeout`) and return everything discovered."""
+        async def drain():
+            self._wake.set()
+            if self._flush_task is not None:
+                await self._flush_task
+            await self.flush()
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            log_event(logger, "interests.flush_timeout", logging.WARNING, device_id=self.device_id)
+        return self.discovered
@@ -1,16 +1,55 @@
+import asyncio
 import logging
 from langchain_community.vectorstores import SupabaseVectorStore
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_core.embeddings import Embeddings
 from langchain.agents import AgentExecutor, create_openai_tools_agent, Tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage, HumanMessage
 from .supabase_tools import SupabaseHelper
-import config
+from . import model_registry
+from .embedding_gateway import EmbeddingGateway, get_embedding_gateway
+
+
+class GatewayEmbeddings(Embeddings):
+    """LangChain embeddings that go through the worker's shared embedding gateway."""
+
+    def __init__(self, gateway: EmbeddingGateway | None = None, lane: str = "retrieval"):
+        self.gateway = gateway or get_embedding_gateway()
+        self.lane = lane
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.gateway.embed_many(texts, lane=self.lane)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.gateway.embed(text, lane=self.lane)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._run_sync(self.aembed_documents(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._run_sync(self.aembed_query(text))
+
+    def _run_sync(self, coro):
+        # Sync tools run in an executor thread; batch them on the worker's loop.
+        loop = self.gateway.loop
+        if loop is None or not loop.is_running():
+            # A private loop here would strand the gateway's futures and timers on it.
+            coro.close()
+            raise RuntimeError("GatewayEmbeddings: the embedding gateway's event loop isn't running")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("GatewayEmbeddings: use the async methods on the event loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
 
 class LangChainAgentHelper:
     def __init__(self, supabase_client, system_prompt: str):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0.7, api_key=config.OPENAI_API_KEY)
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=config.OPENAI_API_KEY)
+        self.llm = model_registry.langchain_llm("rag_agent", temperature=0.7)
+        self.embeddings = GatewayEmbeddings()
         self.vector_store = SupabaseVectorStore(
             client=supabase_client,
             table_name="conversations",
@@ -0,0 +1,227 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from tools import metrics
+
+STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+metrics.describe("log_records_sampled_out_total", "Log records dropped by per-logger sampling.")
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """`"livekit.agents=0.1,livekit.router=0.5"` -> {"livekit.agents": 0.1, ...}"""
+    rates = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, rate = part.split("=", 1)
+        rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of DEBUG/INFO records per logger (longest matching
+    prefix wins). WARNING and above are never sampled out.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        metrics.inc("log_records_sampled_out_total", logger=record.name)
+        return False
+
+
+class PayloadCapFilter(logging.Filter):
+    """
+    Shrinks oversized arguments before anything formats them: long strings
+    are cut and big lists/dicts (chat histories, embedding vectors) are
+    replaced by a short preview, so the cost stays bounded.
+    """
+
+    def __init__(self, max_chars: int, max_items: int):
+        super().__init__()
+        self.max_chars = max_chars
+        self.max_items = max_items
+
+    def _cap(self, value):
+        if isinstance(value, str) and len(value) > self.max_chars:
+            return f"{value[:self.max_chars]}... [+{len(value) - self.max_chars} chars]"
+        if isinstance(value, (list, tuple)) and len(value) > self.max_items:
+            return f"{list(value[:self.max_items])!r}... [+{len(value) - self.max_items} items]"
+        if isinstance(value, dict) and len(value) > self.max_items:
+            head = dict(list(value.items())[:self.max_items])
+            return f"{head!r}... [+{len(value) - self.max_items} keys]"
+        return value
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple) and record.args:
+            record.args = tuple(self._cap(a) for a in record.args)
+        elif isinstance(record.msg, str) and len(record.msg) > self.max_chars and not record.args:
+            record.msg = self._cap(record.msg)
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            record.fields = {k: self._cap(v) for k, v in fields.items()}
+        return True
+
+
+_SCALARS = (str, int, float, bool, bytes, type(None))
+
+
+def _as_tuple(args) -> tuple:
+    return tuple(args.values()) if isinstance(args, dict) else args if isinstance(args, tuple) else (args,)
+
+
+def _snapshot(value, max_items: int, depth: int = 3):
+    """
+    Copies the lists, tuples, sets and dicts in `value` (at most `max_items`
+    entries each, `depth` levels down) and shares everything else: what the
+    loop appends or deletes later doesn't reach the listener, and nothing is
+    repr'd on the caller's thread.
+    """
+    if depth <= 0 or isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, dict):
+        return {k: _snapshot(v, max_items, depth - 1) for k, v in itertools.islice(value.items(), max_items)}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_snapshot(v, max_items, depth - 1) for v in itertools.islice(value, max_items)]
+        return tuple(items) if isinstance(value, tuple) else items
+    return value
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves `msg % args` to the listener thread instead of
+    formatting on the event loop. Containers among the arguments and
+    `fields` (a chat history, a message list) may change on the loop before
+    the listener gets to them, so they are copied, capped at `max_items`
+    entries, rather than formatted here.
+    """
+
+    def __init__(self, queue, max_items: int = 50):
+        super().__init__(queue)
+        self.max_items = max_items
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if isinstance(record.args, dict):
+            record.args = {k: _snapshot(v, self.max_items) for k, v in record.args.items()}
+        elif record.args:
+            record.args = tuple(_snapshot(a, self.max_items) for a in _as_tuple(record.args))
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict) and not all(isinstance(v, _SCALARS) for v in fields.values()):
+            record.fields = {k: _snapshot(v, self.max_items) for k, v in fields.items()}
+        if record.exc_info:
+            # Tracebacks hold frame references; render them while they are valid.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """Text (`msg key=value ...`) or JSON lines; the final line is capped at `max_chars`."""
+
+    def __init__(self, as_json: bool, max_chars: int):
+        super().__init__("%(asctime)s %(levelname)-8s %(name)s %(message)s")
+        self.as_json = as_json
+        self.max_chars = max_chars
+
+    def _extra(self, record: logging.LogRecord) -> dict:
+        extra = {k: v for k, v in vars(record).items() if k not in STANDARD_ATTRS and k != "fields"}
+        extra.update(getattr(record, "fields", None) or {})
+        return extra
+
+    def format(self, record: logging.LogRecord) -> str:
+        if self.as_json:
+            payload = {
+                "ts": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": record.getMessage(),
+                **self._extra(record),
+            }
+            if record.exc_text:
+                payload["exc"] = record.exc_text
+            line = json.dumps(payload, default=str)
+        else:
+            line = super().format(record)
+            extra = self._extra(record)
+            extra.pop("event", None)
+            if extra:
+                line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        if len(line) > self.max_chars:
+            line = f"{line[:self.max_chars]}... [+{len(line) - self.max_chars} chars]"
+        return line
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """Structured event: the name is the message, `fields` become key=value / JSON keys."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"event": event, "fields": fields}, stacklevel=2)
+
+
+def setup_logging(level: str = "INFO", livekit_level: str = "INFO", as_json: bool = False,
+                  sample_rates: str = "", max_chars: int = 4000, max_items: int = 50):
+    """
+    Route every record through a queue to a listener thread that formats and
+    writes it, so the event loop only pays for an enqueue. Returns the
+    listener (stopped automatically at exit).
+    """
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(StructuredFormatter(as_json=as_json, max_chars=max_chars))
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = LazyQueueHandler(log_queue, max_items=max_items)
+    handler.addFilter(SamplingFilter(parse_sample_rates(sample_rates)))
+    handler.addFilter(PayloadCapFilter(max_chars=max_chars, max_items=max_items))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("livekit").setLevel(livekit_level)
+    logging.getLogger("livekit.agents").setLevel(livekit_level)
+    return listener
+
+
+def install_job_filters(sample_rates: str = "", max_chars: int = 4000, max_items: int = 50):
+    """
+    Job processes log through LiveKit's IPC handler, which formats on the
+    calling thread. Sample and cap there too, before that formatting happens.
+    """
+    sampling = SamplingFilter(parse_sample_rates(sample_rates))
+    capping = PayloadCapFilter(max_chars=max_chars, max_items=max_items)
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, SamplingFilter) for f in handler.filters):
+            handler.addFilter(sampling)
+            handler.addFilter(capping)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from tools import metrics
+
+logger = logging.getLogger("livekit.loop_monitor")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames from these paths are skipped when naming a blocking site; the
+# benchmark fakes stand in for library code.
+IGNORED_PATHS = (os.path.join(REPO_ROOT, "benchmarks"), os.path.abspath(__file__))
+
+metrics.describe("event_loop_lag_seconds", "How late the loop monitor heartbeat fired.")
+metrics.describe("event_loop_blocked_total", "Times a callback held the event loop past the threshold.")
+metrics.describe("event_loop_blocked_seconds", "Duration of each detected event-loop stall.")
+
+
+def _is_app_frame(filename: str) -> bool:
+    return (
+        filename.startswith(REPO_ROOT)
+        and "site-packages" not in filename
+        and not filename.startswith(IGNORED_PATHS)
+    )
+
+
+def _blocking_site(frame) -> str:
+    """Innermost app frame of a stack: the code that called into whatever blocked."""
+    stack = traceback.extract_stack(frame)
+    for entry in reversed(stack):
+        if _is_app_frame(entry.filename):
+            return f"{os.path.relpath(entry.filename, REPO_ROOT)}:{entry.lineno} {entry.name}"
+    entry = stack[-1]
+    return f"{entry.filename}:{entry.lineno} {entry.name}"
+
+
+class LoopMonitor:
+    """
+    Event-loop watchdog. A heartbeat task measures loop lag continuously; a
+    watchdog thread notices when the heartbeat is overdue and captures the
+    stack (and asyncio task) that is holding the loop at that moment. Stalls
+    are exported as metrics and logged at most once per `log_interval` per
+    blocking site.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, log_interval: float = 30.0):
+        self.interval = interval
+        self.threshold = threshold
+        self.log_interval = log_interval
+        self.sites = Counter()
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = time.monotonic()
+        self._stall = None
+        self._last_logged = {}
+        self._suppressed = Counter()
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Loop monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            metrics.observe("event_loop_lag_seconds", lag)
+            stall, self._stall = self._stall, None
+            if stall is not None:
+                self._finish_stall(stall, lag)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval / 2):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._stall = {
+                "site": _blocking_site(frame),
+                "stack": "".join(traceback.format_stack(frame)),
+                "task": self._describe_task(),
+            }
+
+    def _describe_task(self) -> str | None:
+        try:
+            task = asyncio.tasks._current_tasks.get(self._loop)
+        except AttributeError:
+            return None
+        if task is None:
+            return None
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def _finish_stall(self, stall: dict, duration: float):
+        site = stall["site"]
+        self.sites[site] += 1
+        metrics.inc("event_loop_blocked_total", site=site)
+        metrics.observe("event_loop_blocked_seconds", duration, site=site)
+
+        now = time.monotonic()
+        if now - self._last_logged.get(site, -self.log_interval) < self.log_interval:
+            self._suppressed[site] += 1
+            return
+        self._last_logged[site] = now
+        suppressed = self._suppressed.pop(site, 0)
+        logger.warning(
+            "Event loop blocked for %.0fms at %s (task: %s, %d similar stalls suppressed)\n%s",
+            duration * 1000, site, stall["task"], suppressed, stall["stack"],
+        )
+
+    def top_sites(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.sites.most_common(n)
+
+
+_monitor = None
+
+
+def start_loop_monitor(interval: float = 0.05, threshold: float = 0.1, log_interval: float = 30.0) -> LoopMonitor:
+    """Start (once per process) the watchdog on the running loop."""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor(interval=interval, threshold=threshold, log_interval=log_interval)
+        _monitor.start()
+    return _monitor
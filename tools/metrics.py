@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger("livekit.metrics")
+
+# Every LiveKit job runs in its own process, so each process publishes a
+# snapshot file and the health server in the main process merges them.
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_histograms = {}
+_help = {}
+
+HISTOGRAM_WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=HISTOGRAM_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent)
+        quantiles = {}
+        for q in QUANTILES:
+            quantiles[str(q)] = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+        return {"count": self.count, "sum": self.sum, "max": self.max, "quantiles": quantiles}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, text: str):
+    _help[name] = text
+
+
+def inc(name: str, value: float = 1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(value)
+
+
+def snapshot() -> dict:
+    """Plain-dict view of every metric in this process."""
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "help": dict(_help),
+            "counters": [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            "gauges": [[name, dict(labels), value] for (name, labels), value in _gauges.items()],
+            "histograms": [[name, dict(labels), h.snapshot()] for (name, labels), h in _histograms.items()],
+        }
+
+
+def publish(directory: str):
+    """Atomically write this process's snapshot to `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+async def run_publisher(directory: str, interval: float = 10.0):
+    while True:
+        try:
+            await asyncio.to_thread(publish, directory)
+        except Exception:
+            logger.exception("Failed to publish metrics snapshot")
+        await asyncio.sleep(interval)
+
+
+def collect(directory: str, max_age: float = 60.0) -> list[dict]:
+    """Snapshots of this process plus every live process that published to `directory`."""
+    snapshots = {os.getpid(): snapshot()}
+    if not directory or not os.path.isdir(directory):
+        return list(snapshots.values())
+    now = time.time()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - data.get("time", 0) > max_age:
+            # The job process is gone; drop its file.
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        snapshots.setdefault(data["pid"], data)
+    return list(snapshots.values())
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in sorted(labels.items()))
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    return "NaN" if value is None or (isinstance(value, float) and math.isnan(value)) else repr(float(value))
+
+
+def render_prometheus(directory: str = None) -> str:
+    """Prometheus text exposition of every process's metrics, labelled by pid."""
+    families = {}
+    help_text = {}
+
+    def family(name: str, kind: str) -> list:
+        if name not in families:
+            families[name] = (kind, [])
+        return families[name][1]
+
+    for snap in collect(directory):
+        pid = snap["pid"]
+        help_text.update(snap.get("help", {}))
+        for name, labels, value in snap["counters"]:
+            family(name, "counter").append(f"{name}{_format_labels({**labels, 'pid': pid})} {_format_value(value)}")
+        for name, labels, value in snap["gauges"]:
+            family(name, "gauge").append(f"{name}{_format_labels({**labels, 'pid': pid})} {_format_value(value)}")
+        for name, labels, hist in snap["histograms"]:
+            lines = family(name, "summary")
+            for q, value in hist["quantiles"].items():
+                lines.append(f"{name}{_format_labels({**labels, 'pid': pid, 'quantile': q})} {_format_value(value)}")
+            lines.append(f"{name}_sum{_format_labels({**labels, 'pid': pid})} {_format_value(hist['sum'])}")
+            lines.append(f"{name}_count{_format_labels({**labels, 'pid': pid})} {hist['count']}")
+            family(f"{name}_max", "gauge").append(
+                f"{name}_max{_format_labels({**labels, 'pid': pid})} {_format_value(hist['max'])}"
+            )
+
+    output = []
+    for name, (kind, lines) in families.items():
+        if name in help_text:
+            output.append(f"# HELP {name} {help_text[name]}")
+        output.append(f"# TYPE {name} {kind}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
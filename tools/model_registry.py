@@ -0,0 +1,151 @@
+import logging
+import time
+from dataclasses import dataclass, replace
+
+import httpx
+from livekit.plugins.openai import LLM as OpenAI_LLM
+from openai import AsyncOpenAI
+
+import config
+from tools import metrics, openai_scheduler
+
+logger = logging.getLogger("livekit.model_registry")
+
+client = AsyncOpenAI(api_key=config.OPENAI_API_KEY, http_client=openai_scheduler.http_client())
+
+metrics.describe("model_calls_total", "LLM calls, by task, model and outcome.")
+metrics.describe("model_call_seconds", "LLM call duration (to the full response), by task and model.")
+metrics.describe("model_tokens_total", "LLM tokens, by task, model and kind.")
+metrics.describe("model_cost_usd_total", "Estimated LLM spend in USD, by task and model.")
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    model: str
+    max_tokens: int | None
+    timeout: float
+
+
+# Latency-critical, narrow tasks get the small model and a tight cap; only
+# the conversation itself and the LangChain agent use the larger ones.
+DEFAULTS = {
+    "chat": ModelSpec("gpt-4.1", 400, 15.0),
+    "routing": ModelSpec("gpt-4o-mini", 64, 3.0),
+    "query_synthesis": ModelSpec("gpt-4o-mini", 48, 4.0),
+    "summarization": ModelSpec("gpt-4o-mini", 120, 15.0),
+    "interests": ModelSpec("gpt-4o-mini", 200, 15.0),
+    "greeting": ModelSpec("gpt-4o-mini", 80, 15.0),
+    "fun_facts": ModelSpec("gpt-4o-mini", 120, 10.0),
+    "rag_agent": ModelSpec("gpt-4o", 400, 20.0),
+}
+
+# Scheduler lane per task: the child is waiting on live turns, may be
+# waiting on retrieval, and nobody is waiting on background work.
+TASK_LANES = {
+    "chat": "live",
+    "routing": "live",
+    "query_synthesis": "retrieval",
+    "rag_agent": "retrieval",
+    "summarization": "background",
+    "interests": "background",
+    "greeting": "background",
+    "fun_facts": "background",
+}
+
+# USD per 1M tokens (input, output).
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+
+def parse_overrides(spec: str) -> dict[str, dict]:
+    """`"routing=gpt-4.1-nano:32:2,chat=gpt-4o"` -> {"routing": {"model": ..., "max_tokens": 32, "timeout": 2.0}, ...}"""
+    overrides = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        task, value = part.split("=", 1)
+        model, *rest = value.strip().split(":")
+        fields = {"model": model} if model else {}
+        if len(rest) > 0 and rest[0]:
+            fields["max_tokens"] = int(rest[0]) or None
+        if len(rest) > 1 and rest[1]:
+            fields["timeout"] = float(rest[1])
+        overrides[task.strip()] = fields
+    return overrides
+
+
+MODELS = {task: replace(spec, **parse_overrides(config.MODEL_TIERS).get(task, {})) for task, spec in DEFAULTS.items()}
+
+
+def get(task: str) -> ModelSpec:
+    return MODELS[task]
+
+
+def record_usage(task: str, model: str, duration: float, prompt_tokens: int, completion_tokens: int):
+    metrics.inc("model_calls_total", task=task, model=model, outcome="ok")
+    metrics.observe("model_call_seconds", duration, task=task, model=model)
+    metrics.inc("model_tokens_total", prompt_tokens, task=task, model=model, kind="prompt")
+    metrics.inc("model_tokens_total", completion_tokens, task=task, model=model, kind="completion")
+    price = PRICES.get(model)
+    if price is not None:
+        cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+        metrics.inc("model_cost_usd_total", cost, task=task, model=model)
+
+
+async def complete(task: str, messages: list[dict], **kwargs):
+    """`chat.completions.create` with the task's model, token cap and timeout; returns the response."""
+    spec = get(task)
+    if spec.max_tokens is not None:
+        kwargs.setdefault("max_tokens", spec.max_tokens)
+    started = time.perf_counter()
+    try:
+        with openai_scheduler.lane(TASK_LANES.get(task, "background")):
+            response = await client.chat.completions.create(
+                model=spec.model, messages=messages, timeout=spec.timeout, **kwargs,
+            )
+    except Exception:
+        metrics.inc("model_calls_total", task=task, model=spec.model, outcome="error")
+        raise
+    usage = getattr(response, "usage", None)
+    record_usage(
+        task, spec.model, time.perf_counter() - started,
+        getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0,
+    )
+    return response
+
+
+def livekit_llm(task: str):
+    """A LiveKit OpenAI LLM for `task`, reporting into the same metrics."""
+    spec = get(task)
+    timeout = httpx.Timeout(spec.timeout, connect=min(spec.timeout, 5.0))
+    model = OpenAI_LLM(
+        model=spec.model,
+        client=AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY, max_retries=0,
+            http_client=openai_scheduler.http_client(TASK_LANES.get(task, "live"), timeout=timeout),
+        ),
+        **({"max_completion_tokens": spec.max_tokens} if spec.max_tokens is not None else {}),
+    )
+
+    def on_metrics(llm_metrics):
+        if llm_metrics.cancelled:
+            return
+        record_usage(task, spec.model, llm_metrics.duration, llm_metrics.prompt_tokens, llm_metrics.completion_tokens)
+
+    model.on("metrics_collected", on_metrics)
+    return model
+
+
+def langchain_llm(task: str, **kwargs):
+    from langchain_openai import ChatOpenAI
+
+    spec = get(task)
+    return ChatOpenAI(
+        model=spec.model, max_tokens=spec.max_tokens, timeout=spec.timeout, api_key=config.OPENAI_API_KEY,
+        http_async_client=openai_scheduler.http_client(TASK_LANES.get(task, "background")), **kwargs,
+    )
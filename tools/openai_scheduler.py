@@ -0,0 +1,273 @@
+import asyncio
+import contextlib
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+
+import httpx
+
+import config
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.openai_scheduler")
+
+# Highest priority first.
+LANES = ("live", "retrieval", "background")
+
+metrics.describe("openai_queue_seconds", "Time an OpenAI request waited for rate-limit budget, by lane.")
+metrics.describe("openai_requests_total", "OpenAI requests through the scheduler, by lane and admission outcome.")
+metrics.describe("openai_throttled_total", "429 responses from OpenAI, by lane.")
+metrics.describe("openai_ratelimit_remaining", "Requests / tokens left in each model's OpenAI rate-limit window.")
+
+_current_lane = ContextVar("openai_lane", default=None)
+
+
+@contextlib.contextmanager
+def lane(name: str):
+    """Run OpenAI calls made inside the block in lane `name`."""
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def parse_lane_values(spec: str) -> dict[str, float]:
+    """`"live=2,background=120"` -> {"live": 2.0, "background": 120.0}"""
+    values = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            values[name.strip()] = float(value)
+    return values
+
+
+def parse_duration(value: str | None) -> float | None:
+    """OpenAI's reset headers: `"6m0s"`, `"1.5s"`, `"20ms"` -> seconds."""
+    if not value:
+        return None
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+class QueueDeadlineExceeded(httpx.TimeoutException):
+    """A request waited longer than its lane's deadline for rate-limit budget."""
+
+
+class _Budget:
+    """One OpenAI rate-limit window (requests or tokens), as last reported and spent since."""
+
+    def __init__(self, kind: str, model: str):
+        self.kind = kind
+        self.model = model
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+
+    def available(self, now: float) -> float | None:
+        if self.limit is None:
+            return None
+        return self.limit if now >= self.reset_at else self.remaining
+
+    def spend(self, amount: float, now: float):
+        if self.limit is not None:
+            self.remaining = self.available(now) - amount
+
+    def update(self, headers, now: float):
+        try:
+            limit = int(headers.get(f"x-ratelimit-limit-{self.kind}"))
+            remaining = int(headers.get(f"x-ratelimit-remaining-{self.kind}"))
+        except (TypeError, ValueError):
+            return
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = now + (parse_duration(headers.get(f"x-ratelimit-reset-{self.kind}")) or 0.0)
+        metrics.set_gauge("openai_ratelimit_remaining", remaining, kind=self.kind, model=self.model)
+
+
+class _Limits:
+    """The request and token windows of one model, and any pause after a 429 for it."""
+
+    def __init__(self, model: str):
+        self.requests = _Budget("requests", model)
+        self.tokens = _Budget("tokens", model)
+        self.paused_until = 0.0
+
+
+class OpenAIScheduler:
+    """
+    Process-wide admission control for OpenAI calls. Budgets are kept per
+    model, as OpenAI limits them, learned from the rate-limit headers of
+    every response (they describe the whole account, so other workers'
+    traffic is accounted for too) and spent locally between responses. A
+    request waits while a higher lane is waiting, while its model's window
+    is exhausted or after a 429 for that model; lower lanes also
+    leave `reserves` (a fraction of each limit) for the lanes above them,
+    and background work is capped at `background_concurrency` in flight.
+    A request that waits past its lane's deadline fails, except in the live
+    lane, which goes ahead anyway rather than leave a child without a reply.
+    """
+
+    def __init__(self, reserves: dict[str, float] | None = None, deadlines: dict[str, float] | None = None,
+                 background_concurrency: int = config.OPENAI_BACKGROUND_CONCURRENCY):
+        self.reserves = reserves if reserves is not None else parse_lane_values(config.OPENAI_LANE_RESERVES)
+        self.deadlines = deadlines if deadlines is not None else parse_lane_values(config.OPENAI_LANE_DEADLINES)
+        self.background_concurrency = background_concurrency
+        self._limits = {}
+        self._waiting = dict.fromkeys(LANES, 0)
+        self._in_flight = dict.fromkeys(LANES, 0)
+        self._changed = asyncio.Event()
+
+    def limits(self, model: str) -> _Limits:
+        limits = self._limits.get(model)
+        if limits is None:
+            limits = self._limits[model] = _Limits(model)
+        return limits
+
+    def _admissible(self, lane: str, limits: _Limits, tokens: int, now: float) -> bool:
+        if now < limits.paused_until:
+            return False
+        if any(self._waiting[higher] for higher in LANES[:LANES.index(lane)]):
+            return False
+        if lane == "background" and self._in_flight[lane] >= self.background_concurrency:
+            return False
+        reserve = self.reserves.get(lane, 0.0)
+        for budget, need in ((limits.requests, 1), (limits.tokens, tokens)):
+            available = budget.available(now)
+            if available is not None and available - need < reserve * budget.limit:
+                return False
+        return True
+
+    @staticmethod
+    def _next_change(limits: _Limits, now: float) -> float:
+        """How long until a window resets or a pause ends; waiters re-check then."""
+        upcoming = [t - now for t in (limits.paused_until, limits.requests.reset_at, limits.tokens.reset_at) if t > now]
+        return min(upcoming + [1.0])
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def acquire(self, lane: str, tokens: int, model: str = ""):
+        limits = self.limits(model)
+        started = now = time.monotonic()
+        deadline = started + self.deadlines.get(lane, 60.0)
+        outcome = "admitted"
+        if not self._admissible(lane, limits, tokens, now):
+            self._waiting[lane] += 1
+            try:
+                while not self._admissible(lane, limits, tokens, now):
+                    if now >= deadline:
+                        if lane != "live":
+                            metrics.inc("openai_requests_total", lane=lane, outcome="expired")
+                            raise QueueDeadlineExceeded(f"waited {now - started:.1f}s in the {lane} lane")
+                        outcome = "late"
+                        break
+                    changed = self._changed
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(changed.wait(), min(deadline - now, self._next_change(limits, now)))
+                    now = time.monotonic()
+            finally:
+                self._waiting[lane] -= 1
+                # Lower lanes may have been held back by this one.
+                self._notify()
+        limits.requests.spend(1, now)
+        limits.tokens.spend(tokens, now)
+        self._in_flight[lane] += 1
+        waited = now - started
+        metrics.observe("openai_queue_seconds", waited, lane=lane)
+        metrics.inc("openai_requests_total", lane=lane, outcome=outcome)
+        if waited > 0.5:
+            log_event(logger, "openai.queued", logging.DEBUG, lane=lane, waited_s=round(waited, 2), outcome=outcome)
+
+    def release(self, lane: str, response: httpx.Response | None, model: str = ""):
+        self._in_flight[lane] -= 1
+        if response is not None:
+            limits = self.limits(model)
+            now = time.monotonic()
+            limits.requests.update(response.headers, now)
+            limits.tokens.update(response.headers, now)
+            if response.status_code == 429:
+                retry_after = parse_duration(response.headers.get("retry-after")) or 1.0
+                if "retry-after-ms" in response.headers:
+                    retry_after = float(response.headers["retry-after-ms"]) / 1000
+                limits.paused_until = max(limits.paused_until, now + retry_after)
+                metrics.inc("openai_throttled_total", lane=lane)
+                log_event(logger, "openai.throttled", logging.WARNING, lane=lane, model=model,
+                          retry_after_s=retry_after)
+        self._notify()
+
+
+def _payload(request: httpx.Request) -> dict:
+    try:
+        payload = json.loads(request.content) if request.content else {}
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def estimate_tokens(request: httpx.Request, payload: dict | None = None) -> int:
+    """What OpenAI will count against the token budget: the prompt (~4 bytes a token) plus the output cap."""
+    if payload is None:
+        payload = _payload(request)
+    tokens = len(request.content or b"") // 4
+    return tokens + int(payload.get("max_completion_tokens") or payload.get("max_tokens") or 0)
+
+
+def request_model(request: httpx.Request, payload: dict | None = None) -> str:
+    """The model a request is for; its rate limits are separate from other models'."""
+    if payload is None:
+        payload = _payload(request)
+    return str(payload.get("model") or "")
+
+
+class ScheduledTransport(httpx.AsyncHTTPTransport):
+    """Holds each request until the scheduler admits it in the caller's lane (or `default_lane`)."""
+
+    def __init__(self, scheduler: OpenAIScheduler, default_lane: str = "background", **kwargs):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+        self.default_lane = default_lane
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        current = _current_lane.get() or self.default_lane
+        payload = _payload(request)
+        model = request_model(request, payload)
+        await self.scheduler.acquire(current, estimate_tokens(request, payload), model)
+        response = None
+        try:
+            response = await super().handle_async_request(request)
+            return response
+        finally:
+            self.scheduler.release(current, response, model)
+
+
+def http_client(default_lane: str = "background",
+                timeout: httpx.Timeout | float = httpx.Timeout(60.0, connect=5.0)) -> httpx.AsyncClient:
+    """An httpx client for an OpenAI SDK client whose requests go through the shared scheduler."""
+    if not config.OPENAI_SCHEDULER:
+        return httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+    limits = httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=120)
+    return httpx.AsyncClient(
+        transport=ScheduledTransport(get_scheduler(), default_lane, limits=limits),
+        timeout=timeout, follow_redirects=True,
+    )
+
+
+_scheduler = None
+
+
+def get_scheduler() -> OpenAIScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = OpenAIScheduler()
+    return _scheduler
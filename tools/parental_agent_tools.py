@@ -1,12 +1,183 @@
-from typing import Dict
+from typing import Any, Callable, Dict
 from livekit.agents import function_tool, RunContext
 from tools.supabase_tools import SupabaseHelper
+import config
 import logging
 from datetime import datetime
 import asyncio
 
 logger = logging.getLogger("livekit.parental_tools")
 
+DEVICE_ID_SCHEMA = {
+    "type": "string",
+    "description": "Text identifier of the child profile to update"
+}
+
+# Single source of truth for parental_rules columns; the tool schemas and the
+# validators below are both built from it.
+RULE_FIELDS = {
+    "language_filter": {
+        "type": "boolean",
+        "description": "Enable/disable language filter"
+    },
+    "bedtime_reminder": {
+        "type": "boolean",
+        "description": "Enable/disable bedtime reminder"
+    },
+    "bedtime": {
+        "type": "string",
+        "description": "Set bedtime in HH:MM AM/PM format (e.g., '8:00 PM')"
+    },
+    "restricted_topics": {
+        "type": "array",
+        "items": {
+            "type": "string",
+            "description": "A restricted conversation topic"
+        },
+        "description": "List of restricted conversation topics"
+    },
+    "tts_pitch_preference": {
+        "type": "string",
+        "description": "Text-to-speech pitch preference (e.g., 'low', 'medium', 'high')"
+    },
+    "learning_focus": {
+        "type": "array",
+        "items": {
+            "type": "string",
+            "description": "An educational topic to focus on"
+        },
+        "description": "List of educational topics to emphasize"
+    },
+    "alert_on_restricted": {
+        "type": "boolean",
+        "description": "Enable/disable alerts for restricted topics"
+    }
+}
+
+JSON_TYPES = {"boolean": bool, "string": str, "array": list, "object": dict}
+
+
+def _parse_bedtime(value: str) -> str:
+    try:
+        # Convert to HH:MM:SS for TIME column
+        return datetime.strptime(value.strip(), "%I:%M %p").strftime("%H:%M:%S")
+    except ValueError:
+        raise ValueError(f"Invalid bedtime format: {value}. Use 'HH:MM AM/PM' (e.g., '9:00 PM').")
+
+
+# Column-specific normalisation on top of the schema type check.
+FIELD_CONVERTERS = {
+    "bedtime": _parse_bedtime,
+}
+
+
+def compile_validator(field: str, schema: dict) -> Callable[[Any], Any]:
+    """Builds a `value -> normalised value` check for one field, raising ValueError."""
+    expected = JSON_TYPES[schema["type"]]
+    item_type = JSON_TYPES[schema["items"]["type"]] if schema["type"] == "array" else None
+    convert = FIELD_CONVERTERS.get(field)
+
+    def validate(value):
+        # bool is an int subclass, so check it explicitly for non-boolean fields.
+        if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+            raise ValueError(f"Invalid type for {field}: expected {schema['type']}")
+        if item_type is not None:
+            for item in value:
+                if not isinstance(item, item_type):
+                    raise ValueError(f"All items in {field} must be {schema['items']['type']}s")
+        if convert is not None and value:
+            value = convert(value)
+        return value
+
+    return validate
+
+
+VALIDATORS = {field: compile_validator(field, schema) for field, schema in RULE_FIELDS.items()}
+
+
+def validate_rules(rules: Dict[str, object]) -> Dict[str, object]:
+    if not isinstance(rules, dict):
+        raise ValueError("rules must be an object")
+    update_data = {}
+    for field, value in rules.items():
+        validator = VALIDATORS.get(field)
+        if validator is None:
+            raise ValueError(f"Invalid field: {field}")
+        update_data[field] = validator(value)
+    return update_data
+
+
+def _check_device_id(device_id: object):
+    if not isinstance(device_id, str) or not device_id:
+        raise ValueError("device_id must be a non-empty string")
+
+
+class ParentalRuleBuffer:
+    """
+    Per-session write buffer for parental rules. Tool handlers from one turn
+    stage their (already validated) fields and wait on a shared flush, which
+    writes everything in a single upsert, refreshes
+    `SessionData.parental_instructions` in place and produces one
+    consolidated confirmation.
+    """
+
+    def __init__(self, session_data, window: float = config.PARENTAL_RULE_COALESCE_MS / 1000):
+        self.session_data = session_data
+        self.window = window
+        self.supabase = SupabaseHelper()
+        self._staged = {}
+        self._flush = None
+        self._on_update = []
+
+    def on_update(self, callback):
+        """`callback(rules: dict)` after every successful write."""
+        self._on_update.append(callback)
+
+    async def stage(self, device_id: str, update_data: Dict[str, object]) -> str:
+        """
+        Returns the consolidated confirmation to the first caller of a flush
+        and a short note to the others; if the write failed, every caller
+        gets the failure.
+        """
+        if device_id != self.session_data.device_id:
+            logger.warning(f"Tool call for device_id {device_id} in session {self.session_data.device_id}; using the session's")
+        self._staged.update(update_data)
+        if self._flush is None:
+            self._flush = asyncio.create_task(self._write_after(self.window))
+            _, message = await asyncio.shield(self._flush)
+            return message
+        ok, message = await asyncio.shield(self._flush)
+        return "Saved together with the other rule changes above." if ok else message
+
+    async def _write_after(self, delay: float) -> tuple[bool, str]:
+        # Parallel tool calls from the same LLM step all land inside this window.
+        await asyncio.sleep(delay)
+        self._flush = None
+        update_data, self._staged = self._staged, {}
+        device_id = self.session_data.device_id
+        try:
+            result = await self.supabase.update_parental_rule(device_id, update_data)
+        except Exception as e:
+            logger.error(f"Error writing parental rules for device_id {device_id}: {e}")
+            result = False
+        if not result:
+            logger.error(f"Failed to update parental rules for device_id {device_id}")
+            return False, f"Failed to update parental rules for device_id {device_id}"
+
+        self.session_data.parental_instructions.update(update_data)
+        for callback in self._on_update:
+            callback(self.session_data.parental_instructions)
+        updated_fields = ", ".join(f"{k}={v}" for k, v in update_data.items())
+        logger.info(f"Updated parental rules for device_id {device_id} in one write: {updated_fields}")
+        return True, f"Updated parental rules for device_id {device_id}: {updated_fields}"
+
+
+def get_rule_buffer(session_data) -> ParentalRuleBuffer:
+    if session_data.parental_rule_buffer is None:
+        session_data.parental_rule_buffer = ParentalRuleBuffer(session_data)
+    return session_data.parental_rule_buffer
+
+
 def create_set_parental_rules_tool():
     schema = {
         "type": "function",
@@ -15,50 +186,10 @@ def create_set_parental_rules_tool():
         "parameters": {
             "type": "object",
             "properties": {
-                "device_id": {
-                    "type": "string",
-                    "description": "Text identifier of the child profile to update"
-                },
+                "device_id": DEVICE_ID_SCHEMA,
                 "rules": {
                     "type": "object",
-                    "properties": {
-                        "language_filter": {
-                            "type": "boolean",
-                            "description": "Enable/disable language filter"
-                        },
-                        "bedtime_reminder": {
-                            "type": "boolean",
-                            "description": "Enable/disable bedtime reminder"
-                        },
-                        "bedtime": {
-                            "type": "string",
-                            "description": "Set bedtime in HH:MM AM/PM format (e.g., '8:00 PM')"
-                        },
-                        "restricted_topics": {
-                            "type": "array",
-                            "items": {
-                                "type": "string",
-                                "description": "A restricted conversation topic"
-                            },
-                            "description": "List of restricted conversation topics"
-                        },
-                        "tts_pitch_preference": {
-                            "type": "string",
-                            "description": "Text-to-speech pitch preference (e.g., 'low', 'medium', 'high')"
-                        },
-                        "learning_focus": {
-                            "type": "array",
-                            "items": {
-                                "type": "string",
-                                "description": "An educational topic to focus on"
-                            },
-                            "description": "List of educational topics to emphasize"
-                        },
-                        "alert_on_restricted": {
-                            "type": "boolean",
-                            "description": "Enable/disable alerts for restricted topics"
-                        }
-                    },
+                    "properties": RULE_FIELDS,
                     "additionalProperties": False
                 }
             },
@@ -69,131 +200,44 @@ def create_set_parental_rules_tool():
     async def handler(raw_arguments: Dict[str, object], context: RunContext) -> str:
         try:
             device_id = raw_arguments["device_id"]
-            rules = raw_arguments["rules"]
-
-            if not isinstance(device_id, str) or not device_id:
-                raise ValueError("device_id must be a non-empty string")
-            if not isinstance(rules, dict):
-                raise ValueError("rules must be an object")
-
-            valid_fields = {
-                "language_filter": bool,
-                "bedtime_reminder": bool,
-                "bedtime": str,
-                "restricted_topics": list,
-                "tts_pitch_preference": str,
-                "learning_focus": list,
-                "alert_on_restricted": bool
-            }
-            update_data = {}
-            for field, value in rules.items():
-                if field not in valid_fields:
-                    raise ValueError(f"Invalid field: {field}")
-                if not isinstance(value, valid_fields[field]):
-                    raise ValueError(f"Invalid type for {field}: expected {valid_fields[field].__name__}")
-                if field == "bedtime" and value:
-                    try:
-                        datetime.strptime(value, "%I:%M %p")
-                        # Convert to HH:MM:SS for TIME column
-                        update_data[field] = datetime.strptime(value, "%I:%M %p").strftime("%H:%M:%S")
-                    except ValueError:
-                        raise ValueError(f"Invalid bedtime format: {value}. Use 'HH:MM AM/PM' (e.g., '9:00 PM').")
-                elif field in ("restricted_topics", "learning_focus"):
-                    for item in value:
-                        if not isinstance(item, str):
-                            raise ValueError(f"All items in {field} must be strings")
-                    update_data[field] = value
-                else:
-                    update_data[field] = value
-
-            supabase = SupabaseHelper()
-            result = await supabase.update_parental_rule(device_id, update_data)
-            if result:
-                updated_fields = ", ".join(f"{k}={v}" for k, v in update_data.items())
-                logger.info(f"Successfully updated parental rules for device_id {device_id}: {updated_fields}")
-                return f"Updated parental rules for device_id {device_id}: {updated_fields}"
-            else:
-                logger.error(f"Failed to update parental rules for device_id {device_id}")
-                return f"Failed to update parental rules for device_id {device_id}"
+            _check_device_id(device_id)
+            update_data = validate_rules(raw_arguments["rules"])
         except Exception as e:
             logger.error(f"Error in set_parental_rules handler: {e}, raw_arguments={raw_arguments}")
             return f"Sorry, I couldn't update parental rules. Please try again."
+        return await get_rule_buffer(context.userdata).stage(device_id, update_data)
 
     return function_tool(handler, raw_schema=schema)
 
-def create_parental_tool(field: str, field_type: str):
-    parameters = {
-        "type": "object",
-        "properties": {
-            "device_id": {
-                "type": "string",
-                "description": "Text identifier of the child profile to update"
-            },
-            "value": {
-                "type": field_type,
-                "description": f"New value for {field}"
-            },
-        },
-        "required": ["device_id", "value"],
-    }
-    if field_type == "array":
-        parameters["properties"]["value"]["items"] = {
-            "type": "string",
-            "description": f"Individual item for {field}"
-        }
-
+def create_parental_tool(field: str):
     schema = {
         "type": "function",
         "name": f"set_{field}",
         "description": f"Update the `{field}` field in parental_rules.",
-        "parameters": parameters,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "device_id": DEVICE_ID_SCHEMA,
+                "value": {**RULE_FIELDS[field], "description": f"New value for {field}"},
+            },
+            "required": ["device_id", "value"],
+        },
     }
+    validate = VALIDATORS[field]
 
     async def handler(raw_arguments: Dict[str, object], context: RunContext) -> str:
         try:
             device_id = raw_arguments["device_id"]
-            value = raw_arguments["value"]
-            if not isinstance(device_id, str) or not device_id:
-                raise ValueError("device_id must be a non-empty string")
-            if field_type == "boolean" and not isinstance(value, bool):
-                raise ValueError(f"{field} must be a boolean")
-            if field_type == "string" and not isinstance(value, str):
-                raise ValueError(f"{field} must be a string")
-            if field_type == "array" and not isinstance(value, list):
-                raise ValueError(f"{field} must be a list of strings")
-            if field_type == "array":
-                for item in value:
-                    if not isinstance(item, str):
-                        raise ValueError(f"All items in {field} must be strings")
-            if field == "bedtime" and value:
-                try:
-                    datetime.strptime(value, "%I:%M %p")
-                    # Convert to HH:MM:SS for TIME column
-                    value = datetime.strptime(value, "%I:%M %p").strftime("%H:%M:%S")
-                except ValueError:
-                    raise ValueError(f"Invalid bedtime format: {value}. Use 'HH:MM AM/PM' (e.g., '9:00 PM').")
-
-            supabase = SupabaseHelper()
-            result = await supabase.update_parental_rule(device_id, {field: value})
-            if result:
-                logger.info(f"Updated {field} to {value} for device_id {device_id}")
-                return f"Updated {field} to {value} for device_id {device_id}"
-            else:
-                logger.error(f"Failed to update {field} for device_id {device_id}")
-                return f"Failed to update {field} for device_id {device_id}"
+            _check_device_id(device_id)
+            value = validate(raw_arguments["value"])
         except Exception as e:
             logger.error(f"Error in set_{field} handler: {e}, raw_arguments={raw_arguments}")
             return f"Sorry, I couldn't update {field}. Please try again."
+        return await get_rule_buffer(context.userdata).stage(device_id, {field: value})
 
     return function_tool(handler, raw_schema=schema)
 
 PARENTAL_RULE_TOOLS = [
     create_set_parental_rules_tool(),
-    create_parental_tool("language_filter", "boolean"),
-    create_parental_tool("bedtime_reminder", "boolean"),
-    create_parental_tool("bedtime", "string"),
-    create_parental_tool("restricted_topics", "array"),
-    create_parental_tool("tts_pitch_preference", "string"),
-    create_parental_tool("learning_focus", "array"),
-    create_parental_tool("alert_on_restricted", "boolean"),
-]
\ No newline at end of file
+    *(create_parental_tool(field) for field in RULE_FIELDS),
+]
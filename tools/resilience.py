@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.resilience")
+
+metrics.describe("backend_call_seconds", "Backend call duration (the winning attempt), by call.")
+metrics.describe("backend_hedges_total", "Duplicate requests sent after a slow first attempt, by call and winner.")
+metrics.describe("backend_retries_total", "Backend calls retried after a failure, by call.")
+metrics.describe("circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.")
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpen(Exception):
+    """The backend is marked unhealthy; the call wasn't attempted."""
+
+
+class LatencyWindow:
+    """Recent call durations, for the hedging delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects calls for
+    `reset_after` seconds; then lets one probe through (half-open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, name: str, failures: int = 5, reset_after: float = 30.0):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+            self._set("half_open")
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self._failed = 0
+        self._probing = False
+        if self.state != "closed":
+            self._set("closed")
+
+    def release(self):
+        """The probe ended without an answer (cancelled): the next call probes instead."""
+        self._probing = False
+
+    def failure(self):
+        self._failed += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self._failed >= self.failures):
+            self._opened_at = time.monotonic()
+            self._set("open")
+
+    def _set(self, state: str):
+        self.state = state
+        metrics.set_gauge("circuit_breaker_state", _STATE_VALUES[state], breaker=self.name)
+        log_event(logger, "circuit_breaker.state", logging.WARNING if state == "open" else logging.INFO,
+                  breaker=self.name, state=state)
+
+
+async def hedged(name: str, attempt, hedge_after: float | None):
+    """
+    Runs `attempt()`; if it hasn't finished after `hedge_after` seconds,
+    starts a second one and returns whichever succeeds first. Only for
+    idempotent calls.
+    """
+    tasks = [asyncio.ensure_future(attempt())]
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(attempt()))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        metrics.inc("backend_hedges_total", call=name,
+                                    winner="primary" if task is tasks[0] else "hedge")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call(name: str, attempt, *, deadline: float, retries: int = 0, breaker: CircuitBreaker | None = None,
+               window: LatencyWindow | None = None, hedge_quantile: float | None = None,
+               hedge_min: float = 0.05, backoff: float = 0.1, permanent=lambda e: False):
+    """
+    `attempt()` with an overall `deadline` (seconds), up to `retries`
+    retries with jittered exponential backoff, a hedged duplicate after the
+    `hedge_quantile` latency seen so far, and `breaker` bookkeeping.
+    Exceptions for which `permanent(e)` is true (not found, bad request)
+    are raised at once and don't count against the backend.
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpen(breaker.name)
+    probe = breaker is not None and breaker.state == "half_open"
+    started = time.monotonic()
+    hedge_after = None
+    if window is not None and hedge_quantile is not None:
+        observed = window.quantile(hedge_quantile)
+        hedge_after = max(hedge_min, observed) if observed is not None else None
+
+    try:
+        for retry in range(retries + 1):
+            remaining = deadline - (time.monotonic() - started)
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                attempt_started = time.monotonic()
+                result = await asyncio.wait_for(hedged(name, attempt, hedge_after), remaining)
+            except Exception as e:
+                if permanent(e):
+                    if breaker is not None:
+                        breaker.success()
+                    raise
+                remaining = deadline - (time.monotonic() - started)
+                if retry == retries or remaining <= 0 or isinstance(e, asyncio.TimeoutError):
+                    if breaker is not None:
+                        breaker.failure()
+                    raise
+                metrics.inc("backend_retries_total", call=name)
+                await asyncio.sleep(min(remaining, backoff * 2 ** retry * random.uniform(0.5, 1.5)))
+                continue
+            elapsed = time.monotonic() - attempt_started
+            if window is not None:
+                window.add(elapsed)
+            metrics.observe("backend_call_seconds", elapsed, call=name)
+            if breaker is not None:
+                breaker.success()
+            return result
+    except BaseException as e:
+        if probe and not isinstance(e, Exception):
+            # Cancelled mid-probe: without this the breaker would stay half-open, rejecting every call.
+            breaker.release()
+        raise
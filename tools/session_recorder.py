@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+logger = logging.getLogger("livekit.session_recorder")
+
+RECORDING_VERSION = 1
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+STREET_RE = re.compile(
+    r"\b\d{1,5}\s+(?:[A-Za-z]+\s+){1,3}(?:street|st|road|rd|avenue|ave|lane|ln|drive|dr|way|court|ct|"
+    r"boulevard|blvd|place|pl|close|crescent)\b\.?",
+    re.IGNORECASE,
+)
+# Digits only count as a postcode after a cue ("my pin code is 560001"); the UK shape is distinctive on its own.
+POSTCODE_RE = re.compile(
+    r"(?i:\b(?:post\s*code|zip(?:\s*code)?|pin\s*code|pincode)(?:\s+is)?[\s:]+)(\d{5}(?:-\d{4})?|\d{6})\b"
+    r"|\b[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}\b"
+)
+SCHOOL_RE = re.compile(r"\b(?:[A-Z][\w'-]*\s+){1,4}(?:School|Elementary|Academy|Primary|Kindergarten|Preschool)\b")
+# "my dog is called Biscuit", "my friend Sam", "her name is Priya": whatever follows is a name. Only the cue
+# is case-insensitive; after "my dog" it takes a capitalised word, so "my dog likes bones" is left alone.
+NAMED_RE = re.compile(
+    r"(?i:\b(?:called|named|name is|name's))\s+([A-Za-z][\w'-]*)"
+    r"|(?i:\bmy\s+(?:best\s+)?(?:friend|buddy|dog|puppy|cat|kitten|pet|bunny|hamster|fish|brother|sister|cousin|"
+    r"teacher|mom|mum|dad|grandma|granny|grandpa|aunt|auntie|uncle|neighbou?r))\s+([A-Z][\w'-]*)"
+)
+NOT_NAMES = {"a", "an", "the", "my", "is", "and", "it", "him", "her", "them", "me", "you", "this", "that", "so",
+             "after", "because", "something", "what"}
+
+
+def _replace_group(match: re.Match, group: int, placeholder: str) -> str:
+    start, end = match.span(group)
+    offset = match.start()
+    return match.group(0)[:start - offset] + placeholder + match.group(0)[end - offset:]
+
+
+def _named(match: re.Match) -> str:
+    group = 1 if match.group(1) else 2
+    name = match.group(group)
+    if name.startswith("<") or name.lower() in NOT_NAMES:
+        return match.group(0)
+    return _replace_group(match, group, "<NAME>")
+
+
+def _postcode(match: re.Match) -> str:
+    return "<POSTCODE>" if match.group(1) is None else _replace_group(match, 1, "<POSTCODE>")
+
+
+class PiiScrubber:
+    """
+    Replaces known identifiers (name, city, device id, dob), emails,
+    phones, street addresses, postcodes and schools with placeholders, and
+    names introduced as such in free speech ("my friend Sam", "she's
+    called Priya") with <NAME>. Other capitalised words (Minecraft, the
+    Sky) are left alone, so replays keep what the child talked about.
+
+    Best effort: a name that isn't in the profile or introduced gets
+    through, so recordings are still personal data. Keep them on restricted
+    storage and don't commit production recordings.
+    """
+
+    def __init__(self, device_id: str = None, name: str = None, city: str = None, dob: str = None):
+        self.known = [
+            (value, placeholder)
+            for value, placeholder in ((name, "<NAME>"), (city, "<CITY>"), (device_id, "<DEVICE>"), (dob, "<DOB>"))
+            if value
+        ]
+        self.known_res = [
+            (re.compile(rf"\b{re.escape(str(value))}\b", re.IGNORECASE), placeholder)
+            for value, placeholder in self.known
+        ]
+
+    def text(self, value: str) -> str:
+        if not value:
+            return value
+        value = EMAIL_RE.sub("<EMAIL>", value)
+        value = STREET_RE.sub("<ADDRESS>", value)
+        value = PHONE_RE.sub("<PHONE>", value)
+        value = POSTCODE_RE.sub(_postcode, value)
+        value = SCHOOL_RE.sub("<SCHOOL>", value)
+        for pattern, placeholder in self.known_res:
+            value = pattern.sub(placeholder, value)
+        return NAMED_RE.sub(_named, value)
+
+    def value(self, value):
+        if isinstance(value, str):
+            return self.text(value)
+        if isinstance(value, list):
+            return [self.value(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.value(v) for k, v in value.items()}
+        return value
+
+
+class SessionRecorder:
+    """
+    Records a live AgentSession as a replayable, PII-scrubbed transcript:
+    final user turns, the agent that handled them, tool calls, and the
+    latency / token numbers seen in production. Replay with
+    `python -m benchmarks.replay`.
+    """
+
+    def __init__(self, session_data, directory: str):
+        self.directory = directory
+        self.session_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.scrubber = PiiScrubber(
+            device_id=session_data.device_id,
+            name=session_data.user_name,
+            city=session_data.city,
+            dob=session_data.dob,
+        )
+        self.recording = {
+            "version": RECORDING_VERSION,
+            "session_id": self.session_id,
+            "recorded_at": self.started_at,
+            "is_new_user": session_data.is_new_user,
+            "age": session_data.age,
+            "interests": session_data.interests or [],
+            "turns": [],
+        }
+        self._session = None
+        self._turn = None
+
+    def attach(self, session):
+        self._session = session
+        session.on("user_input_transcribed", self._on_transcribed)
+        session.on("function_tools_executed", self._on_tools_executed)
+        session.on("agent_state_changed", self._on_agent_state_changed)
+        session.on("metrics_collected", self._on_metrics)
+        session.on("close", self._on_close)
+
+    def _agent_name(self) -> str | None:
+        try:
+            agent = self._session.current_agent
+        except RuntimeError:
+            return None
+        return type(agent).__name__ if agent is not None else None
+
+    def _on_transcribed(self, ev):
+        if not ev.is_final or not ev.transcript.strip():
+            return
+        # Finals keep arriving until the agent answers; they belong to the same turn.
+        if self._turn is not None and self._turn["latency_s"] is None:
+            self._turn["text"] = f"{self._turn['text']} {self.scrubber.text(ev.transcript)}"
+            self._turn["_ended_at"] = ev.created_at
+            return
+        self._turn = {
+            "t": round(ev.created_at - self.started_at, 3),
+            "agent": self._agent_name(),
+            "text": self.scrubber.text(ev.transcript),
+            "tool_calls": [],
+            "latency_s": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "_ended_at": ev.created_at,
+        }
+        self.recording["turns"].append(self._turn)
+
+    def _on_tools_executed(self, ev):
+        if self._turn is None:
+            return
+        for call in ev.function_calls:
+            try:
+                arguments = json.loads(call.arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            self._turn["tool_calls"].append({"name": call.name, "arguments": self.scrubber.value(arguments)})
+
+    def _on_agent_state_changed(self, ev):
+        if ev.new_state == "speaking" and self._turn is not None and self._turn["latency_s"] is None:
+            self._turn["latency_s"] = round(ev.created_at - self._turn["_ended_at"], 3)
+
+    def _on_metrics(self, ev):
+        metrics = ev.metrics
+        if self._turn is not None and getattr(metrics, "type", None) == "llm_metrics":
+            self._turn["prompt_tokens"] += metrics.prompt_tokens
+            self._turn["completion_tokens"] += metrics.completion_tokens
+
+    def _on_close(self, ev):
+        try:
+            self.save()
+        except Exception:
+            logger.exception("Failed to save session recording")
+
+    def save(self) -> str:
+        for turn in self.recording["turns"]:
+            turn.pop("_ended_at", None)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.session_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.recording, f, indent=2)
+        logger.info(f"Saved session recording to {path} ({len(self.recording['turns'])} turns)")
+        return path
@@ -0,0 +1,145 @@
+"""
+Snapshots of a session, so a toy that drops and rejoins within
+SNAPSHOT_TTL_S picks the conversation up where it was: no bootstrap
+fetches, no summaries, no greeting.
+
+A snapshot is the session's SessionData (minus its live helpers) and the
+recent chat history, as zlib-compressed JSON, written when the session
+closes for any reason other than the child finishing. It lives in
+SNAPSHOT_DIR, which every job process on the host shares, and is taken
+(read and deleted) by the next join for the same device.
+"""
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import zlib
+
+from livekit.agents import llm
+
+import config
+from agents.session_data import SessionData
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.session_snapshot")
+
+VERSION = 1
+# Rebuilt for every session rather than serialized.
+RUNTIME_FIELDS = {"interest_tracker", "parental_rule_buffer", "content_guard"}
+# A session that ends like this may be resumed; user_initiated means the app closed it on purpose.
+RESUMABLE_REASONS = {"participant_disconnected", "error", "job_shutdown"}
+
+metrics.describe("session_snapshots_total", "Session snapshots, by outcome (saved, restored, expired, skipped).")
+metrics.describe("session_snapshot_bytes", "Size of saved session snapshots.")
+
+
+def encode(session_data: SessionData, history: llm.ChatContext | None, agent: str,
+           max_items: int = config.SNAPSHOT_MAX_ITEMS) -> bytes:
+    data = {f.name: getattr(session_data, f.name) for f in dataclasses.fields(session_data)
+            if f.name not in RUNTIME_FIELDS}
+    chat = {"items": []}
+    if history is not None:
+        # Instructions are rebuilt from SessionData on enter; keep only the conversation.
+        chat = history.copy(exclude_instructions=True).truncate(max_items=max_items).to_dict(exclude_timestamp=False)
+    payload = {"v": VERSION, "saved_at": time.time(), "agent": agent, "session_data": data, "chat_ctx": chat}
+    return zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def decode(blob: bytes) -> dict | None:
+    try:
+        payload = json.loads(zlib.decompress(blob))
+    except (zlib.error, ValueError) as e:
+        log_event(logger, "snapshot.corrupt", logging.WARNING, error=repr(e))
+        return None
+    return payload if payload.get("v") == VERSION else None
+
+
+def restore(session_data: SessionData, payload: dict) -> llm.ChatContext:
+    """Fills `session_data` from the snapshot and returns the chat history to resume with."""
+    known = {f.name for f in dataclasses.fields(session_data)} - RUNTIME_FIELDS
+    for name, value in payload["session_data"].items():
+        if name in known:
+            setattr(session_data, name, value)
+    return llm.ChatContext.from_dict(payload["chat_ctx"])
+
+
+class SnapshotStore:
+    """One file per device under `directory`; entries older than `ttl` are ignored and removed."""
+
+    def __init__(self, directory: str = config.SNAPSHOT_DIR, ttl: float = config.SNAPSHOT_TTL_S):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, device_id: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(device_id.encode("utf-8")).hexdigest() + ".snap")
+
+    def save(self, device_id: str, blob: bytes):
+        """Synchronous on purpose: it runs as the session closes, when the job may be about to exit."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, self._path(device_id))
+
+    def _take(self, device_id: str) -> bytes | None:
+        path = self._path(device_id)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path, "rb") as f:
+                blob = f.read()
+            os.unlink(path)
+        except FileNotFoundError:
+            return None
+        if age > self.ttl:
+            metrics.inc("session_snapshots_total", outcome="expired")
+            return None
+        return blob
+
+    async def take(self, device_id: str) -> dict | None:
+        """The device's snapshot, if one is fresh; it is removed either way."""
+        blob = await asyncio.to_thread(self._take, device_id)
+        return decode(blob) if blob is not None else None
+
+    def discard(self, device_id: str):
+        try:
+            os.unlink(self._path(device_id))
+        except FileNotFoundError:
+            pass
+
+
+def save_on_close(session, session_data: SessionData, store: "SnapshotStore | None" = None):
+    """Snapshot `session` when it closes, unless the child finished (exit) or the app closed it."""
+    store = store or get_snapshot_store()
+
+    def on_close(ev):
+        reason = str(getattr(ev.reason, "value", ev.reason))
+        if session_data.finished or reason not in RESUMABLE_REASONS:
+            metrics.inc("session_snapshots_total", outcome="skipped")
+            return
+        try:
+            agent = type(session.current_agent).__name__ if session.current_agent is not None else ""
+            blob = encode(session_data, session.history, agent)
+            store.save(session_data.device_id, blob)
+        except Exception as e:
+            log_event(logger, "snapshot.save_failed", logging.WARNING, device_id=session_data.device_id, error=repr(e))
+            return
+        metrics.inc("session_snapshots_total", outcome="saved")
+        metrics.observe("session_snapshot_bytes", len(blob))
+        log_event(logger, "snapshot.saved", device_id=session_data.device_id, reason=reason, bytes=len(blob))
+
+    session.on("close", on_close)
+
+
+_store = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _store
+    if _store is None:
+        _store = SnapshotStore()
+    return _store
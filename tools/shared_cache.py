@@ -0,0 +1,229 @@
+"""
+A cache shared by every job process on the host. LiveKit runs each job in
+its own process, so anything kept in memory (last-good profile reads,
+embeddings, session summaries) starts cold for every session; this tier
+keeps it in a local SQLite file in WAL mode, which many processes can
+read while one writes, with each write atomic.
+
+Entries have a namespace, a key, a TTL and a size. The file is kept under
+`max_bytes` by trimming expired entries, then the least recently used,
+whenever this process has written another `max_bytes / 50` bytes. Values
+are JSON, or raw bytes (vectors). Any SQLite error is logged and treated
+as a miss: the cache never fails the call it sits in front of.
+
+Entries include children's profile data, so the file lives in a directory
+only the worker's user can enter and is itself readable by no one else,
+whatever the umask.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import config
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.shared_cache")
+
+metrics.describe("shared_cache_requests_total", "Shared cache lookups, by namespace and outcome (hit, miss, error).")
+metrics.describe("shared_cache_evictions_total", "Entries removed from the shared cache, by reason (expired, size).")
+metrics.describe("shared_cache_bytes", "Size of the values in the shared cache after the last trim.")
+
+_JSON = b"j"
+_RAW = b"b"
+# accessed_at is only rewritten when this stale, so hot reads don't each take the write lock.
+_TOUCH_AFTER_S = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+"""
+
+
+def make_private(path: str):
+    """Creates `path` readable only by this user, in a directory only it can enter if that's new too."""
+    # An existing directory is left alone: it may be a shared one like /tmp.
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    # SQLite gives the -wal and -shm files the database file's mode; ones left from before are fixed here.
+    for name in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(name) and os.stat(name).st_uid == os.getuid():
+            os.chmod(name, 0o600)
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _RAW + bytes(value)
+    return _JSON + json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _decode(blob: bytes):
+    blob = bytes(blob)
+    return blob[1:] if blob[:1] == _RAW else json.loads(blob[1:])
+
+
+class SharedCache:
+    def __init__(self, path: str = config.SHARED_CACHE_PATH,
+                 max_bytes: int = int(config.SHARED_CACHE_MAX_MB * 1024 * 1024), busy_timeout: float = 2.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._written = 0
+        self._trim_lock = threading.Lock()
+        self._tasks = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread (to_thread workers) and per process.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        make_private(self.path)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size=67108864")
+        conn.executescript(_SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get_many_sync(self, namespace: str, keys: list[str]) -> dict:
+        if not keys:
+            return {}
+        now = time.time()
+        found, stale = {}, []
+        try:
+            conn = self._connection()
+            marks = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key IN ({marks})",
+                (namespace, *keys),
+            ).fetchall()
+            for key, value, expires_at, accessed_at in rows:
+                if expires_at <= now:
+                    continue
+                found[key] = _decode(value)
+                if now - accessed_at > _TOUCH_AFTER_S:
+                    stale.append(key)
+            if stale:
+                conn.execute(
+                    f"UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key IN ({','.join('?' * len(stale))})",
+                    (now, namespace, *stale),
+                )
+        except (sqlite3.Error, OSError, ValueError) as e:
+            metrics.inc("shared_cache_requests_total", len(keys), namespace=namespace, outcome="error")
+            log_event(logger, "shared_cache.read_failed", logging.WARNING, namespace=namespace, error=repr(e))
+            return {}
+        metrics.inc("shared_cache_requests_total", len(found), namespace=namespace, outcome="hit")
+        metrics.inc("shared_cache_requests_total", len(keys) - len(found), namespace=namespace, outcome="miss")
+        return found
+
+    def put_many_sync(self, namespace: str, items: dict, ttl: float):
+        if not items:
+            return
+        now = time.time()
+        rows = [(namespace, key, blob, len(blob), now + ttl, now)
+                for key, blob in ((key, _encode(value)) for key, value in items.items())]
+        try:
+            conn = self._connection()
+            # One transaction: readers in other processes see all of it or none of it.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            log_event(logger, "shared_cache.write_failed", logging.WARNING, namespace=namespace, error=repr(e))
+            return
+        self._written += sum(row[3] for row in rows)
+        if self._written > self.max_bytes / 50:
+            self._written = 0
+            self.trim_sync()
+
+    def trim_sync(self):
+        """Drops expired entries, then the least recently used until under 90% of `max_bytes`."""
+        if not self._trim_lock.acquire(blocking=False):
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                evicted = 0
+                target = int(self.max_bytes * 0.9)
+                while total > target:
+                    victims = conn.execute(
+                        "SELECT namespace, key, size FROM entries ORDER BY accessed_at LIMIT 500"
+                    ).fetchall()
+                    if not victims:
+                        break
+                    for namespace, key, size in victims:
+                        conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                        evicted += 1
+                        total -= size
+                        if total <= target:
+                            break
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            log_event(logger, "shared_cache.trim_failed", logging.WARNING, error=repr(e))
+            return
+        finally:
+            self._trim_lock.release()
+        if expired:
+            metrics.inc("shared_cache_evictions_total", expired, reason="expired")
+        if evicted:
+            metrics.inc("shared_cache_evictions_total", evicted, reason="size")
+        metrics.set_gauge("shared_cache_bytes", total)
+        if expired or evicted:
+            log_event(logger, "shared_cache.trimmed", expired=expired, evicted=evicted, bytes=total)
+
+    async def get(self, namespace: str, key: str):
+        return (await self.get_many(namespace, [key])).get(key)
+
+    async def get_many(self, namespace: str, keys: list[str]) -> dict:
+        """The live entries among `keys`, as key -> value; missing and expired keys are left out."""
+        return await asyncio.to_thread(self.get_many_sync, namespace, list(keys))
+
+    async def set(self, namespace: str, key: str, value, ttl: float):
+        await self.set_many(namespace, {key: value}, ttl)
+
+    async def set_many(self, namespace: str, items: dict, ttl: float):
+        await asyncio.to_thread(self.put_many_sync, namespace, dict(items), ttl)
+
+    def put(self, namespace: str, key: str, value, ttl: float):
+        """Like `set`, without waiting for the write."""
+        self.put_many(namespace, {key: value}, ttl)
+
+    def put_many(self, namespace: str, items: dict, ttl: float):
+        task = asyncio.ensure_future(self.set_many(namespace, items, ttl))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+_cache = None
+
+
+def get_shared_cache() -> SharedCache | None:
+    """The host's shared cache, or None when SHARED_CACHE is off."""
+    global _cache
+    if _cache is None and config.SHARED_CACHE:
+        _cache = SharedCache()
+    return _cache
@@ -0,0 +1,80 @@
+import asyncio
+import copy
+import functools
+import logging
+
+from tools import metrics
+
+logger = logging.getLogger("livekit.single_flight")
+
+metrics.describe("single_flight_calls_total", "Coalesced calls, by function and whether they ran it or joined one in flight.")
+
+
+class _Call:
+    __slots__ = ("task", "waiting")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiting = 0
+
+
+async def _snapshot(fn, args, kwargs):
+    # Taken once, when the call completes: callers get copies of this, never what `fn` may still hold.
+    return copy.deepcopy(await fn(*args, **kwargs))
+
+
+class SingleFlight:
+    """
+    At most one call per key in flight: callers arriving while it runs wait
+    for the same result instead of repeating the work. Every caller, the
+    one that started it included, gets its own copy, so one session can't
+    change another's data. Nothing is cached once it finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(_snapshot(fn, args, kwargs)))
+            call.task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is call else None)
+            metrics.inc("single_flight_calls_total", fn=self.name, outcome="leader")
+        else:
+            metrics.inc("single_flight_calls_total", fn=self.name, outcome="shared")
+        call.waiting += 1
+        try:
+            # Shielded: the leader leaving (a participant dropping mid-join) mustn't fail the others.
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiting -= 1
+        # The last caller to collect it takes the snapshot itself; the others have their copies already.
+        return result if call.waiting == 0 else copy.deepcopy(result)
+
+
+def coalesce(fn=None, *, key=None):
+    """
+    Decorator for async functions and methods: concurrent calls with equal
+    arguments share one in-flight call. `key` maps the arguments (without
+    `self`) to the coalescing key; by default they are the key, and calls
+    with unhashable arguments just run.
+    """
+    def decorate(fn):
+        flight = SingleFlight(fn.__qualname__)
+        is_method = "." in fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call_args = args[1:] if is_method else args
+            try:
+                call_key = key(*call_args, **kwargs) if key is not None else (call_args, frozenset(kwargs.items()))
+                hash(call_key)
+            except TypeError:
+                return await fn(*args, **kwargs)
+            return await flight.do(call_key, fn, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncIterable
+
+from livekit import rtc
+
+import config
+from tools import metrics
+
+logger = logging.getLogger("livekit.speech_chunker")
+
+metrics.describe("tts_first_chunk_seconds", "From the first reply token to the first frame of its audio.")
+metrics.describe("tts_chunks_total", "Reply chunks sent to TTS, by the boundary they were cut at.")
+
+# A boundary only counts once the next token has arrived (the trailing space),
+# so "3.5" and "Mr." mid-stream aren't cut.
+SENTENCE_BOUNDARY = re.compile(r"[.!?]+[\"')\]]?(?=\s)|\n")
+CLAUSE_BOUNDARY = re.compile(r"[,;:—](?=\s)")
+
+
+class ChunkSplitter:
+    """
+    Cuts a streamed reply into pieces for TTS. The first piece goes out at the
+    first clause or sentence end past `first_min_chars`, so audio starts
+    early; later pieces wait for a sentence end past `min_chars`, which keeps
+    short exclamations ("Wow!") together with what follows and the prosody
+    natural. Anything longer than `max_chars` is cut at a clause or word.
+    """
+
+    def __init__(self, first_min_chars: int = config.TTS_FIRST_CHUNK_MIN_CHARS,
+                 min_chars: int = config.TTS_CHUNK_MIN_CHARS, max_chars: int = config.TTS_CHUNK_MAX_CHARS):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._emitted = False
+
+    def push(self, text: str) -> list[str]:
+        """Chunks completed by `text`."""
+        self._buffer += text
+        chunks = []
+        while (chunk := self._cut()) is not None:
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> str | None:
+        """Whatever is left once the reply has ended."""
+        rest, self._buffer = self._buffer.strip(), ""
+        if rest:
+            metrics.inc("tts_chunks_total", boundary="end")
+        return rest or None
+
+    def _cut(self) -> str | None:
+        buffer = self._buffer
+        min_chars = self.min_chars if self._emitted else self.first_min_chars
+        if len(buffer) < min_chars:
+            return None
+        match = SENTENCE_BOUNDARY.search(buffer, min_chars - 1)
+        if match:
+            return self._take(match.end(), "sentence")
+        if not self._emitted or len(buffer) > self.max_chars:
+            match = CLAUSE_BOUNDARY.search(buffer, min_chars - 1)
+            if match:
+                return self._take(match.end(), "clause")
+        if len(buffer) > self.max_chars:
+            end = buffer.rfind(" ", 1, self.max_chars)
+            return self._take(end if end > 0 else self.max_chars, "length")
+        return None
+
+    def _take(self, end: int, boundary: str) -> str:
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:]
+        if chunk:
+            self._emitted = True
+            metrics.inc("tts_chunks_total", boundary=boundary)
+        return chunk
+
+
+async def synthesize_in_order(tts, text: AsyncIterable[str], conn_options=None,
+                              max_parallel: int = config.TTS_CHUNK_MAX_PARALLEL,
+                              splitter: ChunkSplitter | None = None) -> AsyncIterable[rtc.AudioFrame]:
+    """
+    `tts_node` body for a non-streaming TTS: each chunk from the splitter is
+    synthesized as soon as it is cut (up to `max_parallel` at a time) and
+    its frames are played strictly in reply order, the first chunk's as they
+    arrive.
+    """
+    splitter = splitter or ChunkSplitter()
+    lane = asyncio.Semaphore(max_parallel)
+    chunks = asyncio.Queue()
+    tasks = []
+    started = None
+
+    async def synthesize(chunk: str, frames: asyncio.Queue):
+        try:
+            async with lane:
+                kwargs = {"conn_options": conn_options} if conn_options is not None else {}
+                async with tts.synthesize(chunk, **kwargs) as stream:
+                    async for event in stream:
+                        frames.put_nowait(event.frame)
+        except Exception:
+            logger.exception(f"TTS failed for chunk {chunk[:40]!r}")
+        finally:
+            frames.put_nowait(None)
+
+    def start(chunk: str):
+        frames = asyncio.Queue()
+        tasks.append(asyncio.create_task(synthesize(chunk, frames)))
+        chunks.put_nowait(frames)
+
+    async def split():
+        nonlocal started
+        try:
+            async for piece in text:
+                if started is None:
+                    started = time.perf_counter()
+                for chunk in splitter.push(piece):
+                    start(chunk)
+            rest = splitter.flush()
+            if rest:
+                start(rest)
+        finally:
+            chunks.put_nowait(None)
+
+    producer = asyncio.create_task(split())
+    first = True
+    try:
+        while (frames := await chunks.get()) is not None:
+            while (frame := await frames.get()) is not None:
+                if first:
+                    first = False
+                    elapsed = time.perf_counter() - started
+                    metrics.observe("tts_first_chunk_seconds", elapsed)
+                    logger.debug(f"First reply audio {elapsed * 1000:.0f}ms after the first token")
+                yield frame
+        await producer
+    finally:
+        for task in (producer, *tasks):
+            task.cancel()
+        await asyncio.gather(producer, *tasks, return_exceptions=True)
@@ -1,11 +1,20 @@
-from openai import OpenAI
+import asyncio
+import hashlib
 import config
 import logging
 from tools.supabase_tools import SupabaseHelper
+from tools.log_setup import log_event
+from tools import model_registry, shared_cache
+from tools.single_flight import coalesce
+
+logger = logging.getLogger("livekit.summariser_tool")
 
-client = OpenAI(api_key=config.OPENAI_API_KEY)
 db = SupabaseHelper()
 
+ARCHIVE_MAX_TOKENS = 400
+
+# Reconnects for the same device join concurrently; summarize their sessions once.
+@coalesce(key=lambda session_texts: hashlib.sha1(repr(session_texts[-5:]).encode("utf-8")).hexdigest())
 async def summarize_last_sessions(session_texts: list[str]) -> list[str]:
     """
     Summarizes the last 5 session transcripts into 2 lines each.
@@ -13,9 +22,21 @@ async def summarize_last_sessions(session_texts: list[str]) -> list[str]:
     :param session_texts: List of session transcripts (most recent last)
     :return: List of 2-line summaries
     """
-    summaries = []
-    
-    for i, text in enumerate(session_texts[-5:]):  # Take last 5 sessions
+    cache = shared_cache.get_shared_cache()
+
+    async def summarize(text) -> str:
+        # A transcript's summary doesn't change; the same sessions come up on every join.
+        key = hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+        if cache is not None:
+            cached = await cache.get("summary", key)
+            if cached is not None:
+                return cached
+        summary, complete = await generate(text)
+        if cache is not None and complete:
+            cache.put("summary", key, summary, ttl=config.SHARED_CACHE_SUMMARY_TTL_H * 3600)
+        return summary
+
+    async def generate(text) -> tuple[str, bool]:
         prompt = f"""
         Summarize the following session in **2 concise lines** focusing on:
         - Main topics the child talked about
@@ -24,33 +45,35 @@ async def summarize_last_sessions(session_texts: list[str]) -> list[str]:
         Session Transcript:
         {text}
         """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        response = await model_registry.complete(
+            "summarization",
+            [
                 {"role": "system", "content": "You are a friendly AI assistant."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.5
         )
-        summary_text = response.choices[0].message.content.strip()
-        summaries.append(summary_text)
+        choice = response.choices[0]
+        # A summary cut off at the token cap is still usable for this prompt, but isn't cached.
+        return choice.message.content.strip(), choice.finish_reason != "length"
 
-    
-    return summaries
+    # Independent calls: the join waits for the slowest one, not the sum.
+    return list(await asyncio.gather(*(summarize(text) for text in session_texts[-5:])))
 
 
+@coalesce(key=lambda db, child_id, n: (child_id, n))
 async def archive_nth_last_session(db, child_id: str, n: int):
-    print("archiving last session")
+    log_event(logger, "archive.started", child_id=child_id, n=n)
     db = SupabaseHelper()
 
-    session_res = db.client.table("conversation_logs") \
+    session_res = await asyncio.to_thread(lambda: db.client.table("conversation_logs") \
         .select("id, content") \
         .eq("child_id", child_id) \
         .order("created_at", desc=True) \
         .range(n-1, n-1) \
-        .execute()
+        .execute())
     
-    print(f"response from archive :: {session_res}")
+    logger.debug("response from archive :: %s", session_res)
 
     if not session_res.data:
         return None  
@@ -68,24 +91,30 @@ async def archive_nth_last_session(db, child_id: str, n: int):
     Session Transcript:
     {session_text}
     """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    response = await model_registry.complete(
+        "summarization",
+        [
             {"role": "system", "content": "You are a friendly AI assistant."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.5
+        temperature=0.5,
+        # This replaces the transcript for good: give it room, and never store a cut-off summary.
+        max_tokens=ARCHIVE_MAX_TOKENS,
     )
-    summary_text = response.choices[0].message.content.strip()
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        log_event(logger, "archive.truncated", logging.WARNING, child_id=child_id, session_id=session_id)
+        return None
+    summary_text = choice.message.content.strip()
 
     # Update the same row to store the summary
-    res = db.client.table("conversation_logs") \
+    res = await asyncio.to_thread(lambda: db.client.table("conversation_logs") \
         .update({
             "content": summary_text,
         }) \
         .eq("id", session_id) \
-        .execute()
+        .execute())
     
-    print(f"updated summary for conversation :: {res}")
+    log_event(logger, "archive.summarized", child_id=child_id, session_id=session_id, chars=len(summary_text))
 
     return summary_text
\ No newline at end of file
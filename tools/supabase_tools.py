@@ -1,43 +1,119 @@
 import asyncio
+import copy
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
 import aiohttp
-from supabase import create_client, Client
+from supabase import ClientOptions, create_client, Client
 import config
 import logging
 from .agent_personality import personalities
+from . import metrics, resilience, shared_cache
+from .content_guard import STRICT_RULES
+from .log_setup import log_event
+from .single_flight import coalesce
 
 logger = logging.getLogger("livekit.supabase_tools")
 
+INTEREST_CATEGORIES = ["Hobbies", "Sports", "Favorite_Food", "Topics"]
+
+metrics.describe("supabase_reads_degraded_total", "Reads that failed or timed out, by query and what was served instead.")
+
+# Shared by every SupabaseHelper: they all talk to the same PostgREST.
+_breaker = resilience.CircuitBreaker(
+    "supabase", failures=config.SUPABASE_BREAKER_FAILURES, reset_after=config.SUPABASE_BREAKER_RESET_S,
+)
+_latency = defaultdict(resilience.LatencyWindow)
+# Last value each read returned, served while the backend is failing.
+_last_good = OrderedDict()
+_LAST_GOOD_MAX = 5000
+_MISSING = object()
+
+
+def _shared_key(name: str, key) -> str:
+    return f"{name}:{key!r}"
+
+
+def _not_found(e: Exception) -> bool:
+    # `.single()` on zero rows; a normal answer (new child, no rules yet), not a backend failure.
+    return getattr(e, "code", None) == "PGRST116"
+
+
 class SupabaseHelper:
     def __init__(self):
-        self.client: Client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+        self.client: Client = create_client(
+            config.SUPABASE_URL, config.SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=config.SUPABASE_CLIENT_TIMEOUT_S),
+        )
 
-    async def fetch_child_profile(self, device_id: str):
-        """Fetches the child's profile using the device_id."""
+    async def _read(self, name: str, run_query, key, default, missing=_MISSING):
+        """
+        Runs the sync, idempotent query `run_query` off the loop with a
+        deadline, a hedged duplicate after the query's p95, jittered retries
+        and the shared circuit breaker; returns its `.data`. On failure it
+        returns what this query last returned for `key` in this process or,
+        failing that, in any process on the host (the shared cache), else
+        `default` (always `default` when `key` is None). A `.single()` query
+        that finds no row returns `missing`, or `default` if not given.
+        """
         try:
-            def run_query():
-                return self.client.table('child_profiles').select("*").eq('device_id', device_id).single().execute()
-
-            response = await asyncio.to_thread(run_query)
-            return response.data
+            response = await resilience.call(
+                name, lambda: asyncio.to_thread(run_query),
+                deadline=config.SUPABASE_READ_DEADLINE_MS / 1000,
+                retries=config.SUPABASE_READ_RETRIES,
+                breaker=_breaker,
+                window=_latency[name],
+                hedge_quantile=config.SUPABASE_HEDGE_QUANTILE if config.SUPABASE_HEDGE else None,
+                permanent=_not_found,
+            )
         except Exception as e:
-            logging.error(f"Error fetching child profile: {e}")
-            return None
+            if _not_found(e):
+                return default if missing is _MISSING else missing
+            served, data = "default", default
+            if key is not None and (name, key) in _last_good:
+                served, data = "cache", copy.deepcopy(_last_good[(name, key)])
+            elif key is not None and (cache := shared_cache.get_shared_cache()) is not None:
+                # Another job process on this host may have read it recently.
+                shared = await cache.get("supabase", _shared_key(name, key))
+                if shared is not None:
+                    served, data = "shared_cache", shared["data"]
+            metrics.inc("supabase_reads_degraded_total", query=name, served=served)
+            log_event(logger, "supabase.read_degraded", logging.WARNING, query=name, key=key, served=served,
+                      error=repr(e) if str(e) else type(e).__name__)
+            return data
+        data = response.data if response is not None else None
+        if key is None:
+            return data
+        cache = shared_cache.get_shared_cache()
+        if cache is not None and _last_good.get((name, key), _MISSING) != data:
+            cache.put("supabase", _shared_key(name, key), {"data": data},
+                      ttl=config.SHARED_CACHE_LAST_GOOD_TTL_H * 3600)
+        # Its own copy: the caller is free to change what it gets back.
+        _last_good[(name, key)] = copy.deepcopy(data)
+        _last_good.move_to_end((name, key))
+        while len(_last_good) > _LAST_GOOD_MAX:
+            _last_good.popitem(last=False)
+        return data
+
+    @coalesce
+    async def fetch_child_profile(self, device_id: str):
+        """Fetches the child's profile using the device_id."""
+        def run_query():
+            return self.client.table('child_profiles').select("*").eq('device_id', device_id).single().execute()
+        return await self._read("child_profile", run_query, device_id, None)
 
+    @coalesce
     async def fetch_toy_personality(self, child_id: str):
         """Fetches the toy's personality for a given child."""
-        try:
-            def run_query():
-                return (self.client.table('toy_personality')
-                        .select("*")
-                        .eq('child_id', child_id)
-                        .order('last_updated', desc=True)
-                        .limit(1)
-                        .single()
-                        .execute())
-            response = await asyncio.to_thread(run_query)
-            return response.data
-        except Exception:
-            return {'energy': 0.5, 'humor': 0.5, 'curiosity': 0.5, 'empathy': 0.5, 'role_identity': 'Best Friend'}
+        def run_query():
+            return (self.client.table('toy_personality')
+                    .select("*")
+                    .eq('child_id', child_id)
+                    .order('last_updated', desc=True)
+                    .limit(1)
+                    .single()
+                    .execute())
+        default = {'energy': 0.5, 'humor': 0.5, 'curiosity': 0.5, 'empathy': 0.5, 'role_identity': 'Best Friend'}
+        return await self._read("toy_personality", run_query, child_id, default)
 
     async def set_toy_personality(self, personality: str, child_id: str):
         """Sets the toy personality for a child."""
@@ -65,14 +141,15 @@ class SupabaseHelper:
             return personality_data
 
 
+    @coalesce
     async def fetch_parental_rules(self, child_id: str):
-        """Fetches parental rules for a given child."""
-        try:
-            response = await self.client.table('parental_rules').select("*").eq('child_id', child_id).single().execute()
-            print(f"response from parental rules :: {response}")
-            return response.data
-        except Exception:
-            return {}
+        """
+        Fetches parental rules for a given child: {} if the parent hasn't set
+        any, STRICT_RULES if they can't be read (fails closed).
+        """
+        def run_query():
+            return self.client.table('parental_rules').select("*").eq('child_id', child_id).single().execute()
+        return await self._read("parental_rules", run_query, child_id, dict(STRICT_RULES), missing={})
 
     async def update_parental_rule(self, device_id: str, rule: dict) -> bool:
         def run_upsert():
@@ -93,9 +170,8 @@ class SupabaseHelper:
         
     async def set_interests(self, user_id: str, category: str, items: list[str]):
         """Set or update a user's interests for a category."""
-        valid_categories = ["Hobbies", "Sports", "Favorite_Food", "Topics"]
-        if category not in valid_categories:
-            raise ValueError(f"Invalid category. Must be one of {valid_categories}")
+        if category not in INTEREST_CATEGORIES:
+            raise ValueError(f"Invalid category. Must be one of {INTEREST_CATEGORIES}")
 
         data = {
             "user_id": user_id,
@@ -103,75 +179,178 @@ class SupabaseHelper:
             "items": items
         }
 
-        response = await self.client.table("user_interests").upsert(data).execute()
+        response = await asyncio.to_thread(lambda: self.client.table("user_interests").upsert(data, on_conflict="user_id,category").execute())
 
         if response.data:
-            print("Interests set successfully:", response.data)
+            log_event(logger, "interests.set", user_id=user_id, category=category, items=len(items))
         else:
-            print("Error setting interests:", response)
+            log_event(logger, "interests.set_failed", logging.ERROR, user_id=user_id, category=category)
 
-    async def get_interests(self, child_id: str):
-        """Fetch all interests for a given user."""
-        response = self.client.table("user_interests").select("*").eq("user_id", child_id).execute()
-
-        if not response.data:
+    async def merge_interests(self, user_id: str, interests: dict[str, list[str]], max_items: int = config.INTEREST_MAX_ITEMS):
+        """
+        Merges new interests into every category in one round trip via the
+        `merge_user_interests` RPC (dedupes, keeps order, caps each list).
+        Returns the stored category -> items. Raises on failure, so the
+        finalize queue retries the session.
+        """
+        payload = {
+            category: [item for item in items if isinstance(item, str) and item.strip()]
+            for category, items in interests.items()
+            if category in INTEREST_CATEGORIES and items
+        }
+        payload = {category: items for category, items in payload.items() if items}
+        if not payload:
             return {}
 
-        interests = {row["category"]: row["items"] for row in response.data}
-        return interests
+        def run_rpc():
+            return self.client.rpc('merge_user_interests', {
+                'p_user_id': user_id,
+                'p_interests': payload,
+                'p_max_items': max_items,
+            }).execute()
+        try:
+            response = await asyncio.to_thread(run_rpc)
+            log_event(logger, "interests.merged", user_id=user_id, categories=len(payload),
+                      items=sum(len(items) for items in payload.values()))
+            return {row["category"]: row["items"] for row in response.data or []}
+        except Exception as e:
+            log_event(logger, "interests.merge_failed", logging.ERROR, user_id=user_id, error=repr(e))
+            raise
 
-    async def log_conversation(self, child_id: str, content: list, embedding: list):
+    @coalesce
+    async def get_interests(self, child_id: str):
+        """Fetch all interests for a given user."""
+        def run_query():
+            return self.client.table("user_interests").select("*").eq("user_id", child_id).execute()
+        rows = await self._read("interests", run_query, child_id, [])
+        return {row["category"]: row["items"] for row in rows or []}
+
+    async def log_conversation(self, child_id: str, content: list, embedding: list, session_id: str | None = None):
+        """Saves a finished session; with `session_id`, saving the same session again is a no-op. Raises on failure."""
+        row = {'child_id': child_id, 'content': content, 'embedding': embedding}
+        def run_query():
+            if session_id is None:
+                return self.client.table('conversation_logs').insert(row).execute()
+            return (self.client.table('conversation_logs')
+                    .upsert({**row, 'session_id': session_id}, on_conflict='session_id', ignore_duplicates=True)
+                    .execute())
         try:
-            print(f"saving conversation to db :::: {content}")
-            await self.client.table('conversation_logs').insert({
-                'child_id': child_id,
-                'content': content,
-                'embedding': embedding
-            }).execute()
+            log_event(logger, "conversation.saving", child_id=child_id, messages=len(content))
+            await asyncio.to_thread(run_query)
         except Exception as e:
-            print(f"Error logging conversation: {e}")
+            log_event(logger, "conversation.save_failed", logging.ERROR, child_id=child_id, error=repr(e))
+            raise
 
+    @coalesce
     async def get_last_n_conversations(self, child_id: str, n: int):
         """
         Fetch the last 5 conversation messages for a child.
         Returns a list of dicts with role, content, and timestamp.
         """
-        try:
-            response = self.client.table('conversation_logs')\
+        def run_query():
+            return self.client.table('conversation_logs')\
                 .select("content, created_at")\
                 .eq('child_id', child_id)\
                 .order('created_at', desc=True)\
                 .limit(n)\
                 .execute()
-
-            if not response.data:
-                return []
-
-            return list(response.data)
-
-        except Exception as e:
-            print(f"Error fetching last 5 conversations: {e}")
-            return []
+        return list(await self._read("last_conversations", run_query, (child_id, n), []) or [])
         
 
-    async def get_rag_context(self, child_id: str, embedding: list, match_threshold: float = 0.50, match_count: int = 5):
-        """Retrieves relevant past conversation snippets."""
-        try:
-            response = self.client.rpc('match_conversations', {
+    async def match_conversations(self, child_id: str, embedding: list, match_threshold: float = 0.50, match_count: int = 5):
+        """Past sessions similar to `embedding`, most similar first."""
+        def run_query():
+            return self.client.rpc('match_conversations', {
                 'query_embedding': embedding,
                 'p_child_id': child_id,
                 'match_threshold': match_threshold,
                 'match_count': match_count
             }).execute()
-            logger.info(f"RAG response : {response}")
-            return "\n".join([f"{item['content']}" for item in response.data])
+        # Matches depend on the query; a failed lookup just finds nothing.
+        return list(await self._read("rag_context", run_query, None, []) or [])
+
+    @coalesce
+    async def fetch_pregenerated_greeting(self, device_id: str):
+        """The unused pre-generated greeting for a device, or None."""
+        def run_query():
+            return (self.client.table('pregenerated_greetings')
+                    .select("text, tts_pitch, rules_hash, created_at")
+                    .eq('device_id', device_id)
+                    .is_('used_at', 'null')
+                    .maybe_single()
+                    .execute())
+        # Never from the fallback cache: a greeting is spoken once.
+        return await self._read("pregenerated_greeting", run_query, None, None)
+
+    async def save_pregenerated_greeting(self, device_id: str, text: str, tts_pitch: str | None = None,
+                                         rules_hash: str | None = None):
+        def run_upsert():
+            return self.client.table('pregenerated_greetings').upsert({
+                "device_id": device_id,
+                "text": text,
+                "tts_pitch": tts_pitch,
+                "rules_hash": rules_hash,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "used_at": None,
+            }, on_conflict="device_id").execute()
+        await asyncio.to_thread(run_upsert)
+
+    async def mark_greeting_used(self, device_id: str):
+        def run_update():
+            return (self.client.table('pregenerated_greetings')
+                    .update({"used_at": datetime.now(timezone.utc).isoformat()})
+                    .eq('device_id', device_id)
+                    .execute())
+        try:
+            await asyncio.to_thread(run_update)
         except Exception as e:
-            print(f"Error fetching RAG context: {e}")
-            return ""
+            log_event(logger, "greeting.mark_used_failed", logging.WARNING, device_id=device_id, error=repr(e))
+
+    async def list_devices_needing_greeting(self, limit: int = 100) -> list[str]:
+        """Devices whose last pre-generated greeting has been spoken, or that never had one."""
+        def run_query():
+            return self.client.rpc('devices_needing_greeting', {'p_limit': limit}).execute()
+        response = await asyncio.to_thread(run_query)
+        return [row["device_id"] for row in response.data or []]
+
+    @coalesce
+    async def fetch_fun_facts(self, city_key: str, age_band: str, max_age_hours: float, limit: int) -> list[str]:
+        """Facts for a city / age band generated within the last `max_age_hours`, newest first."""
+        since = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).isoformat()
+        def run_query():
+            return (self.client.table('fun_facts')
+                    .select("fact")
+                    .eq('city_key', city_key)
+                    .eq('age_band', age_band)
+                    .gte('created_at', since)
+                    .order('created_at', desc=True)
+                    .limit(limit)
+                    .execute())
+        rows = await self._read("fun_facts", run_query, (city_key, age_band), [])
+        return [row["fact"] for row in rows or []]
+
+    async def save_fun_facts(self, city_key: str, age_band: str, facts: list[str]):
+        def run_upsert():
+            return self.client.table('fun_facts').upsert(
+                [{"city_key": city_key, "age_band": age_band, "fact": fact} for fact in facts],
+                on_conflict="city_key,age_band,fact",
+                ignore_duplicates=True,
+            ).execute()
+        await asyncio.to_thread(run_upsert)
+
+    @coalesce
+    async def list_popular_cities(self, limit: int = 50, sample: int = 5000) -> list[str]:
+        """Most common cities across child profiles."""
+        def run_query():
+            return self.client.table('child_profiles').select("city").not_.is_('city', 'null').limit(sample).execute()
+        response = await asyncio.to_thread(run_query)
+        counts = Counter((row.get("city") or "").strip() for row in response.data or [])
+        counts.pop("", None)
+        return [city for city, _ in counts.most_common(limit)]
 
 # Backend sync
 async def save_user_data_to_backend(user: dict):
-    print("requesting to save user")
+    log_event(logger, "backend.save_user", device_id=user.get("device_id"))
     url = f"{config.BACKEND_URL}/save-user-data"
     headers = {
         "Content-Type": "application/json",
@@ -189,11 +368,12 @@ async def save_user_data_to_backend(user: dict):
         try:
             async with session.post(url, json=data_to_send, headers=headers) as response:
                 if response.status == 200:
-                    print("Successfully saved user data to backend.")
+                    log_event(logger, "backend.save_user_ok", device_id=user.get("device_id"))
                     return await response.json()
                 else:
-                    print(f"Error saving user data: {await response.text()}")
+                    log_event(logger, "backend.save_user_failed", logging.ERROR,
+                              device_id=user.get("device_id"), status=response.status, body=await response.text())
                     return None
         except Exception as e:
-            print(f"Failed to connect to backend: {e}")
+            log_event(logger, "backend.unreachable", logging.ERROR, error=repr(e))
             return None
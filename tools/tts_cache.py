@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+from collections import OrderedDict
+
+from livekit import rtc
+from livekit.plugins.openai import TTS as OpenAI_TTS
+
+import config
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.tts_cache")
+
+metrics.describe("tts_cache_hits_total", "Cached phrases played without calling TTS.")
+metrics.describe("tts_cache_misses_total", "Cacheable phrases that had to be synthesized.")
+metrics.describe("tts_cache_memory_bytes", "Audio held in the in-memory LRU.")
+
+# magic, sample rate, channels; raw int16 PCM follows.
+HEADER = struct.Struct("<8sIH")
+MAGIC = b"JOYTTS01"
+FRAME_MS = 20
+
+# gpt-4o-mini-tts takes free-form delivery instructions; there is no pitch knob.
+PITCH_INSTRUCTIONS = {
+    "low": "Speak with a low, calm pitch.",
+    "medium": "Speak with a natural, medium pitch.",
+    "high": "Speak with a bright, high pitch.",
+}
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def normalize_pitch(pitch: str | None) -> str | None:
+    """A pitch preference as the voice sees it: unknown values sound like no preference."""
+    pitch = (pitch or "").strip().lower()
+    return pitch if pitch in PITCH_INSTRUCTIONS else None
+
+
+# Every pitch a cached phrase can be asked for in.
+ALL_PITCHES = (None, *PITCH_INSTRUCTIONS)
+
+
+def cache_key(voice: str, pitch: str | None, text: str) -> str:
+    return hashlib.sha256(f"{voice}|{normalize_pitch(pitch) or ''}|{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def default_tts_factory(pitch: str | None):
+    instructions = PITCH_INSTRUCTIONS.get(normalize_pitch(pitch))
+    if instructions:
+        return OpenAI_TTS(api_key=config.OPENAI_API_KEY, voice=config.TTS_VOICE, instructions=instructions)
+    return OpenAI_TTS(api_key=config.OPENAI_API_KEY, voice=config.TTS_VOICE)
+
+
+class _Clip:
+    """
+    A cache file, memory-mapped. Playbacks hold a reference to it, so one
+    the LRU has dropped stays mapped until they finish and is unmapped
+    when the last reference goes.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.sample_rate, self.num_channels = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"Not a TTS cache file: {path}")
+        self.size = len(self.map)
+        # Recently played clips survive the disk trim.
+        os.utime(path)
+
+    def frames(self):
+        samples = self.sample_rate * FRAME_MS // 1000
+        step = samples * self.num_channels * 2
+        for offset in range(HEADER.size, self.size, step):
+            data = self.map[offset:offset + step]
+            yield rtc.AudioFrame(
+                data=data,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(data) // (2 * self.num_channels),
+            )
+
+
+class TtsCache:
+    """
+    Content-addressed audio for fixed and templated phrases, keyed by voice,
+    pitch preference and normalised text. Clips live on disk (shared by every
+    job process on the host) and are memory-mapped on use; an LRU bounded in
+    bytes keeps the hot ones mapped, and the disk store is trimmed
+    least-recently-used first.
+
+    Lookups never touch the disk: a clip is a hit if it is mapped or known
+    to be on disk (`preload`, `locate`, `ensure`), and a known one is
+    mapped in a thread when its playback starts.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int, voice: str = config.TTS_VOICE,
+                 tts_factory=default_tts_factory):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.voice = voice
+        self.tts_factory = tts_factory
+        self._clips = OrderedDict()
+        self._memory_used = 0
+        self._on_disk = set()
+        self._tts = {}
+        self._inflight = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pcm")
+
+    def _remember(self, key: str, clip: _Clip):
+        previous = self._clips.pop(key, None)
+        if previous is not None:
+            self._memory_used -= previous.size
+        self._clips[key] = clip
+        self._memory_used += clip.size
+        while self._memory_used > self.memory_bytes and len(self._clips) > 1:
+            _, evicted = self._clips.popitem(last=False)
+            self._memory_used -= evicted.size
+        metrics.set_gauge("tts_cache_memory_bytes", self._memory_used)
+
+    def preload(self, phrases, pitches=ALL_PITCHES) -> int:
+        """Map every phrase that is on disk now. Blocking: for a job process's prewarm."""
+        loaded = 0
+        for text in phrases:
+            for pitch in pitches:
+                key = cache_key(self.voice, pitch, text)
+                try:
+                    clip = _Clip(self._path(key))
+                except (OSError, ValueError):
+                    continue
+                self._on_disk.add(key)
+                self._remember(key, clip)
+                loaded += 1
+        return loaded
+
+    async def locate(self, text: str, pitch: str | None = None) -> bool:
+        """Check the disk (in a thread) for `text`, so the next `frames` call for it can hit."""
+        key = cache_key(self.voice, pitch, text)
+        if key in self._clips or key in self._on_disk:
+            return True
+        if await asyncio.to_thread(os.path.exists, self._path(key)):
+            self._on_disk.add(key)
+            return True
+        return False
+
+    def frames(self, text: str, pitch: str | None = None):
+        """Async iterator of cached frames for `text`, or None on a miss."""
+        key = cache_key(self.voice, pitch, text)
+        clip = self._clips.get(key)
+        if clip is not None:
+            self._clips.move_to_end(key)
+        elif key not in self._on_disk:
+            metrics.inc("tts_cache_misses_total")
+            return None
+        metrics.inc("tts_cache_hits_total")
+        return self._play(key, clip, text, pitch)
+
+    async def _play(self, key: str, clip: _Clip | None, text: str, pitch: str | None):
+        if clip is None:
+            try:
+                clip = await asyncio.to_thread(_Clip, self._path(key))
+            except (OSError, ValueError) as e:
+                # Trimmed (or replaced) since it was found; speak it live instead.
+                self._on_disk.discard(key)
+                log_event(logger, "tts_cache.clip_lost", logging.WARNING, error=repr(e))
+                async for frame in self._synthesize(text, pitch):
+                    yield frame
+                return
+            self._remember(key, clip)
+        for frame in clip.frames():
+            yield frame
+
+    async def _synthesize(self, text: str, pitch: str | None):
+        pitch = normalize_pitch(pitch)
+        tts = self._tts.get(pitch)
+        if tts is None:
+            tts = self._tts[pitch] = self.tts_factory(pitch)
+        async with tts.synthesize(normalize_text(text)) as stream:
+            async for event in stream:
+                yield event.frame
+
+    def ensure(self, text: str, pitch: str | None = None) -> asyncio.Task:
+        """Synthesize and store `text` in the background (once, however many callers ask)."""
+        key = cache_key(self.voice, pitch, text)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._store(key, text, pitch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _store(self, key: str, text: str, pitch: str | None):
+        if await asyncio.to_thread(os.path.exists, self._path(key)):
+            # Another process stored it since this one looked.
+            self._on_disk.add(key)
+            return
+        chunks = []
+        sample_rate = num_channels = None
+        try:
+            async for frame in self._synthesize(text, pitch):
+                sample_rate, num_channels = frame.sample_rate, frame.num_channels
+                chunks.append(bytes(frame.data))
+        except Exception:
+            logger.exception(f"Failed to synthesize cached phrase {text[:40]!r}")
+            return
+        if not chunks:
+            return
+        await asyncio.to_thread(self._write, key, sample_rate, num_channels, b"".join(chunks))
+        self._on_disk.add(key)
+
+    def _write(self, key: str, sample_rate: int, num_channels: int, pcm: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, sample_rate, num_channels))
+            f.write(pcm)
+        os.replace(tmp_path, path)
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pcm"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    async def warm(self, phrases, pitches=ALL_PITCHES):
+        """Make sure every phrase is on disk in every pitch; run once at worker start-up."""
+        missing = [(text, pitch) for text in phrases for pitch in pitches
+                   if not await self.locate(text, pitch)]
+        for text, pitch in missing:
+            await self.ensure(text, pitch)
+        if missing:
+            logger.info(f"TTS cache warmed with {len(missing)} phrases")
+
+
+_cache = None
+
+
+def get_tts_cache() -> TtsCache:
+    global _cache
+    if _cache is None:
+        _cache = TtsCache(
+            config.TTS_CACHE_DIR,
+            memory_bytes=int(config.TTS_CACHE_MEMORY_MB * 1024 * 1024),
+            disk_bytes=int(config.TTS_CACHE_DISK_MB * 1024 * 1024),
+        )
+    return _cache
+
+
+def say_cached(session, text: str, pitch: str | None = None, **kwargs):
+    """
+    `session.say(text)` that plays cached audio when there is some, skipping
+    TTS entirely. On a miss it speaks through TTS as usual and caches the
+    phrase in the background for next time.
+    """
+    cache = get_tts_cache()
+    frames = cache.frames(text, pitch)
+    if frames is None:
+        cache.ensure(text, pitch)
+        return session.say(text, **kwargs)
+    return session.say(text, audio=frames, **kwargs)
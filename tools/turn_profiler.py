@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from tools import metrics
+
+logger = logging.getLogger("livekit.turn_profiler")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENTS_DIR = os.path.join(REPO_ROOT, "agents")
+
+# Innermost frames that mean "the loop is waiting for I/O", not burning CPU.
+IDLE_FRAMES = {("selectors.py", "select"), ("base_events.py", "_run_once")}
+
+metrics.describe("turn_latency_seconds", "End of user speech to first agent audio, per agent.")
+metrics.describe("slow_turns_total", "Turns over the profiling latency budget.")
+
+
+def _qualname(code) -> str:
+    return getattr(code, "co_qualname", code.co_name)
+
+
+def fold_stack(frame) -> str | None:
+    """
+    Collapse a stack into flame-graph 'folded' form, outermost first, prefixed
+    with a tag naming the innermost agent method on the stack
+    (e.g. `ConversationContinuationAgent.extract_data`).
+    """
+    if frame is None or (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+        return None
+    frames = []
+    tag = None
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename
+        frames.append(f"{os.path.basename(filename)}:{_qualname(code)}")
+        if tag is None and filename.startswith(AGENTS_DIR):
+            tag = _qualname(code)
+        frame = frame.f_back
+    frames.reverse()
+    return ";".join([tag or "framework", *frames])
+
+
+class StackSampler:
+    """Samples the event-loop thread's stack from a background thread while anyone is listening."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._loop_thread_id = threading.get_ident()
+        self._sinks = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="turn-profiler", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, sink: Counter):
+        with self._lock:
+            self._sinks[id(sink)] = sink
+
+    def unsubscribe(self, sink: Counter):
+        with self._lock:
+            self._sinks.pop(id(sink), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                sinks = list(self._sinks.values())
+            if not sinks:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            folded = fold_stack(frame) if frame is not None else None
+            if folded is None:
+                continue
+            for sink in sinks:
+                sink[folded] += 1
+
+
+_sampler = None
+
+
+def _get_sampler(interval: float) -> StackSampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = StackSampler(interval)
+    return _sampler
+
+
+def profiling_enabled(device_id: str, metadata: dict, enabled: bool, device_ids: list[str]) -> bool:
+    """Env switch for every session, or per device via PROFILE_DEVICE_IDS / participant metadata."""
+    return enabled or device_id in device_ids or bool(metadata.get("profile"))
+
+
+class SessionProfiler:
+    """
+    Samples the loop while a turn is in flight (final transcript -> first
+    agent audio) and writes a folded-stack profile whenever the turn takes
+    longer than `budget` seconds. Load the files in speedscope or pipe them
+    through flamegraph.pl.
+    """
+
+    def __init__(self, device_id: str, directory: str, budget: float, interval: float = 0.005):
+        self.device_id = device_id
+        self.directory = directory
+        self.budget = budget
+        self.sampler = _get_sampler(interval)
+        self._session = None
+        self._samples = None
+        self._started = None
+        self._tools = []
+
+    def attach(self, session):
+        self._session = session
+        session.on("user_input_transcribed", self._on_transcribed)
+        session.on("function_tools_executed", self._on_tools_executed)
+        session.on("agent_state_changed", self._on_agent_state_changed)
+        session.on("close", self._on_close)
+        logger.info(f"Turn profiling enabled for {self.device_id} (budget {self.budget * 1000:.0f}ms)")
+
+    def _on_transcribed(self, ev):
+        if not ev.is_final or self._samples is not None:
+            return
+        self._samples = Counter()
+        self._started = time.monotonic()
+        self._tools = []
+        self.sampler.subscribe(self._samples)
+
+    def _on_tools_executed(self, ev):
+        if self._samples is not None:
+            self._tools.extend(call.name for call in ev.function_calls)
+
+    def _on_agent_state_changed(self, ev):
+        if ev.new_state != "speaking" or self._samples is None:
+            return
+        samples, self._samples = self._samples, None
+        self.sampler.unsubscribe(samples)
+        duration = time.monotonic() - self._started
+        agent = self._agent_name()
+        metrics.observe("turn_latency_seconds", duration, agent=agent)
+        if duration <= self.budget:
+            return
+        metrics.inc("slow_turns_total", agent=agent)
+        tag = self._tag(agent, samples)
+        asyncio.get_running_loop().run_in_executor(None, self._save, tag, duration, samples)
+
+    def _on_close(self, ev):
+        if self._samples is not None:
+            self.sampler.unsubscribe(self._samples)
+            self._samples = None
+
+    def _agent_name(self) -> str:
+        try:
+            return type(self._session.current_agent).__name__
+        except RuntimeError:
+            return "unknown"
+
+    def _tag(self, agent: str, samples: Counter) -> str:
+        if self._tools:
+            return f"{agent}.{self._tools[0]}"
+        # Otherwise name the turn after the agent method that was on-CPU most.
+        tags = Counter()
+        for stack, count in samples.items():
+            tags[stack.split(";", 1)[0]] += count
+        busiest = next((t for t, _ in tags.most_common() if t != "framework"), None)
+        return busiest or agent
+
+    def _save(self, tag: str, duration: float, samples: Counter):
+        os.makedirs(self.directory, exist_ok=True)
+        safe_tag = re.sub(r"[^\w.-]", "_", tag)
+        safe_device = re.sub(r"[^\w.-]", "_", self.device_id)
+        path = os.path.join(
+            self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_device}-{safe_tag}-{int(duration * 1000)}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.warning(
+            f"Slow turn ({duration * 1000:.0f}ms > {self.budget * 1000:.0f}ms budget) in {tag}; "
+            f"{sum(samples.values())} samples saved to {path}"
+        )
@@ -0,0 +1,99 @@
+import logging
+
+import config
+from tools import metrics
+from tools.log_setup import log_event
+
+logger = logging.getLogger("livekit.turn_taking")
+
+# Importing the plugin registers its model with the worker, which loads the
+# weights once in its shared inference process; jobs only hold a handle.
+if config.TURN_DETECTION == "english":
+    from livekit.plugins.turn_detector.english import EnglishModel as TurnDetector
+elif config.TURN_DETECTION == "multilingual":
+    from livekit.plugins.turn_detector.multilingual import MultilingualModel as TurnDetector
+else:
+    TurnDetector = None
+
+metrics.describe("eou_to_reply_seconds", "From the end of the child's speech to the first audio of the reply.")
+metrics.describe("eou_delay_seconds", "Time the session waited after speech ended before ending the turn.")
+
+
+def parse_age_bands(spec: str) -> list[tuple[int, int, float, float]]:
+    """`"3-6=0.8:5.0,7-9=0.6:4.0"` -> [(3, 6, 0.8, 5.0), (7, 9, 0.6, 4.0)]"""
+    bands = []
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        ages, delays = part.split("=", 1)
+        low, _, high = ages.strip().partition("-")
+        min_delay, _, max_delay = delays.strip().partition(":")
+        bands.append((int(low), int(high or low), float(min_delay), float(max_delay or min_delay)))
+    return bands
+
+
+AGE_BANDS = parse_age_bands(config.ENDPOINTING_AGE_BANDS)
+
+
+def endpointing_for_age(age) -> tuple[str, float, float]:
+    """(band label, min delay, max delay); the defaults when the age is unknown or in no band."""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        age = None
+    if age is not None:
+        for low, high, min_delay, max_delay in AGE_BANDS:
+            if low <= age <= high:
+                return f"{low}-{high}", min_delay, max_delay
+    return "default", config.MIN_ENDPOINTING_DELAY, config.MAX_ENDPOINTING_DELAY
+
+
+def load_turn_detector():
+    """The configured end-of-turn model, or None for VAD silence only. Needs a job context."""
+    if TurnDetector is None:
+        return None
+    try:
+        return TurnDetector()
+    except Exception as e:
+        # Usually the model files were never downloaded (`python main.py download-files`).
+        log_event(logger, "turn_detector.unavailable", logging.WARNING, model=config.TURN_DETECTION, error=repr(e))
+        return None
+
+
+class TurnLatencyObserver:
+    """Records end of the child's speech -> first reply audio, by age band and detector."""
+
+    def __init__(self, band: str, detector: str):
+        self.band = band
+        self.detector = detector
+        self._speech_ended = None
+
+    def attach(self, session):
+        session.on("user_state_changed", self._on_user_state_changed)
+        session.on("agent_state_changed", self._on_agent_state_changed)
+        session.on("metrics_collected", self._on_metrics)
+
+    def _on_user_state_changed(self, ev):
+        if ev.new_state == "speaking":
+            self._speech_ended = None
+        elif ev.old_state == "speaking":
+            self._speech_ended = ev.created_at
+
+    def _on_agent_state_changed(self, ev):
+        if ev.new_state != "speaking" or self._speech_ended is None:
+            return
+        metrics.observe("eou_to_reply_seconds", max(0.0, ev.created_at - self._speech_ended),
+                        band=self.band, detector=self.detector)
+        self._speech_ended = None
+
+    def _on_metrics(self, ev):
+        if getattr(ev.metrics, "type", None) == "eou_metrics":
+            metrics.observe("eou_delay_seconds", ev.metrics.end_of_utterance_delay, detector=self.detector)
+
+
+def configure_turn_taking(session, age, detector: str):
+    """Apply the child's age-band endpointing delays to `session` and start measuring turn latency."""
+    band, min_delay, max_delay = endpointing_for_age(age)
+    session.update_options(min_endpointing_delay=min_delay, max_endpointing_delay=max_delay)
+    TurnLatencyObserver(band, detector).attach(session)
+    logger.info(f"Turn taking: {detector}, age band {band}, endpointing {min_delay}s-{max_delay}s")